@@ -1,22 +1,28 @@
 import os
 from pathlib import Path
-from flask import Flask, request, jsonify, send_from_directory, send_file, Response
+from flask import Flask, request, jsonify, send_from_directory, send_file, Response, g, copy_current_request_context
 from flask_cors import CORS
 import pymysql
 from dotenv import load_dotenv
 import uuid
 import datetime
 import logging
-import requests
 import json
 from gtts import gTTS
 import io
-import subprocess
-import signal
-import sys
 import time
 import re
 import atexit
+import queue
+import threading
+
+from camera_supervisor import CameraSupervisor
+from response_cache import DiskCache, ResponseCache, fingerprint, normalize_query
+import intent_matcher
+from llm_client import GEMINI_BASE_URL as DEFAULT_GEMINI_BASE_URL, GeminiClient, LLMError
+from job_queue import JobQueue, QueueFull
+import voice_assistant
+from inventory_context import InventoryContext, inventory_version
 
 load_dotenv()
 
@@ -28,8 +34,11 @@ DB_NAME = os.getenv('DB_NAME', 'smartfridge')
 APP_PORT = int(os.getenv('PORT', '3001'))
 
 # Google Gemini API Key (FREE - get from https://aistudio.google.com/app/apikey)
-# Embedded directly for reliability
-GEMINI_API_KEY = 'xxxxxxxxxxxxxxxx'
+# Embedded directly for reliability; GEMINI_API_KEY in the environment overrides it.
+# GEMINI_BASE_URL points the backend elsewhere, e.g. at fake_gemini_server.py for
+# load tests: GEMINI_BASE_URL=http://127.0.0.1:5055/v1beta
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'xxxxxxxxxxxxxxxx')
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', DEFAULT_GEMINI_BASE_URL)
 
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / 'folder'
@@ -44,8 +53,56 @@ app.logger.setLevel(logging.INFO)
 # Which table to use for items. Set in init_db_if_needed()
 TABLE_NAME = None
 
-# Camera process management
-camera_process = None
+# Answers to informational voice questions, keyed by normalized query, language
+# and a fingerprint of the inventory as the model sees it. Any inventory write
+# clears it; send "X-Cache-Bypass: 1" to force a fresh answer.
+VOICE_CACHE_TTL_SECONDS = int(os.getenv('VOICE_CACHE_TTL_SECONDS', '300'))
+VOICE_CACHE_MAX_ENTRIES = 256
+voice_cache = ResponseCache(max_entries=VOICE_CACHE_MAX_ENTRIES, ttl=VOICE_CACHE_TTL_SECONDS)
+
+# Gemini recipes, keyed by a hash of the sorted ingredient set. Stored on disk so
+# they survive restarts; POST /api/generate_recipe?refresh=1 forces new ones.
+RECIPE_CACHE_TTL_SECONDS = int(os.getenv('RECIPE_CACHE_TTL_SECONDS', str(24 * 3600)))
+RECIPE_CACHE_MAX_ENTRIES = 500
+RECIPE_PROMPT_VERSION = 1  # Bump when the recipe prompt changes to ignore old entries
+recipe_cache = DiskCache(BASE_DIR / 'recipe_cache', ttl=RECIPE_CACHE_TTL_SECONDS,
+                         max_entries=RECIPE_CACHE_MAX_ENTRIES)
+
+# Voice commands recognized without Gemini, and how each voice request was answered
+local_intents = intent_matcher.IntentMatcher()
+voice_path_stats = intent_matcher.VoicePathStats()
+
+# Inventory block of the voice prompt: merged, grouped by location and trimmed to
+# INVENTORY_TOKEN_BUDGET tokens for big inventories (see inventory_context.py)
+inventory_context = InventoryContext()
+
+# All Gemini calls share one client: pooled connections, per-call deadlines,
+# retries off the request thread and a circuit breaker (see llm_client.py).
+# Voice calls run on the 'interactive' pool, recipes on 'batch'
+gemini = GeminiClient(GEMINI_API_KEY, base_url=GEMINI_BASE_URL, logger=app.logger)
+VOICE_LLM_DEADLINE_SECONDS = 12
+RECIPE_LLM_WAIT_SECONDS = 12  # A recipe request waits this long, then serves the fallback
+RECIPE_LLM_DEADLINE_SECONDS = 45  # Retries may go on this long in the background
+
+# POST /api/recipe_jobs: recipes generated on a small worker pool while the client
+# polls GET /api/recipe_jobs/<id> or follows its event stream (see job_queue.py)
+recipe_jobs = JobQueue(
+    max_workers=int(os.getenv('RECIPE_JOB_WORKERS', '2')),
+    max_queued=int(os.getenv('RECIPE_JOB_MAX_QUEUED', '20')),
+    ttl=int(os.getenv('RECIPE_JOB_TTL_SECONDS', '600')),
+    name='recipe-job',
+    logger=app.logger,
+)
+
+# Camera process management: camera_stream_server.py runs as a supervised child
+# (pidfile + lock, /health readiness probe, restart with backoff; see camera_supervisor.py)
+camera_supervisor = CameraSupervisor(
+    script_path=BASE_DIR / 'camera_stream_server.py',
+    log_path=BASE_DIR / 'camera_stream.log',
+    pid_path=BASE_DIR / 'camera_stream.pid',
+    health_url=os.getenv('CAMERA_HEALTH_URL', 'http://127.0.0.1:5001/health'),
+    logger=app.logger,
+)
 
 
 def get_conn():
@@ -62,6 +119,91 @@ def get_conn():
     )
 
 
+def inventory_changed():
+    """Call after any write to the inventory: cached voice answers may be stale"""
+    voice_cache.clear()
+
+
+def cache_bypassed():
+    """True if the client asked for a fresh (uncached) response"""
+    return (request.headers.get('X-Cache-Bypass', '').lower() in ('1', 'true', 'yes')
+            or 'no-cache' in request.headers.get('Cache-Control', ''))
+
+
+def fetch_inventory_rows():
+    """Every inventory row with the details the voice assistant talks about"""
+    conn = get_conn()
+    cur = conn.cursor()
+    if TABLE_NAME == 'item':
+        cur.execute('SELECT id, label, quantity, expiry_date, location, status, added_date, source, confidence, camera_last_seen FROM item ORDER BY expiry_date ASC')
+    else:
+        cur.execute('SELECT id, label, quantity, expiry_date, location FROM items ORDER BY expiry_date ASC')
+    items = cur.fetchall()
+    conn.close()
+    return items
+
+
+def ask_voice_model(query_text, language, inventory_text, key=None, on_reply=None):
+    """One Gemini round trip: intent, item details and the localized reply (see voice_assistant.py)
+
+    Concurrent calls with the same key (e.g. one question from two devices) share that round trip.
+    With on_reply the answer is streamed instead, and on_reply(text) gets each
+    new piece of a question's reply as Gemini writes it.
+    """
+    prompt = voice_assistant.build_prompt(query_text, language, inventory_text)
+    payload = voice_assistant.build_payload(prompt)
+    if on_reply is None:
+        result = gemini.generate(payload, deadline=VOICE_LLM_DEADLINE_SECONDS, retries=1, key=key,
+                                 pool='interactive')
+        return voice_assistant.parse_result(gemini.text(result))
+
+    reply = voice_assistant.ReplyStream()
+
+    def relay(chunk):
+        piece = reply.feed(chunk)
+        if piece:
+            on_reply(piece)
+
+    return voice_assistant.parse_result(gemini.stream(payload, deadline=VOICE_LLM_DEADLINE_SECONDS, on_text=relay))
+
+
+def parse_recipes(ai_response, ingredients_list, ingredients_text):
+    """Recipes from Gemini's text and whether it was a well-formed JSON array"""
+    try:
+        if '```json' in ai_response:
+            ai_response = ai_response.split('```json')[1].split('```')[0]
+        elif '```' in ai_response:
+            ai_response = ai_response.split('```')[1].split('```')[0]
+        ai_response = ai_response.strip()
+        start_idx = ai_response.find('[')
+        end_idx = ai_response.rfind(']') + 1
+        if start_idx != -1 and end_idx > start_idx:
+            json_str = ai_response[start_idx:end_idx]
+            return json.loads(json_str), True
+        raise ValueError('No JSON array found in response')
+    except Exception as parse_error:
+        app.logger.warning('Could not parse Gemini JSON: %s', str(parse_error))
+        # Create a simple recipe from the response
+        return [{
+            "title": f"Recipe with {ingredients_list[0]}",
+            "ingredients": ingredients_text[:100],
+            "instructions": ai_response[:300] if ai_response else "Mix ingredients and cook as desired."
+        }], False
+
+
+def localized_reply(model_reply, english_text, language):
+    """The model's reply for non-English users, our own confirmation text otherwise"""
+    if language != 'en' and model_reply:
+        return model_reply
+    return english_text
+
+
+def recipe_cache_key(ingredients):
+    """Same ingredients in any order (or case) -> same key"""
+    canonical = sorted({normalize_query(i) for i in ingredients if i})
+    return fingerprint(RECIPE_PROMPT_VERSION, *canonical)
+
+
 def init_db_if_needed():
     # Ensure the items and recipes tables exist. This will run at startup.
     try:
@@ -184,6 +326,7 @@ def api_add_item():
             conn.commit()
             inserted_id = cur.lastrowid
             conn.close()
+            inventory_changed()
             app.logger.info('Item added to `item` with id (autoinc): %s from %s', inserted_id, source)
             return jsonify({'success': True, 'id': inserted_id, 'source': source})
         else:
@@ -194,6 +337,7 @@ def api_add_item():
             )
             conn.commit()
             conn.close()
+            inventory_changed()
             app.logger.info('Item added to `items` with id: %s', item_id)
             return jsonify({'success': True, 'id': item_id})
     except Exception as e:
@@ -212,6 +356,7 @@ def api_delete_item(item_id):
             cur.execute('DELETE FROM items WHERE id=%s', (item_id,))
         conn.commit()
         conn.close()
+        inventory_changed()
         return jsonify({'success': True})
     except Exception as e:
         app.logger.exception('Failed to DELETE /api/items/%s', item_id)
@@ -224,9 +369,10 @@ def api_camera_heartbeat():
     try:
         data = request.get_json(force=True)
         labels = data.get('labels', [])  # List of currently detected item labels
+        camera_id = data.get('camera_id')  # Which camera sent it (multi-camera stream server)
         
         if not labels:
-            return jsonify({'success': True, 'updated': 0})
+            return jsonify({'success': True, 'updated': 0, 'camera_id': camera_id})
         
         conn = get_conn()
         cur = conn.cursor()
@@ -244,7 +390,8 @@ def api_camera_heartbeat():
         conn.commit()
         conn.close()
         
-        return jsonify({'success': True, 'updated': updated_count})
+        app.logger.debug('Camera heartbeat from %s: %s (%d updated)', camera_id or 'default', labels, updated_count)
+        return jsonify({'success': True, 'updated': updated_count, 'camera_id': camera_id})
     except Exception as e:
         app.logger.exception('Camera heartbeat failed')
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -270,6 +417,8 @@ def api_camera_cleanup():
         
         conn.commit()
         conn.close()
+        if deleted_count:
+            inventory_changed()
         
         app.logger.info('Camera cleanup removed %d stale items', deleted_count)
         return jsonify({'success': True, 'removed': deleted_count})
@@ -298,7 +447,22 @@ def api_get_camera_items():
 
 @app.route('/api/generate_recipe', methods=['POST'])
 def api_generate_recipe():
-    """Generate recipe suggestions using FREE Google Gemini API"""
+    """Generate recipe suggestions using FREE Google Gemini API
+
+    Holds the connection until recipes are ready (Gemini gets at most
+    RECIPE_LLM_WAIT_SECONDS, then the fallback is served). POST
+    /api/recipe_jobs does the same work without tying up the request.
+    """
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes') or cache_bypassed()
+    body, status = generate_recipes(refresh=refresh)
+    return jsonify(body), status
+
+
+def generate_recipes(refresh=False, wait=RECIPE_LLM_WAIT_SECONDS):
+    """Recipes for the current inventory as (response body, HTTP status); needs no request context
+
+    refresh skips the recipe cache; wait is how long to wait for Gemini before the fallback.
+    """
     try:
         # Fetch current items from database
         conn = get_conn()
@@ -311,7 +475,7 @@ def api_generate_recipe():
         conn.close()
 
         if not items or len(items) == 0:
-            return jsonify({'success': False, 'message': 'No items in inventory to generate recipes'}), 400
+            return {'success': False, 'message': 'No items in inventory to generate recipes'}, 400
 
         # Build ingredient list
         ingredients_list = [item['label'] for item in items[:10]]
@@ -319,10 +483,21 @@ def api_generate_recipe():
         
         app.logger.info('Generating recipes for ingredients: %s', ingredients_text)
 
-        # Try Google Gemini API (FREE - 60 requests/minute) with retry/backoff
+        # Same ingredients as last time -> reuse those recipes (no Gemini call, no new rows)
+        cache_key = recipe_cache_key(ingredients_list)
+        if refresh:
+            recipe_cache.bypass()
+        else:
+            cached = recipe_cache.get(cache_key)
+            if cached is not None:
+                cached_recipes, stored_at = cached
+                app.logger.info('Recipe cache hit for %s', cache_key)
+                return {'success': True, 'recipes': cached_recipes, 'source': 'gemini', 'cached': True,
+                        'cached_at': datetime.datetime.fromtimestamp(stored_at).isoformat(timespec='seconds')}, 200
+
+        # Try Google Gemini API (FREE - 60 requests/minute) via the shared client
         if GEMINI_API_KEY:
             app.logger.info('Using Google Gemini API for recipe generation')
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
 
             prompt = f"""Create 3-5 traditional Indian recipes (South Indian and North Indian cuisine) using these ingredients from my fridge: {ingredients_text}
 
@@ -350,7 +525,6 @@ Return ONLY a JSON array in this exact format:
 
 No extra text, just the JSON array with 3-5 authentic Indian recipes."""
 
-            headers = {'Content-Type': 'application/json'}
             data = {
                 "contents": [{
                     "parts": [{
@@ -359,79 +533,68 @@ No extra text, just the JSON array with 3-5 authentic Indian recipes."""
                 }]
             }
 
-            last_error = None
-            for attempt in range(3):
-                try:
-                    response = requests.post(url, headers=headers, json=data, timeout=30)
-                    if response.status_code == 200:
-                        result = response.json()
-                        app.logger.info('Gemini API response received')
-                        ai_response = result['candidates'][0]['content']['parts'][0]['text'].strip()
-                        app.logger.info('Gemini text: %s', ai_response[:200])
+            def cache_late_answer(result):
+                # Retries outlived the request: keep a good answer for the next click
+                late_recipes, late_parsed = parse_recipes(gemini.text(result).strip(), ingredients_list,
+                                                          ingredients_text)
+                if late_parsed:
+                    recipe_cache.put(cache_key, late_recipes[:3])
+                    app.logger.info('Cached late Gemini recipes for %s', cache_key)
 
-                        try:
-                            if '```json' in ai_response:
-                                ai_response = ai_response.split('```json')[1].split('```')[0]
-                            elif '```' in ai_response:
-                                ai_response = ai_response.split('```')[1].split('```')[0]
-                            ai_response = ai_response.strip()
-                            start_idx = ai_response.find('[')
-                            end_idx = ai_response.rfind(']') + 1
-                            if start_idx != -1 and end_idx > start_idx:
-                                json_str = ai_response[start_idx:end_idx]
-                                recipes = json.loads(json_str)
-                            else:
-                                raise ValueError('No JSON array found in response')
-                        except Exception as parse_error:
-                            app.logger.warning('Could not parse Gemini JSON: %s', str(parse_error))
-                            # Create a simple recipe from the response
-                            recipes = [{
-                                "title": f"Recipe with {ingredients_list[0]}",
-                                "ingredients": ingredients_text[:100],
-                                "instructions": ai_response[:300] if ai_response else "Mix ingredients and cook as desired."
-                            }]
-
-                        # Save recipes to database (best-effort)
-                        try:
-                            conn = get_conn()
-                            cur = conn.cursor()
-                            saved_count = 0
-                            for recipe in recipes[:3]:
-                                rid = str(uuid.uuid4())
+            try:
+                # Tablets asking for the same ingredients at once share one Gemini call
+                future, shared = gemini.coalesce(('recipe', cache_key), data,
+                                                 deadline=RECIPE_LLM_DEADLINE_SECONDS, retries=2,
+                                                 pool='batch')
+                if shared:
+                    app.logger.info('Waiting on in-flight Gemini recipe call for %s', cache_key)
+                # Retries and backoff run on the client's threads; after
+                # `wait` seconds we serve the fallback instead of blocking
+                result = gemini.wait(future, wait,
+                                     on_late_result=None if shared else cache_late_answer)
+                app.logger.info('Gemini API response received')
+                ai_response = gemini.text(result).strip()
+                app.logger.info('Gemini text: %s', ai_response[:200])
+                recipes, parsed = parse_recipes(ai_response, ingredients_list, ingredients_text)
+
+                # The request that made the call saves and caches its answer
+                if not shared:
+                    # Save recipes to database (best-effort)
+                    try:
+                        conn = get_conn()
+                        cur = conn.cursor()
+                        saved_count = 0
+                        for recipe in recipes[:3]:
+                            rid = str(uuid.uuid4())
+                            try:
+                                cur.execute(
+                                    'INSERT INTO RecipeSuggestion (title, ingredients, instructions, created_at) VALUES (%s,%s,%s,NOW())',
+                                    (recipe.get('title', 'Untitled')[:255], recipe.get('ingredients', '')[:500], recipe.get('instructions', '')[:1000])
+                                )
+                                saved_count += 1
+                            except Exception:
                                 try:
-                                    cur.execute(
-                                        'INSERT INTO RecipeSuggestion (title, ingredients, instructions, created_at) VALUES (%s,%s,%s,NOW())',
-                                        (recipe.get('title', 'Untitled')[:255], recipe.get('ingredients', '')[:500], recipe.get('instructions', '')[:1000])
-                                    )
+                                    cur.execute('INSERT INTO recipes (id, title, created_at) VALUES (%s,%s,NOW())',
+                                                (rid, recipe.get('title', 'Untitled')[:255]))
                                     saved_count += 1
                                 except Exception:
-                                    try:
-                                        cur.execute('INSERT INTO recipes (id, title, created_at) VALUES (%s,%s,NOW())',
-                                                    (rid, recipe.get('title', 'Untitled')[:255]))
-                                        saved_count += 1
-                                    except Exception:
-                                        pass
-                            conn.commit()
-                            conn.close()
-                            app.logger.info('Saved %d Gemini recipes to database', saved_count)
-                        except Exception as save_err:
-                            app.logger.warning('Failed to save recipes: %s', str(save_err))
-
-                        return jsonify({'success': True, 'recipes': recipes[:3], 'source': 'gemini'})
-                    else:
-                        last_error = f"HTTP {response.status_code}: {response.text[:200]}"
-                        app.logger.warning('Gemini API call failed (attempt %d): %s', attempt + 1, last_error)
-                        if response.status_code in [429, 503]:
-                            time.sleep(2 * (2 ** attempt))
-                        else:
-                            break
-                except Exception as req_err:
-                    last_error = str(req_err)
-                    app.logger.warning('Gemini request error (attempt %d): %s', attempt + 1, last_error)
-                    time.sleep(1 * (2 ** attempt))
+                                    pass
+                        conn.commit()
+                        conn.close()
+                        app.logger.info('Saved %d Gemini recipes to database', saved_count)
+                    except Exception as save_err:
+                        app.logger.warning('Failed to save recipes: %s', str(save_err))
+
+                    # Only well-formed answers are worth reusing
+                    if parsed:
+                        try:
+                            recipe_cache.put(cache_key, recipes[:3])
+                        except Exception as cache_err:
+                            app.logger.warning('Failed to cache recipes: %s', str(cache_err))
 
-            # All attempts failed -> use fallback
-            app.logger.warning('Gemini unavailable after retries, using fallback recipes')
+                return {'success': True, 'recipes': recipes[:3], 'source': 'gemini', 'cached': False}, 200
+            except LLMError as llm_error:
+                app.logger.warning('Gemini unavailable (%s), using fallback recipes', llm_error)
 
         # Fallback: Generate traditional South Indian recipes
         app.logger.info('Using fallback recipe generation with South Indian focus')
@@ -518,11 +681,66 @@ No extra text, just the JSON array with 3-5 authentic Indian recipes."""
         except Exception as save_err:
             app.logger.warning('Failed to save fallback recipes: %s', str(save_err))
         
-        return jsonify({'success': True, 'recipes': recipes[:3], 'source': 'fallback'})
+        return {'success': True, 'recipes': recipes[:3], 'source': 'fallback'}, 200
             
     except Exception as e:
         app.logger.exception('Failed to generate recipe')
-        return jsonify({'success': False, 'message': str(e)}), 500
+        return {'success': False, 'message': str(e)}, 500
+
+
+def run_recipe_job(refresh=False):
+    """Worker side of a recipe job: nobody is waiting on a connection, so Gemini gets its full deadline"""
+    body, status = generate_recipes(refresh=refresh, wait=RECIPE_LLM_DEADLINE_SECONDS)
+    return body, status == 200
+
+
+@app.route('/api/recipe_jobs', methods=['POST'])
+def api_create_recipe_job():
+    """Start generating recipes in the background; 202 with the job id, 503 if the queue is full"""
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes') or cache_bypassed()
+    try:
+        job = recipe_jobs.submit(run_recipe_job, refresh=refresh)
+    except QueueFull as e:
+        response = jsonify({'success': False, 'message': f'Recipe queue is full ({e}), try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    response = jsonify({'success': True, 'job': job,
+                        'status_url': f"/api/recipe_jobs/{job['id']}",
+                        'events_url': f"/api/recipe_jobs/{job['id']}/events"})
+    response.headers['Location'] = f"/api/recipe_jobs/{job['id']}"
+    return response, 202
+
+
+@app.route('/api/recipe_jobs', methods=['GET'])
+def api_recipe_jobs_stats():
+    """Queue depth, running jobs and counters"""
+    return jsonify({'success': True, 'jobs': recipe_jobs.stats()})
+
+
+@app.route('/api/recipe_jobs/<job_id>', methods=['GET'])
+def api_get_recipe_job(job_id):
+    """Job status; once status is done/failed, job.result is the /api/generate_recipe response body"""
+    job = recipe_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired job'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/recipe_jobs/<job_id>/events', methods=['GET'])
+def api_recipe_job_events(job_id):
+    """Server-Sent Events: a `job` event on every status change; the stream ends when the job finishes"""
+    if recipe_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired job'}), 404
+
+    def events():
+        for job in recipe_jobs.watch(job_id, timeout=RECIPE_LLM_DEADLINE_SECONDS + 60):
+            if job is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"id: {job['version']}\nevent: job\ndata: {json.dumps(job, default=str)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/api/recipes', methods=['POST'])
@@ -546,7 +764,68 @@ def api_save_recipe():
 
 @app.route('/api/voice/query', methods=['POST'])
 def api_voice_query():
-    """Process voice query about inventory using AI"""
+    """Process voice query about inventory using AI
+
+    ?stream=1 (or Accept: text/event-stream) answers with Server-Sent Events
+    instead: `delta` events carry a question's answer as Gemini writes it,
+    then one `done` event carries the usual JSON body (with its HTTP status).
+    """
+    started = time.perf_counter()
+    if (request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+            or 'text/event-stream' in request.headers.get('Accept', '')):
+        return stream_voice_query(started)
+    g.voice_path = None
+    response = answer_voice_query()
+    if g.voice_path:
+        voice_path_stats.record(g.voice_path, time.perf_counter() - started)
+    return response
+
+
+def stream_voice_query(started):
+    """SSE variant of /api/voice/query; the normal handler runs on a thread and feeds the stream"""
+    events = queue.Queue()
+
+    @copy_current_request_context
+    def work():
+        g.voice_path = None
+        try:
+            response = app.make_response(answer_voice_query(on_reply=lambda text: events.put(('delta', {'text': text}))))
+            body = dict(response.get_json() or {}, status=response.status_code)
+            if response.headers.get('X-Cache'):
+                body['cache'] = response.headers['X-Cache']
+        except Exception as e:
+            app.logger.exception('Streaming voice query failed')
+            body = {'success': False, 'message': str(e), 'status': 500}
+        if g.voice_path:
+            voice_path_stats.record(g.voice_path, time.perf_counter() - started)
+        events.put(('done', body))
+
+    threading.Thread(target=work, name='voice-stream', daemon=True).start()
+
+    def generate():
+        first_byte = None
+        while True:
+            try:
+                event, data = events.get(timeout=15)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+                voice_path_stats.record_first_byte(first_byte)
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+            if event == 'done':
+                return
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def answer_voice_query(on_reply=None):
+    """Body of /api/voice/query; sets g.voice_path to how the request was answered
+
+    on_reply streams the model's answer (see ask_voice_model); everything after it is unchanged.
+    """
     try:
         data = request.get_json() or {}
         query_text = data.get('query', '').strip()
@@ -557,641 +836,320 @@ def api_voice_query():
         
         app.logger.info('Voice query received: %s (language: %s)', query_text, language)
         
-        # Language mapping
-        language_names = {
-            'en': 'English',
-            'hi': 'Hindi (हिन्दी)',
-            'te': 'Telugu (తెలుగు)',
-            'ta': 'Tamil (தமிழ்)',
-            'kn': 'Kannada (ಕನ್ನಡ)',
-            'ml': 'Malayalam (മലയാളം)',
-            'mr': 'Marathi (मराठी)',
-            'bn': 'Bengali (বাংলা)',
-            'gu': 'Gujarati (ગુજરાતી)',
-            'pa': 'Punjabi (ਪੰਜਾਬੀ)'
-        }
-        
-        # Fetch current inventory
-        conn = get_conn()
-        cur = conn.cursor()
-        if TABLE_NAME == 'item':
-            cur.execute('SELECT id, label, quantity, expiry_date, location, status, added_date, source, confidence, camera_last_seen FROM item ORDER BY expiry_date ASC')
+        # Unambiguous commands are recognized locally (intent_matcher.py): no
+        # inventory read and no Gemini round trip
+        voice = local_intents.classify(query_text, language)
+        # Only commands are taken locally; questions always need the inventory below
+        items, inventory_text, cache_key, bypass = None, '', None, False
+        if voice['confidence'] >= intent_matcher.MIN_CONFIDENCE and voice['intent'] in ('add', 'remove', 'update'):
+            g.voice_path = 'local'
+            app.logger.info('Voice %s recognized locally: %s (confidence %.2f)',
+                            voice['intent'], voice['label'], voice['confidence'])
         else:
-            cur.execute('SELECT id, label, quantity, expiry_date, location FROM items ORDER BY expiry_date ASC')
-        items = cur.fetchall()
-        conn.close()
+            app.logger.info('Local intent match not confident (%s)', voice['reason'])
+            voice = None
+
+        if voice is None:
+            # Fetch current inventory
+            items = fetch_inventory_rows()
         
-        # Build inventory summary with ALL details
-        inventory_text = "\n".join([
-            f"- {item['label']} ({item.get('quantity', 'N/A')}) in {item.get('location', 'unknown location')}, expires: {item.get('expiry_date', 'no expiry set')}, status: {item.get('status', 'N/A')}"
-            for item in items
-        ])
+            # Compact inventory summary: duplicates merged, grouped by location, and
+            # for big inventories only what fits the token budget (items the query
+            # mentions and those expiring soon first)
+            version = inventory_version(items)
+            inventory_text = inventory_context.build(items, query_text, version)
         
-        # FIRST: Check if user wants to ADD, REMOVE, or UPDATE an item via voice
-        if GEMINI_API_KEY:
-            try:
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-                
-                # Check if this is an "add", "remove", or "update" command
-                detection_prompt = f"""Analyze this user command in ANY language: "{query_text}"
-
-The user may speak in English, Hindi, Telugu, Tamil, Kannada, Malayalam, Marathi, Bengali, Gujarati, Punjabi, or any other language.
-
-Is the user trying to ADD, REMOVE, or UPDATE an item in the fridge/freezer?
-
-**ADD** - Adding a completely new item (keywords: add, put, store, keep, insert, डालें, डालो, रखो, పెట్టు, சேர், ಹಾಕು, ഇടുക, टाका, রাখুন, મૂકો, ਪਾਓ):
-Return JSON: {{"action": "add", "label": "item name", "quantity": "amount", "location": "location name"}}
-
-**REMOVE** - Removing entire item (keywords: remove, delete, take out, निकालें, తీసివేయి, తీసివేయండి, எடு, ತೆಗೆದುಹಾಕு, നീക്കം, काढा, সরান, દૂર, ਹਟਾಓ):
-Return JSON: {{"action": "remove", "label": "item name in English"}}
-
-**UPDATE** - Modifying existing item (keywords: update, change, modify, set, बदलें, మార్చు, మార్చండి, మారుస్తున్నాను, மாற்று, ಬದಲಿಸು, മാറ്റുക, बदला, পরিবর্তন, બદલો, ਬਦਲੋ):
-Return JSON: {{"action": "update", "label": "item name in English", "field": "quantity", "value": "new amount with unit"}}
-(For expiry date: "field": "expiry_date", "value": "YYYY-MM-DD")
-(For location: "field": "location", "value": "Freezer/Fridge/Door/etc")
-
-If NONE of these (just a question/query):
-Return JSON: {{"action": "none"}}
-
-Examples in multiple languages:
-- English: "add fish to the freezer one quantity" => {{"action": "add", "label": "fish", "quantity": "1 unit", "location": "Freezer"}}
-- English: "Add 100 kilograms of mutton to inventory" => {{"action": "add", "label": "mutton", "quantity": "100 kg", "location": "Fridge"}}
-- English: "put 5 apples in inventory" => {{"action": "add", "label": "apple", "quantity": "5 units", "location": "Fridge"}}
-- English: "add mohan lal into the fridge" => {{"action": "add", "label": "mohan lal", "quantity": "1 unit", "location": "Fridge"}}
-- Hindi: "20 किलो मटन को फ्रीजर में डालें" => {{"action": "add", "label": "mutton", "quantity": "20 kg", "location": "Freezer"}}
-- Hindi: "फ्रीजर में 20 किलो चिकन रखो" => {{"action": "add", "label": "chicken", "quantity": "20 kg", "location": "Freezer"}}
-- Hindi: "इन्वेंटरी में 10 किलो चिकन डालो" => {{"action": "add", "label": "chicken", "quantity": "10 kg", "location": "Fridge"}}
-- Telugu: "ఫ్రీజర్‌లో 5 కిలోల చేపను పెట్టండి" => {{"action": "add", "label": "fish", "quantity": "5 kg", "location": "Freezer"}}
-- Tamil: "பால் 2 லிட்டர் சேர்" => {{"action": "add", "label": "milk", "quantity": "2 liters", "location": "Fridge"}}
-- Malayalam: "ഫ്രിഡ്ജിൽ 3 കിലോ മീൻ ഇടുക" => {{"action": "add", "label": "fish", "quantity": "3 kg", "location": "Fridge"}}
-- English: "remove fish from inventory" => {{"action": "remove", "label": "fish"}}
-- English: "remove mohan lal" => {{"action": "remove", "label": "mohan lal"}}
-- Hindi: "मटन को निकालें" => {{"action": "remove", "label": "mutton"}}
-- Telugu: "చికెన్ ని తీసివేయండి" => {{"action": "remove", "label": "chicken"}}
-- Malayalam: "ചിക്കൻ നീക്കം ചെയ്യുക" => {{"action": "remove", "label": "chicken"}}
-- English: "update mutton quantity to 30 kg" => {{"action": "update", "label": "mutton", "field": "quantity", "value": "30 kg"}}
-- English: "Set expiry date of chicken 25th November 2025" => {{"action": "update", "label": "chicken", "field": "expiry_date", "value": "2025-11-25"}}
-- English: "set expiry date for milk to 2025-11-15" => {{"action": "update", "label": "milk", "field": "expiry_date", "value": "2025-11-15"}}
-- English: "change chicken expiry to 15th December" => {{"action": "update", "label": "chicken", "field": "expiry_date", "value": "2025-12-15"}}
-- Hindi: "मटन की मात्रा 25 किलो करें" => {{"action": "update", "label": "mutton", "field": "quantity", "value": "25 kg"}}
-- English: "update quantity of mohan lal to 2" => {{"action": "update", "label": "mohan lal", "field": "quantity", "value": "2 units"}}
-- Telugu: "చికెన్ క్వాంటిటీ 20 కేజీలు నుంచి 30 కేజీల కి మార్చు" => {{"action": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
-- Telugu: "చికెన్ క్వాంటిటీని 20 కేజీల నుండి 30 కేజీలకు మారుస్తున్నాను" => {{"action": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
-- Malayalam: "ചിക്കൻ അളവ് 20 കിലോയിൽ നിന്ന് 30 കിലോയിലേക്ക് മാറ്റുക" => {{"action": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
-- Tamil: "சிக்கன் அளவை 20 கிலோவிலிருந்து 30 கிலோவாக மாற்றவும்" => {{"action": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
-- Kannada: "ಚಿಕನ್ ಪ್ರಮಾಣವನ್ನು 20 ಕೆಜಿಯಿಂದ 30 ಕೆಜಿಗೆ ಬದಲಾಯಿಸಿ" => {{"action": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
-- Hindi: "मटन की मात्रा 20 किलो से 30 किलो कर दें" => {{"action": "update", "label": "mutton", "field": "quantity", "value": "30 kg"}}
-- English: "reduce apple quantity by 1" => {{"action": "update", "label": "apple", "field": "quantity", "value": "reduce:1"}}
-- English: "move chicken to freezer" => {{"action": "update", "label": "chicken", "field": "location", "value": "Freezer"}}
-- English: "what's in my fridge?" => {{"action": "none"}}
-- Hindi: "फ्रिज में क्या है?" => {{"action": "none"}}
-
-CRITICAL RULES:
-1. **Item names can be ANYTHING** - food (chicken, mutton), human names (mohan lal, rajesh), or any text
-2. **Translation**: చికెన్→chicken, ചിക്കൻ→chicken, சிக்கன்→chicken, मटन→mutton, చేప→fish, मीन→fish, but keep names as-is
-3. **Unit conversions for all languages**:
-   - Telugu: కిలోలు/కేజీలు→kg, లీటర్లు→liters, యూనిట్లు→units
-   - Malayalam: കിലോ→kg, ലിറ്റർ→liters
-   - Tamil: கிலோ→kg, லிட்டர்→liters
-   - Kannada: ಕೆಜಿ→kg, ಲೀಟರ್→liters
-   - Hindi: किलो→kg, लीटर→liters
-4. **Quantity reduction**: use "reduce:X" format
-5. **UPDATE quantity**: Extract the NEW/TARGET value (the destination quantity). Look for "from X to Y" patterns:
-6. **Language-specific "from-to" patterns** (always extract Y as the new value):
-   - Telugu: "X నుంచి Y కి", "X నుండి Y కు" → value = Y
-   - Malayalam: "X ൽ നിന്ന് Y ലേക്ക്", "X യിൽ നിന്ന് Y യിലേക്ക്" → value = Y
-   - Tamil: "X இலிருந்து Y ஆக", "X விலிருந்து Y வாக" → value = Y
-   - Kannada: "X ಇಂದ Y ಗೆ", "X ಯಿಂದ Y ಕ್ಕೆ" → value = Y
-   - Hindi: "X से Y", "X से Y कर दें" → value = Y
-   - English: "from X to Y", "X to Y" → value = Y
-7. **Expiry dates**: Convert to YYYY-MM-DD (e.g., "25th November 2025" → "2025-11-25")
-8. **Location**: "inventory" or "इन्वेंटरी" → "Fridge". Options: Freezer, Fridge, Door, Top Shelf, Middle Shelf, Bottom Shelf
-9. **Return ONLY valid JSON** - no extra text"""
-
-                headers = {'Content-Type': 'application/json'}
-                payload = {
-                    "contents": [{
-                        "parts": [{
-                            "text": detection_prompt
-                        }]
-                    }]
-                }
-                
-                response = requests.post(url, headers=headers, json=payload, timeout=10)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    ai_response = result['candidates'][0]['content']['parts'][0]['text'].strip()
-                    
-                    # Parse JSON response
-                    try:
-                        # Clean markdown if present
-                        if '```json' in ai_response:
-                            ai_response = ai_response.split('```json')[1].split('```')[0]
-                        elif '```' in ai_response:
-                            ai_response = ai_response.split('```')[1].split('```')[0]
-                        
-                        ai_response = ai_response.strip()
-                        detection_result = json.loads(ai_response)
-                        
-                        action = detection_result.get('action', 'none')
-                        
-                        # HANDLE ADD COMMAND
-                        if action == 'add':
-                            label = detection_result.get('label', '').strip()
-                            quantity = detection_result.get('quantity', '1 unit').strip()
-                            location = detection_result.get('location', 'Fridge').strip()
-                            
-                            if label:
-                                app.logger.info(f'Voice ADD detected: {label} ({quantity}) to {location}')
-                                
-                                # Add item to database
-                                conn = get_conn()
-                                cur = conn.cursor()
-                                
-                                if TABLE_NAME == 'item':
-                                    cur.execute(
-                                        'INSERT INTO item (label, quantity, location, added_date, expiry_date, status, source) VALUES (%s,%s,%s,NOW(),%s,%s,%s)',
-                                        (label, quantity, location, None, 'Fresh', 'voice')
-                                    )
-                                    conn.commit()
-                                    item_id = cur.lastrowid
-                                else:
-                                    item_id = str(uuid.uuid4())
-                                    cur.execute(
-                                        'INSERT INTO items (id, label, quantity, expiry_date, location) VALUES (%s,%s,%s,%s,%s)',
-                                        (item_id, label, quantity, None, location)
-                                    )
-                                    conn.commit()
-                                
-                                conn.close()
-                                
-                                app.logger.info(f'Item added via voice: ID {item_id}')
-                                
-                                # Create English response first
-                                response_text = f"✓ Added {label} ({quantity}) to {location}"
-                                
-                                # Translate to selected language if not English
-                                if language != 'en':
-                                    try:
-                                        lang_name = language_names.get(language, language)
-                                        translate_url = f"https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-                                        translate_prompt = f"Translate this message to {lang_name}: '{response_text}'. Return ONLY the translation, nothing else."
-                                        
-                                        translate_response = requests.post(
-                                            translate_url, 
-                                            headers={'Content-Type': 'application/json'}, 
-                                            json={{"contents": [{{"parts": [{{"text": translate_prompt}}]}}]}},
-                                            timeout=10
-                                        )
-                                        
-                                        if translate_response.status_code == 200:
-                                            translate_result = translate_response.json()
-                                            translated = translate_result['candidates'][0]['content']['parts'][0]['text'].strip()
-                                            translated = translated.strip('"').strip("'").strip()
-                                            response_text = translated
-                                            app.logger.info(f'Translated response: {response_text}')
-                                    except Exception as e:
-                                        app.logger.warning(f'Translation failed: {e}')
-                                
-                                # Return success response
-                                return jsonify({
-                                    'success': True,
-                                    'action': 'item_added',
-                                    'query': query_text,
-                                    'response': response_text,
-                                    'item_id': item_id,
-                                    'item_data': {
-                                        'label': label,
-                                        'quantity': quantity,
-                                        'location': location
-                                    },
-                                    'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                                })
-                        
-                        # HANDLE REMOVE COMMAND
-                        elif action == 'remove':
-                            label = detection_result.get('label', '').strip()
-                            
-                            if label:
-                                app.logger.info(f'Voice REMOVE detected: {label}')
-                                
-                                # Find and remove item from database
-                                conn = get_conn()
-                                cur = conn.cursor()
-                                
-                                # Find item by label (case-insensitive)
-                                if TABLE_NAME == 'item':
-                                    cur.execute('SELECT id FROM item WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
-                                else:
-                                    cur.execute('SELECT id FROM items WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
-                                
-                                item = cur.fetchone()
-                                
-                                if item:
-                                    item_id = item['id']
-                                    
-                                    # Delete the item
-                                    if TABLE_NAME == 'item':
-                                        cur.execute('DELETE FROM item WHERE id = %s', (item_id,))
-                                    else:
-                                        cur.execute('DELETE FROM items WHERE id = %s', (item_id,))
-                                    
-                                    conn.commit()
-                                    conn.close()
-                                    
-                                    app.logger.info(f'Item removed via voice: {label} (ID {item_id})')
-                                    
-                                    # Create English response first
-                                    response_text = f"✓ Removed {label} from inventory"
-                                    
-                                    # Translate to selected language if not English
-                                    if language != 'en':
-                                        try:
-                                            lang_name = language_names.get(language, language)
-                                            translate_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-                                            translate_prompt = f"Translate this message to {lang_name}: '{response_text}'. Return ONLY the translation, nothing else."
-                                            
-                                            translate_response = requests.post(
-                                                translate_url, 
-                                                headers={'Content-Type': 'application/json'}, 
-                                                json={{"contents": [{{"parts": [{{"text": translate_prompt}}]}}]}},
-                                                timeout=10
-                                            )
-                                            
-                                            if translate_response.status_code == 200:
-                                                translate_result = translate_response.json()
-                                                translated = translate_result['candidates'][0]['content']['parts'][0]['text'].strip()
-                                                translated = translated.strip('"').strip("'").strip()
-                                                response_text = translated
-                                                app.logger.info(f'Translated response: {response_text}')
-                                        except Exception as e:
-                                            app.logger.warning(f'Translation failed: {e}')
-                                    
-                                    # Return success response
-                                    return jsonify({
-                                        'success': True,
-                                        'action': 'item_removed',
-                                        'query': query_text,
-                                        'response': response_text,
-                                        'item_id': item_id,
-                                        'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                                    })
-                                else:
-                                    # Item not found
-                                    conn.close()
-                                    
-                                    # Create English error message
-                                    response_text = f"❌ {label} not found in inventory"
-                                    
-                                    # Translate to selected language if not English
-                                    if language != 'en':
-                                        try:
-                                            lang_name = language_names.get(language, language)
-                                            translate_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-                                            translate_prompt = f"Translate this message to {lang_name}: '{response_text}'. Return ONLY the translation, nothing else."
-                                            
-                                            translate_response = requests.post(
-                                                translate_url, 
-                                                headers={'Content-Type': 'application/json'}, 
-                                                json={{"contents": [{{"parts": [{{"text": translate_prompt}}]}}]}},
-                                                timeout=10
-                                            )
-                                            
-                                            if translate_response.status_code == 200:
-                                                translate_result = translate_response.json()
-                                                translated = translate_result['candidates'][0]['content']['parts'][0]['text'].strip()
-                                                translated = translated.strip('"').strip("'").strip()
-                                                response_text = translated
-                                        except Exception as e:
-                                            app.logger.warning(f'Translation failed: {e}')
-                                    
-                                    return jsonify({
-                                        'success': False,
-                                        'action': 'item_not_found',
-                                        'query': query_text,
-                                        'response': response_text,
-                                        'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                                    })
-                        
-                        # HANDLE UPDATE COMMAND
-                        elif action == 'update':
-                            label = detection_result.get('label', '').strip()
-                            field = detection_result.get('field', '').strip()
-                            value = detection_result.get('value', '').strip()
-                            
-                            if label and field and value:
-                                app.logger.info(f'Voice UPDATE detected: {label} - {field} = {value}')
-                                
-                                # Find item in database
-                                conn = get_conn()
-                                cur = conn.cursor()
-                                
-                                if TABLE_NAME == 'item':
-                                    app.logger.info(f'Searching for item with label: {label}')
-                                    cur.execute('SELECT id, label, quantity, expiry_date, location, status, added_date, source, confidence, camera_last_seen FROM item WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
-                                else:
-                                    cur.execute('SELECT id, label, quantity, expiry_date, location FROM items WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
-                                
-                                item = cur.fetchone()
-                                app.logger.info(f'Found item: {item}')
-                                
-                                if item:
-                                    item_id = item['id']
-                                    
-                                    # Process the update based on field
-                                    if field == 'quantity':
-                                        # Handle quantity reduction (e.g., "reduce:1")
-                                        if value.startswith('reduce:'):
-                                            try:
-                                                reduce_amount = int(value.split(':')[1])
-                                                current_qty = item.get('quantity', '1 unit')
-                                                
-                                                # Extract current number from quantity string
-                                                current_match = re.search(r'(\d+)', current_qty)
-                                                if current_match:
-                                                    current_num = int(current_match.group(1))
-                                                    new_num = max(0, current_num - reduce_amount)
-                                                    
-                                                    # Keep the unit part
-                                                    unit_part = re.sub(r'\d+', '', current_qty).strip()
-                                                    new_quantity = f"{new_num} {unit_part}".strip() if unit_part else str(new_num)
-                                                else:
-                                                    new_quantity = f"{max(0, 1 - reduce_amount)} unit"
-                                                
-                                                value = new_quantity
-                                            except:
-                                                value = "0 unit"
-                                        
-                                        # SMART VALIDATION: Detect potentially misheard numbers
-                                        current_qty = item.get('quantity', '0')
-                                        current_match = re.search(r'(\d+)', str(current_qty))
-                                        new_match = re.search(r'(\d+)', str(value))
-                                        
-                                        if current_match and new_match:
-                                            current_num = int(current_match.group(1))
-                                            new_num = int(new_match.group(1))
-                                            
-                                            # Flag suspicious changes (e.g., 20 → 220, 5 → 50)
-                                            if new_num > current_num * 5 and new_num > 50:
-                                                # Likely mishearing: try common corrections
-                                                # 220 kg → 20 kg, 230 kg → 23 kg, 500 g → 50 g
-                                                corrected_num = None
-                                                if new_num >= 200 and new_num < 300:
-                                                    corrected_num = new_num // 10  # 220 → 22
-                                                elif new_num >= 100 and new_num < 200:
-                                                    corrected_num = new_num // 10  # 150 → 15
-                                                elif new_num >= 500:
-                                                    corrected_num = new_num // 10  # 500 → 50
-                                                
-                                                if corrected_num and corrected_num > 0:
-                                                    # Apply correction
-                                                    unit_part = re.sub(r'\d+', '', str(value)).strip()
-                                                    value = f"{corrected_num} {unit_part}".strip() if unit_part else str(corrected_num)
-                                                    app.logger.info(f'Auto-corrected quantity: {new_num} → {corrected_num} (likely speech recognition error)')
-                                        
-                                        # Update quantity
-                                        if TABLE_NAME == 'item':
-                                            cur.execute('UPDATE item SET quantity = %s WHERE id = %s', (value, item_id))
-                                        else:
-                                            cur.execute('UPDATE items SET quantity = %s WHERE id = %s', (value, item_id))
-                                        
-                                        response_msg = f"✓ Updated {label} quantity to {value}"
-                                    
-                                    elif field == 'expiry_date':
-                                        # Update expiry date
-                                        app.logger.info(f'Updating expiry_date for item_id={item_id}, label={label}, value={value}')
-                                        if TABLE_NAME == 'item':
-                                            cur.execute('UPDATE item SET expiry_date = %s WHERE id = %s', (value, item_id))
-                                            rows_affected = cur.rowcount
-                                            app.logger.info(f'Expiry update affected {rows_affected} rows')
-                                        else:
-                                            cur.execute('UPDATE items SET expiry_date = %s WHERE id = %s', (value, item_id))
-                                            rows_affected = cur.rowcount
-                                            app.logger.info(f'Expiry update affected {rows_affected} rows')
-                                        
-                                        response_msg = f"✓ Set {label} expiry date to {value}"
-                                    
-                                    elif field == 'location':
-                                        # Update location
-                                        if TABLE_NAME == 'item':
-                                            cur.execute('UPDATE item SET location = %s WHERE id = %s', (value, item_id))
-                                        else:
-                                            cur.execute('UPDATE items SET location = %s WHERE id = %s', (value, item_id))
-                                        
-                                        response_msg = f"✓ Moved {label} to {value}"
-                                    
-                                    else:
-                                        conn.close()
-                                        return jsonify({
-                                            'success': False,
-                                            'action': 'invalid_field',
-                                            'query': query_text,
-                                            'response': f"❌ Cannot update field: {field}",
-                                            'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                                        })
-                                    
-                                    conn.commit()
-                                    app.logger.info(f'Database commit successful for {label} - {field} update')
-                                    conn.close()
-                                    
-                                    app.logger.info(f'Item updated via voice: {label} (ID {item_id})')
-                                    
-                                    # Translate response to selected language
-                                    if language != 'en':
-                                        try:
-                                            lang_name = language_names.get(language, language)
-                                            translate_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-                                            translate_prompt = f"Translate this message to {lang_name}: '{response_msg}'. Return ONLY the translation, nothing else."
-                                            
-                                            translate_response = requests.post(
-                                                translate_url, 
-                                                headers={'Content-Type': 'application/json'}, 
-                                                json={{"contents": [{{"parts": [{{"text": translate_prompt}}]}}]}},
-                                                timeout=10
-                                            )
-                                            
-                                            if translate_response.status_code == 200:
-                                                translate_result = translate_response.json()
-                                                translated = translate_result['candidates'][0]['content']['parts'][0]['text'].strip()
-                                                translated = translated.strip('"').strip("'").strip()
-                                                response_msg = translated
-                                                app.logger.info(f'Translated response: {response_msg}')
-                                        except Exception as e:
-                                            app.logger.warning(f'Translation failed: {e}')
-                                    
-                                    # Return success response
-                                    return jsonify({
-                                        'success': True,
-                                        'action': 'item_updated',
-                                        'query': query_text,
-                                        'response': response_msg,
-                                        'item_id': item_id,
-                                        'update_field': field,
-                                        'update_value': value,
-                                        'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                                    })
-                                else:
-                                    # Item not found for UPDATE
-                                    conn.close()
-                                    
-                                    # Create English error message
-                                    response_text = f"❌ {label} not found in inventory"
-                                    
-                                    # Translate to selected language if not English
-                                    if language != 'en':
-                                        try:
-                                            lang_name = language_names.get(language, language)
-                                            translate_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-                                            translate_prompt = f"Translate this message to {lang_name}: '{response_text}'. Return ONLY the translation, nothing else."
-                                            
-                                            translate_response = requests.post(
-                                                translate_url, 
-                                                headers={'Content-Type': 'application/json'}, 
-                                                json={{"contents": [{{"parts": [{{"text": translate_prompt}}]}}]}},
-                                                timeout=10
-                                            )
-                                            
-                                            if translate_response.status_code == 200:
-                                                translate_result = translate_response.json()
-                                                translated = translate_result['candidates'][0]['content']['parts'][0]['text'].strip()
-                                                translated = translated.strip('"').strip("'").strip()
-                                                response_text = translated
-                                        except Exception as e:
-                                            app.logger.warning(f'Translation failed: {e}')
-                                    
-                                    return jsonify({
-                                        'success': False,
-                                        'action': 'item_not_found',
-                                        'query': query_text,
-                                        'response': response_text,
-                                        'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                                    })
-                    except Exception as parse_error:
-                        app.logger.warning(f'Could not parse command detection: {parse_error}')
-            except Exception as detection_error:
-                app.logger.warning(f'Command detection failed: {detection_error}')
-                
-                # Check if query looks like an ADD/REMOVE/UPDATE command
-                command_keywords = ['add', 'put', 'store', 'remove', 'delete', 'update', 'change', 'set', 'move', 
-                                   'डालें', 'डालो', 'रखो', 'निकालें', 'बदलें', 'into', 'to the', 'in the']
-                query_lower = query_text.lower()
-                is_likely_command = any(keyword in query_lower for keyword in command_keywords)
-                
-                if is_likely_command:
-                    # This looks like a command - return error asking user to retry
-                    app.logger.info(f'Detected likely ADD/REMOVE/UPDATE command but API failed')
-                    return jsonify({
-                        'success': False,
-                        'action': 'detection_error',
-                        'query': query_text,
-                        'response': 'Sorry, the voice command system is temporarily unavailable. Please try again in a moment.',
-                        'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                    }), 503
+            # Informational answers only change with the inventory or the date
+            # ("what's expiring"), so repeated questions are served from the cache.
+            # Only answers to non-commands are ever stored, so commands always miss.
+            cache_key = (normalize_query(query_text), language,
+                         fingerprint(version, datetime.date.today()))
+            bypass = cache_bypassed()
+            if bypass:
+                voice_cache.bypass()
+            else:
+                cached = voice_cache.get(cache_key)
+                if cached is not None:
+                    app.logger.info('Voice query served from cache')
+                    g.voice_path = 'cache'
+                    response = jsonify(dict(cached, query=query_text, cached=True,
+                                            timestamp=datetime.datetime.now().strftime('%I:%M %p')))
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
         
-        # SECOND: Process as regular query if not an add/remove/update command
-        if GEMINI_API_KEY:
-            try:
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-                
-                # Build prompt with language instruction
-                lang_instruction = ""
-                if language != 'en':
-                    lang_name = language_names.get(language, language)
-                    lang_instruction = (
-                        "\n\nCRITICAL INSTRUCTION: The user may ask in English or any language, "
-                        f"but you MUST respond ONLY in {lang_name}. Translate your ENTIRE response to {lang_name}."
-                    )
+            # Otherwise one Gemini call classifies the command, extracts the item and
+            # writes the reply in the user's language (see voice_assistant.py)
+            if GEMINI_API_KEY:
+                try:
+                    voice = ask_voice_model(query_text, language, inventory_text, key=('voice',) + cache_key,
+                                            on_reply=on_reply)
+                    g.voice_path = 'llm'
+                    app.logger.info('Voice intent: %s %s', voice['intent'], voice['label'])
+                except Exception as ai_error:
+                    app.logger.warning('Voice model call failed: %s', str(ai_error))
+
+        # HANDLE ADD COMMAND
+        if voice and voice['intent'] == 'add' and voice['label']:
+            label = voice['label']
+            quantity = voice['quantity'] or '1 unit'
+            location = voice['location'] or 'Fridge'
+            app.logger.info(f'Voice ADD detected: {label} ({quantity}) to {location}')
+
+            # Add item to database
+            conn = get_conn()
+            cur = conn.cursor()
 
-                prompt = (
-                    f"""You are a smart fridge voice assistant. Respond concisely, clearly, and in a neutral, professional tone unless the user specifically requests recipes. For recipe requests only, use a warm but brief tone as defined below.
-
-Current inventory:
-{inventory_text}
-
-User question: {query_text}
-
-TONE:
-- Be concise and to the point; avoid friendly small-talk or conversational filler unless the user asks for recipes.
-- Do not use exclamations, overly casual phrases, or emotional wording in general responses.
-- Use natural, direct language and avoid sounding like a chatbot.
-
-STRICT RULES:
-1. Answer ONLY the specific question asked - be precise and direct
-2. If they ask about quantity (e.g., "how many mutton"), check the inventory and respond with the EXACT quantity from the data
-3. **If they ask what is present/available in the fridge, list ALL items from the inventory above** - include item name, quantity, and location for EVERY item. Do NOT truncate or summarize - show the complete list.
-4. **If they ask for recipes (especially regional like Kerala, Tamil Nadu, Andhra, Karnataka, etc.):**
-   - Provide 2-3 traditional recipes maximum
-   - Keep EACH recipe to 3-4 lines ONLY (dish name, 1-2 key ingredients from fridge, quick cooking note)
-   - Use a warm, conversational tone only for these recipe entries; keep all other responses neutral
-   - Format: "**Dish Name**: Use [fridge items]. Brief cooking tip in one sentence."
-   - Example: "**Kerala Fish Curry**: Use your fish with coconut, curry leaves, and tamarind. Simmer with spices for 20 minutes."
-5. If they ask what's expiring, mention ONLY expiring items (elaborate with some suggestions)
-6. If they ask what you have, list ALL the items with their quantities and locations
-7. Do NOT add extra information, dates, or recommendations unless specifically asked
-8. When listing items, format clearly: "- item_name (quantity) in location" for each item on a new line
-9. Be direct and to the point{lang_instruction}
-10. Always tell where are the items located in the fridge if explicitly asked
-11. For recipe requests, be warm but brief - 2-3 dishes, 3-4 lines each maximum
-12. Answer any questions about the inventory based on the inventory data only
-13. If asked about a specific item (like "how many mutton"), search the inventory list above and respond with the exact quantity
-14. If an item is NOT in the inventory, respond: "I don't see any [item] in the fridge right now."
-15. DO NOT give generic responses like "Would you like to know what's expiring" - answer the specific question asked
-16. User can ask about specific items, quantities, locations - answer accurately from the inventory data
-17. If the question is unrelated to fridge inventory, respond naturally as a helpful assistant (neutral tone)
-18. **CRITICAL: When user asks "list items", "what's in the fridge", "show items" - YOU MUST list EVERY SINGLE item from the inventory above. Count the items in the inventory and make sure you list all of them.**
-19. **RECIPES: When asked for Kerala/Tamil/Andhra/Karnataka/Bengali/Punjabi etc. recipes, give 2-3 quick traditional dishes. Keep it brief and practical - dish name, fridge items to use, quick cooking tip. Don't over-elaborate.**
-20. LANGUAGE HANDLING: If language is {language} (not English), respond ENTIRELY in {language} script. When user mixes English words in their {language} query (e.g., "Add tomatoes to fridge" in Telugu), transliterate those English words phonetically into {language} script in your response. Example: "tomatoes" becomes "టొమాటోలు", "fridge" becomes "ఫ్రిజ్". Never use English words in your {language} response.
-
-"""
+            if TABLE_NAME == 'item':
+                cur.execute(
+                    'INSERT INTO item (label, quantity, location, added_date, expiry_date, status, source) VALUES (%s,%s,%s,NOW(),%s,%s,%s)',
+                    (label, quantity, location, None, 'Fresh', 'voice')
                 )
+                conn.commit()
+                item_id = cur.lastrowid
+            else:
+                item_id = str(uuid.uuid4())
+                cur.execute(
+                    'INSERT INTO items (id, label, quantity, expiry_date, location) VALUES (%s,%s,%s,%s,%s)',
+                    (item_id, label, quantity, None, location)
+                )
+                conn.commit()
 
-                headers = {'Content-Type': 'application/json'}
-                payload = {
-                    "contents": [{
-                        "parts": [{
-                            "text": prompt
-                        }]
-                    }]
-                }
-                
-                response = requests.post(url, headers=headers, json=payload, timeout=15)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    response_text = result['candidates'][0]['content']['parts'][0]['text'].strip()
-                    
-                    # Clean up Markdown formatting for cleaner display
-                    response_text = response_text.replace('**', '')
-                    
-                    app.logger.info('AI response generated: %s', response_text[:100])
-                    
-                    # Save to voice query log
+            conn.close()
+
+            inventory_changed()
+            app.logger.info(f'Item added via voice: ID {item_id}')
+
+            return jsonify({
+                'success': True,
+                'action': 'item_added',
+                'query': query_text,
+                'response': localized_reply(voice['reply'], f"✓ Added {label} ({quantity}) to {location}", language),
+                'item_id': item_id,
+                'item_data': {
+                    'label': label,
+                    'quantity': quantity,
+                    'location': location
+                },
+                'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+            })
+
+        # HANDLE REMOVE COMMAND
+        if voice and voice['intent'] == 'remove' and voice['label']:
+            label = voice['label']
+            app.logger.info(f'Voice REMOVE detected: {label}')
+
+            # Find and remove item from database
+            conn = get_conn()
+            cur = conn.cursor()
+
+            # Find item by label (case-insensitive)
+            if TABLE_NAME == 'item':
+                cur.execute('SELECT id FROM item WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
+            else:
+                cur.execute('SELECT id FROM items WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
+
+            item = cur.fetchone()
+
+            if not item:
+                conn.close()
+                return jsonify({
+                    'success': False,
+                    'action': 'item_not_found',
+                    'query': query_text,
+                    'response': localized_reply(voice['not_found_reply'], f"❌ {label} not found in inventory", language),
+                    'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+                })
+
+            item_id = item['id']
+
+            # Delete the item
+            if TABLE_NAME == 'item':
+                cur.execute('DELETE FROM item WHERE id = %s', (item_id,))
+            else:
+                cur.execute('DELETE FROM items WHERE id = %s', (item_id,))
+
+            conn.commit()
+            conn.close()
+            inventory_changed()
+
+            app.logger.info(f'Item removed via voice: {label} (ID {item_id})')
+
+            return jsonify({
+                'success': True,
+                'action': 'item_removed',
+                'query': query_text,
+                'response': localized_reply(voice['reply'], f"✓ Removed {label} from inventory", language),
+                'item_id': item_id,
+                'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+            })
+
+        # HANDLE UPDATE COMMAND
+        if voice and voice['intent'] == 'update' and voice['label'] and voice['field'] and voice['value']:
+            label = voice['label']
+            field = voice['field']
+            value = voice['value']
+            app.logger.info(f'Voice UPDATE detected: {label} - {field} = {value}')
+
+            # Find item in database
+            conn = get_conn()
+            cur = conn.cursor()
+
+            if TABLE_NAME == 'item':
+                app.logger.info(f'Searching for item with label: {label}')
+                cur.execute('SELECT id, label, quantity, expiry_date, location, status, added_date, source, confidence, camera_last_seen FROM item WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
+            else:
+                cur.execute('SELECT id, label, quantity, expiry_date, location FROM items WHERE LOWER(label) = LOWER(%s) LIMIT 1', (label,))
+
+            item = cur.fetchone()
+            app.logger.info(f'Found item: {item}')
+
+            if not item:
+                conn.close()
+                return jsonify({
+                    'success': False,
+                    'action': 'item_not_found',
+                    'query': query_text,
+                    'response': localized_reply(voice['not_found_reply'], f"❌ {label} not found in inventory", language),
+                    'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+                })
+
+            item_id = item['id']
+
+            # Process the update based on field
+            if field == 'quantity':
+                # Handle quantity reduction (e.g., "reduce:1")
+                if value.startswith('reduce:'):
                     try:
-                        conn = get_conn()
-                        cur = conn.cursor()
-                        cur.execute(
-                            'INSERT INTO VoiceQuery (query_text, response_text, created_at) VALUES (%s,%s,NOW())',
-                            (query_text, response_text)
-                        )
-                        conn.commit()
-                        conn.close()
+                        reduce_amount = int(value.split(':')[1])
+                        current_qty = item.get('quantity', '1 unit')
+
+                        # Extract current number from quantity string
+                        current_match = re.search(r'(\d+)', current_qty)
+                        if current_match:
+                            current_num = int(current_match.group(1))
+                            new_num = max(0, current_num - reduce_amount)
+
+                            # Keep the unit part
+                            unit_part = re.sub(r'\d+', '', current_qty).strip()
+                            new_quantity = f"{new_num} {unit_part}".strip() if unit_part else str(new_num)
+                        else:
+                            new_quantity = f"{max(0, 1 - reduce_amount)} unit"
+
+                        value = new_quantity
                     except:
-                        pass  # Don't fail if logging doesn't work
-                    
-                    return jsonify({
-                        'success': True,
-                        'query': query_text,
-                        'response': response_text,
-                        'timestamp': datetime.datetime.now().strftime('%I:%M %p')
-                    })
+                        value = "0 unit"
+
+                # SMART VALIDATION: Detect potentially misheard numbers
+                current_qty = item.get('quantity', '0')
+                current_match = re.search(r'(\d+)', str(current_qty))
+                new_match = re.search(r'(\d+)', str(value))
+
+                if current_match and new_match:
+                    current_num = int(current_match.group(1))
+                    new_num = int(new_match.group(1))
+
+                    # Flag suspicious changes (e.g., 20 → 220, 5 → 50)
+                    if new_num > current_num * 5 and new_num > 50:
+                        # Likely mishearing: try common corrections
+                        # 220 kg → 20 kg, 230 kg → 23 kg, 500 g → 50 g
+                        corrected_num = None
+                        if new_num >= 200 and new_num < 300:
+                            corrected_num = new_num // 10  # 220 → 22
+                        elif new_num >= 100 and new_num < 200:
+                            corrected_num = new_num // 10  # 150 → 15
+                        elif new_num >= 500:
+                            corrected_num = new_num // 10  # 500 → 50
+
+                        if corrected_num and corrected_num > 0:
+                            # Apply correction
+                            unit_part = re.sub(r'\d+', '', str(value)).strip()
+                            value = f"{corrected_num} {unit_part}".strip() if unit_part else str(corrected_num)
+                            app.logger.info(f'Auto-corrected quantity: {new_num} → {corrected_num} (likely speech recognition error)')
+
+                # Update quantity
+                if TABLE_NAME == 'item':
+                    cur.execute('UPDATE item SET quantity = %s WHERE id = %s', (value, item_id))
                 else:
-                    raise Exception(f"Gemini API error: {response.status_code}")
-                    
-            except Exception as ai_error:
-                app.logger.warning('AI query failed: %s', str(ai_error))
-        
+                    cur.execute('UPDATE items SET quantity = %s WHERE id = %s', (value, item_id))
+
+                response_msg = f"✓ Updated {label} quantity to {value}"
+
+            elif field == 'expiry_date':
+                # Update expiry date
+                app.logger.info(f'Updating expiry_date for item_id={item_id}, label={label}, value={value}')
+                if TABLE_NAME == 'item':
+                    cur.execute('UPDATE item SET expiry_date = %s WHERE id = %s', (value, item_id))
+                else:
+                    cur.execute('UPDATE items SET expiry_date = %s WHERE id = %s', (value, item_id))
+                app.logger.info(f'Expiry update affected {cur.rowcount} rows')
+
+                response_msg = f"✓ Set {label} expiry date to {value}"
+
+            else:
+                # Update location
+                if TABLE_NAME == 'item':
+                    cur.execute('UPDATE item SET location = %s WHERE id = %s', (value, item_id))
+                else:
+                    cur.execute('UPDATE items SET location = %s WHERE id = %s', (value, item_id))
+
+                response_msg = f"✓ Moved {label} to {value}"
+
+            conn.commit()
+            app.logger.info(f'Database commit successful for {label} - {field} update')
+            conn.close()
+            inventory_changed()
+
+            app.logger.info(f'Item updated via voice: {label} (ID {item_id})')
+
+            # The model's reply quotes its own value; if we reduced or corrected
+            # it, only our message has the right number
+            model_reply = voice['reply'] if value == voice['value'] else ''
+            return jsonify({
+                'success': True,
+                'action': 'item_updated',
+                'query': query_text,
+                'response': localized_reply(model_reply, response_msg, language),
+                'item_id': item_id,
+                'update_field': field,
+                'update_value': value,
+                'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+            })
+
+        # Otherwise it was a question: the reply is the answer
+        if voice and voice['intent'] == 'none' and voice['reply']:
+            # Clean up Markdown formatting for cleaner display
+            response_text = voice['reply'].replace('**', '')
+
+            app.logger.info('AI response generated: %s', response_text[:100])
+
+            # Save to voice query log
+            try:
+                conn = get_conn()
+                cur = conn.cursor()
+                cur.execute(
+                    'INSERT INTO VoiceQuery (query_text, response_text, created_at) VALUES (%s,%s,NOW())',
+                    (query_text, response_text)
+                )
+                conn.commit()
+                conn.close()
+            except:
+                pass  # Don't fail if logging doesn't work
+
+            if cache_key is not None:
+                voice_cache.put(cache_key, {'success': True, 'response': response_text})
+            response = jsonify({
+                'success': True,
+                'query': query_text,
+                'response': response_text,
+                'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+            })
+            response.headers['X-Cache'] = 'BYPASS' if bypass else 'MISS'
+            return response
+
         # Fallback: rule-based responses (smarter detection for common commands)
+        g.voice_path = 'fallback'
+        if items is None:
+            items = fetch_inventory_rows()
         query_lower = query_text.lower()
         
         # Check for ADD command in fallback
@@ -1233,6 +1191,7 @@ STRICT RULES:
                             )
                             conn.commit()
                         conn.close()
+                        inventory_changed()
                         app.logger.info(f'Item added via fallback voice: {label} (ID {item_id})')
                         
                         response_text = f"✓ Added {label} ({quantity}) to {location}"
@@ -1244,6 +1203,20 @@ STRICT RULES:
                         })
                     except Exception as e:
                         app.logger.error(f'Fallback add failed: {e}')
+
+        # Don't answer a command we could not carry out as if it were a question
+        if GEMINI_API_KEY and voice is None:
+            command_keywords = ['add', 'put', 'store', 'remove', 'delete', 'update', 'change', 'set', 'move',
+                                'डालें', 'डालो', 'रखो', 'निकालें', 'बदलें', 'into', 'to the', 'in the']
+            if any(keyword in query_lower for keyword in command_keywords):
+                app.logger.info('Detected likely ADD/REMOVE/UPDATE command but API failed')
+                return jsonify({
+                    'success': False,
+                    'action': 'detection_error',
+                    'query': query_text,
+                    'response': 'Sorry, the voice command system is temporarily unavailable. Please try again in a moment.',
+                    'timestamp': datetime.datetime.now().strftime('%I:%M %p')
+                }), 503
         
         # Other fallback responses
         if 'expir' in query_lower or 'soon' in query_lower:
@@ -1287,6 +1260,44 @@ STRICT RULES:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/llm/status', methods=['GET'])
+def api_llm_status():
+    """Gemini circuit breaker state, call counts and latency"""
+    return jsonify({'success': True, 'llm': gemini.stats()})
+
+
+@app.route('/api/voice/stats', methods=['GET'])
+def api_voice_stats():
+    """Share of voice requests answered locally / by Gemini / from cache, with latencies and prompt context counters"""
+    return jsonify({'success': True, 'stats': voice_path_stats.stats(), 'context': inventory_context.stats()})
+
+
+@app.route('/api/voice/cache', methods=['GET'])
+def api_voice_cache_stats():
+    """Hit rate and size of the voice answer cache"""
+    return jsonify({'success': True, 'cache': voice_cache.stats()})
+
+
+@app.route('/api/voice/cache', methods=['DELETE'])
+def api_voice_cache_clear():
+    """Drop all cached voice answers"""
+    voice_cache.clear()
+    return jsonify({'success': True})
+
+
+@app.route('/api/generate_recipe/cache', methods=['GET'])
+def api_recipe_cache_stats():
+    """Hit rate and size of the recipe cache"""
+    return jsonify({'success': True, 'cache': recipe_cache.stats()})
+
+
+@app.route('/api/generate_recipe/cache', methods=['DELETE'])
+def api_recipe_cache_clear():
+    """Drop all cached recipes"""
+    recipe_cache.clear()
+    return jsonify({'success': True})
+
+
 @app.route('/api/voice/tts', methods=['POST'])
 def api_text_to_speech():
     """Convert text to speech using gTTS (Google Text-to-Speech)"""
@@ -1342,61 +1353,25 @@ def api_text_to_speech():
 @app.route('/api/camera/start', methods=['POST'])
 def api_start_camera():
     """Start camera detection script"""
-    global camera_process
-    
     try:
-        # Check if already running
-        if camera_process and camera_process.poll() is None:
+        # Returns immediately; readiness is tracked by the supervisor's health probe
+        started, pid = camera_supervisor.start()
+        if not started:
             return jsonify({
                 'success': True,
                 'message': 'Camera already running',
-                'status': 'running'
+                'status': 'running',
+                'pid': pid
             })
-        
-        # Get Python executable path from virtual environment
-        python_exe = sys.executable
-        script_path = BASE_DIR / 'camera_stream_server.py'
-        
-        app.logger.info(f'Starting camera stream server: {python_exe} {script_path}')
-        
-        # Start camera detection as subprocess
-        import logging
-        log_file = BASE_DIR / 'camera_stream.log'
-        
-        with open(log_file, 'w') as f:
-            camera_process = subprocess.Popen(
-                [python_exe, str(script_path)],
-                stdout=f,
-                stderr=subprocess.STDOUT,
-                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-            )
-        
-        app.logger.info(f'Camera process started with PID: {camera_process.pid}')
-        app.logger.info(f'Camera logs: {log_file}')
-        
-        # Wait a moment and check if process is still running
-        time.sleep(1)
-        if camera_process.poll() is not None:
-            # Process crashed immediately
-            try:
-                with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
-                    error_log = f.read()
-            except Exception as e:
-                error_log = f"Could not read log: {str(e)}"
-            app.logger.error(f'Camera process crashed: {error_log}')
-            return jsonify({
-                'success': False,
-                'message': 'Camera failed to start. Check camera_stream.log for details.',
-                'error': error_log
-            }), 500
-        
+
         return jsonify({
             'success': True,
-            'message': 'Camera detection started',
+            'message': 'Camera detection starting',
             'status': 'running',
-            'pid': camera_process.pid
+            'state': 'starting',
+            'pid': pid
         })
-        
+
     except Exception as e:
         app.logger.exception('Failed to start camera')
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -1405,62 +1380,40 @@ def api_start_camera():
 @app.route('/api/camera/stop', methods=['POST'])
 def api_stop_camera():
     """Stop camera detection script"""
-    global camera_process
-    
     try:
-        if not camera_process or camera_process.poll() is not None:
-            camera_process = None
+        pid = camera_supervisor.stop()
+        if pid is None:
             return jsonify({
                 'success': True,
                 'message': 'Camera not running',
                 'status': 'stopped'
             })
-        
-        app.logger.info(f'Stopping camera process PID: {camera_process.pid}')
-        
-        # Terminate the process
-        if sys.platform == 'win32':
-            # Windows: use CTRL_BREAK_EVENT
-            camera_process.send_signal(signal.CTRL_BREAK_EVENT)
-        else:
-            # Unix: use SIGTERM
-            camera_process.terminate()
-        
-        # Wait for process to end (with timeout)
-        try:
-            camera_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            # Force kill if it doesn't stop gracefully
-            camera_process.kill()
-            camera_process.wait()
-        
-        camera_process = None
+
         app.logger.info('Camera process stopped')
-        
         return jsonify({
             'success': True,
             'message': 'Camera detection stopped',
-            'status': 'stopped'
+            'status': 'stopped',
+            'pid': pid
         })
-        
+
     except Exception as e:
         app.logger.exception('Failed to stop camera')
-        camera_process = None
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
 @app.route('/api/camera/status', methods=['GET'])
 def api_camera_status():
-    """Check if camera is running"""
-    global camera_process
-    
-    is_running = camera_process and camera_process.poll() is None
-    
-    return jsonify({
-        'success': True,
-        'status': 'running' if is_running else 'stopped',
-        'pid': camera_process.pid if is_running else None
-    })
+    """Check if camera is running (non-blocking: reports the supervisor's last health probe)"""
+    status = camera_supervisor.status()
+    is_running = status['state'] in ('starting', 'ready', 'restarting')
+
+    return jsonify(dict(
+        status,
+        success=True,
+        status='running' if is_running else 'stopped',
+        ready=status['state'] == 'ready'
+    ))
 
 
 if __name__ == '__main__':
@@ -1468,15 +1421,8 @@ if __name__ == '__main__':
     init_db_if_needed()
     print(f"Starting backend on http://0.0.0.0:{APP_PORT}")
     
-    # Cleanup camera process on exit
-    def cleanup():
-        global camera_process
-        if camera_process and camera_process.poll() is None:
-            print("\nStopping camera process...")
-            camera_process.terminate()
-            camera_process.wait()
-    
-    atexit.register(cleanup)
+    # Cleanup camera process on exit (only if this process started it)
+    atexit.register(camera_supervisor.shutdown)
     
     app.run(host='0.0.0.0', port=APP_PORT, debug=True)
 
@@ -0,0 +1,144 @@
+"""
+Inference backend benchmark for Smart Fridge camera detection
+Runs every requested backend over the same recorded clip and reports latency
+percentiles plus how well each backend's detections agree with the first one
+
+Usage:
+    python bench_inference.py recording.mp4
+    python bench_inference.py recording.mp4 --backends opencv,onnx,onnx-int8 --input-sizes 320,256
+    python bench_inference.py recording.mp4 --dnn-target opencl --threads 2 --frames 200
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from inference_backends import BACKENDS, create_detector, load_class_names
+
+IOU_MATCH_THRESHOLD = 0.5
+
+
+def load_frames(path, max_frames):
+    """Decode up to max_frames frames from a video file into memory"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"❌ Cannot open clip: {path}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, img = cap.read()
+        if not ret:
+            break
+        frames.append(img)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"❌ No frames decoded from {path}")
+    return frames
+
+
+def iou(a, b):
+    """Intersection over union of two [x, y, w, h] boxes"""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    inter_w = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    inter_h = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def frame_agreement(reference, candidate):
+    """F1-style agreement of two detection lists (same class and IoU >= 0.5)"""
+    ref_ids, _, ref_boxes = reference
+    cand_ids, _, cand_boxes = candidate
+    if not ref_ids and not cand_ids:
+        return 1.0
+    unmatched = list(range(len(cand_ids)))
+    matches = 0
+    for class_id, box in zip(ref_ids, ref_boxes):
+        for j in unmatched:
+            if cand_ids[j] == class_id and iou(box, cand_boxes[j]) >= IOU_MATCH_THRESHOLD:
+                unmatched.remove(j)
+                matches += 1
+                break
+    return 2 * matches / (len(ref_ids) + len(cand_ids))
+
+
+def run_backend(detector, frames, conf_threshold, warmup):
+    """Time detector.detect over all frames; returns (latencies_ms, results)"""
+    for img in frames[:warmup]:
+        detector.detect(img, conf_threshold)
+
+    latencies = []
+    results = []
+    for img in frames:
+        started = time.perf_counter()
+        result = detector.detect(img, conf_threshold)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(result)
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare inference backends on a recorded clip')
+    parser.add_argument('clip', help='Video file recorded from the fridge camera')
+    parser.add_argument('--backends', default='opencv,onnx,onnx-int8',
+                        help=f"Comma-separated list from: {', '.join(BACKENDS)} (first one is the reference)")
+    parser.add_argument('--input-sizes', default='320', help='Comma-separated square input sizes')
+    parser.add_argument('--threads', type=int, default=0, help='Inference threads (0 = library default)')
+    parser.add_argument('--dnn-backend', default='default', help='OpenCV DNN backend for the opencv runtime')
+    parser.add_argument('--dnn-target', default='cpu', help='OpenCV DNN target for the opencv runtime')
+    parser.add_argument('--frames', type=int, default=300, help='Max frames to use from the clip')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed warm-up frames per backend')
+    parser.add_argument('--confidence', type=float, default=0.5, help='Confidence threshold')
+    args = parser.parse_args()
+
+    frames = load_frames(args.clip, args.frames)
+    class_names = load_class_names()
+    print(f"🎞️  Loaded {len(frames)} frames from {args.clip} ({frames[0].shape[1]}x{frames[0].shape[0]})\n")
+
+    runs = []
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        for size in [int(s) for s in args.input_sizes.split(',')]:
+            options = {'input_size': size, 'threads': args.threads}
+            if backend == 'opencv':
+                options.update(dnn_backend=args.dnn_backend, dnn_target=args.dnn_target)
+            try:
+                detector = create_detector(backend, **options)
+            except Exception as e:
+                print(f"⚠️  Skipping {backend} @ {size}: {e}")
+                continue
+            print(f"⏱️  Running {detector.description} ...")
+            latencies, results = run_backend(detector, frames, args.confidence, args.warmup)
+            runs.append((detector.description, latencies, results))
+
+    if not runs:
+        raise SystemExit("❌ No backend could be loaded")
+
+    reference_name, _, reference_results = runs[0]
+    print("\n" + "=" * 96)
+    print(f"{'backend':40} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'fps':>7} {'agree':>7}")
+    print("=" * 96)
+    for name, latencies, results in runs:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        mean = float(np.mean(latencies))
+        agreement = np.mean([frame_agreement(r, c) for r, c in zip(reference_results, results)])
+        print(f"{name:40} {p50:8.1f} {p90:8.1f} {p99:8.1f} {mean:8.1f} {1000 / mean:7.1f} {agreement:7.1%}")
+    print("=" * 96)
+    print(f"Agreement is measured against {reference_name} (same class, IoU >= {IOU_MATCH_THRESHOLD})")
+
+    # Per-label counts make disagreements on the whitelisted items easy to spot
+    print("\nDetections per label:")
+    for name, _, results in runs:
+        counts = {}
+        for class_ids, _, _ in results:
+            for class_id in class_ids:
+                label = class_names[class_id - 1] if 0 < class_id <= len(class_names) else str(class_id)
+                counts[label] = counts.get(label, 0) + 1
+        top = ', '.join(f"{label}={n}" for label, n in sorted(counts.items(), key=lambda kv: -kv[1])[:8])
+        print(f"  {name}: {top or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Inventory context benchmark: prompt size and build time for a big inventory
+Generates a synthetic inventory (default 500 rows, many duplicate labels
+across locations) and compares, for a few typical voice queries, the
+previous prompt (one sentence per row) with the compact, budgeted context
+from inventory_context.py. Token counts are estimates (~4 chars per token).
+
+Usage:
+    python bench_inventory_context.py
+    python bench_inventory_context.py --items 2000 --budget 800
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+import voice_assistant
+from inventory_context import InventoryContext, estimate_tokens, full_inventory_text, inventory_version
+
+LABELS = ['milk', 'curd', 'paneer', 'butter', 'ghee', 'cheese', 'egg', 'chicken', 'mutton', 'fish', 'prawns',
+          'tomato', 'onion', 'potato', 'carrot', 'spinach', 'cabbage', 'cauliflower', 'capsicum', 'green chili',
+          'ginger', 'garlic', 'coriander', 'mint', 'lemon', 'cucumber', 'beans', 'okra', 'brinjal', 'peas',
+          'apple', 'banana', 'mango', 'orange', 'grapes', 'papaya', 'idli batter', 'dosa batter', 'chutney',
+          'leftover rice', 'leftover dal', 'sambar', 'rasam', 'jam', 'ketchup', 'mayonnaise', 'bread', 'tofu',
+          'ice cream', 'frozen peas', 'frozen corn', 'chicken nuggets', 'fish fingers', 'kulfi', 'coconut',
+          'drumstick', 'beetroot', 'radish', 'methi', 'pickle']
+LOCATIONS = ['Fridge', 'Freezer', 'Door', 'Top Shelf', 'Middle Shelf', 'Bottom Shelf']
+UNITS = [('kg', 1, 5), ('g', 100, 900), ('liter', 1, 3), ('unit', 1, 12)]
+
+QUERIES = [
+    ('en', "what's in my fridge?"),
+    ('en', 'how much paneer do I have?'),
+    ('en', "what's expiring soon?"),
+    ('hi', 'फ्रीजर में क्या है?'),
+    ('te', 'నా దగ్గర ఎంత పాలు ఉన్నాయి?'),
+]
+
+
+def make_inventory(count, seed=7):
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    items = []
+    for i in range(count):
+        unit, low, high = rng.choice(UNITS)
+        items.append({
+            'id': i + 1,
+            'label': rng.choice(LABELS),
+            'quantity': f"{rng.randint(low, high)} {unit}",
+            'location': rng.choice(LOCATIONS),
+            'expiry_date': (today + datetime.timedelta(days=rng.randint(-2, 40))) if rng.random() < 0.8 else None,
+            'status': rng.choice(['Fresh'] * 8 + ['Expiring Soon', 'Expired']),
+        })
+    return items
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Voice prompt size before/after the inventory context builder')
+    parser.add_argument('--items', type=int, default=500, help='Inventory rows')
+    parser.add_argument('--budget', type=int, default=None, help='Token budget (default: INVENTORY_TOKEN_BUDGET)')
+    args = parser.parse_args()
+
+    items = make_inventory(args.items)
+    context = InventoryContext() if args.budget is None else InventoryContext(budget=args.budget)
+    before_inventory = full_inventory_text(items)
+
+    print(f"🧪 {len(items)} inventory rows, {len({i['label'] for i in items})} labels, "
+          f"budget {context.budget} tokens\n")
+    print(f"{'query':<34} {'inventory tok':>20} {'prompt tok':>20} {'saved':>6}")
+    for language, query in QUERIES:
+        after_inventory = context.build(items, query)
+        before = estimate_tokens(voice_assistant.build_prompt(query, language, before_inventory))
+        after = estimate_tokens(voice_assistant.build_prompt(query, language, after_inventory))
+        print(f"{query:<34} {estimate_tokens(before_inventory):>8} -> {estimate_tokens(after_inventory):<8} "
+              f"{before:>8} -> {after:<8} {(1 - after / before) * 100:>5.0f}%")
+
+    sample = context.build(items, 'how much paneer do I have?')
+    print(f"\n📝 Context for 'how much paneer do I have?' (first lines):")
+    for line in sample.split('\n')[:3]:
+        print(f"   {line[:150]}{'...' if len(line) > 150 else ''}")
+    print(f"   {sample.split(chr(10))[-1]}")
+
+    version = inventory_version(items)
+    cold = timed(lambda: InventoryContext(budget=context.budget).build(items, 'how much paneer', version), 20)
+    warm = timed(lambda: context.build(items, 'how much paneer', version), 200)
+    hashing = timed(lambda: inventory_version(items), 200)
+    print(f"\n⏱  build: {cold:.2f} ms uncached, {warm:.2f} ms with the compiled inventory cached "
+          f"(+ {hashing:.2f} ms to hash the rows into a version)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Voice and recipe throughput against the local Gemini stand-in
+Starts fake_gemini_server.py on a free port, points the backend's Gemini
+client at it (real HTTP: pooling, retries and the circuit breaker all run)
+and fires concurrent /api/voice/query and /api/generate_recipe requests
+through the Flask app with the database faked in memory. Each scenario
+sets the stand-in's latency and fault rates:
+
+    baseline      normal latency, no faults
+    slow_tail     lognormal latency (a few very slow answers)
+    rate_limited  20% 429s
+    overloaded    30% 503s
+    malformed     20% answers cut off halfway
+    outage        every call 503 (the breaker should open, fallbacks answer)
+
+Every scenario starts with a fresh client (closed breaker). Voice requests
+bypass the answer cache; recipe requests use ?refresh=1, and each sees its
+own extra ingredient unless --same-inventory, so they neither hit the cache
+nor share a call.
+
+Usage:
+    python bench_llm_throughput.py
+    python bench_llm_throughput.py --requests 80 --concurrency 16 --scenarios baseline,overloaded
+"""
+
+import argparse
+import itertools
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import backend
+import intent_matcher
+from bench_voice_query import CASES, INVENTORY, FakeDB, percentile
+from fake_gemini_server import StandIn, create_app
+from llm_client import GeminiClient
+from response_cache import DiskCache
+
+SCENARIOS = {
+    'baseline': {'latency': 'normal:600:150'},
+    'slow_tail': {'latency': 'lognormal:500:0.7'},
+    'rate_limited': {'latency': 'normal:600:150', 'rate_429': 0.2},
+    'overloaded': {'latency': 'normal:600:150', 'rate_503': 0.3},
+    'malformed': {'latency': 'normal:600:150', 'malformed': 0.2},
+    'outage': {'latency': 'normal:600:150', 'rate_503': 1.0},
+}
+
+
+class RecipeDB(FakeDB):
+    """Every connection sees the inventory plus (unless same) one item of its own"""
+
+    def __init__(self, same):
+        super().__init__()
+        self.same = same
+        self._numbers = itertools.count(1)
+
+    def connect(self):
+        db = FakeDB()
+        if not self.same:
+            db.items.append(dict(INVENTORY[0], id=100, label=f"item {next(self._numbers)}"))
+        return db.connect()
+
+
+def run_requests(count, concurrency, send):
+    """send(i) -> outcome for i in range(count); returns (wall seconds, latencies, outcomes)"""
+    latencies, outcomes = [], {}
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        outcome = send(i)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(count)))
+    return time.perf_counter() - started, latencies, outcomes
+
+
+def voice_request(i):
+    language, query, _ = CASES[i % len(CASES)]
+    with backend.app.test_client() as client:
+        response = client.post('/api/voice/query', json={'query': query, 'language': language},
+                               headers={'X-Cache-Bypass': '1'})
+    return 'ok' if response.status_code == 200 else f"http {response.status_code}"
+
+
+def recipe_request(i):
+    with backend.app.test_client() as client:
+        response = client.post('/api/generate_recipe?refresh=1')
+    if response.status_code != 200:
+        return f"http {response.status_code}"
+    return response.get_json().get('source', '?')
+
+
+def describe(outcomes):
+    return ', '.join(f"{name} {count}" for name, count in sorted(outcomes.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Voice and recipe throughput against the Gemini stand-in')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per endpoint per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated subset of scenarios')
+    parser.add_argument('--same-inventory', action='store_true',
+                        help='All recipe requests share one ingredient set (shows call coalescing)')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"❌ Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    logging.getLogger().setLevel(logging.ERROR)
+    backend.app.logger.setLevel(logging.ERROR)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    stand_in = StandIn()
+    server = make_server('127.0.0.1', 0, create_app(stand_in), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1beta"
+
+    backend.TABLE_NAME = 'item'
+    backend.GEMINI_API_KEY = 'bench'
+    cache_dir = tempfile.TemporaryDirectory()
+    backend.recipe_cache = DiskCache(cache_dir.name)
+
+    print(f"🧪 {args.requests} requests per endpoint, {args.concurrency} concurrent, "
+          f"Gemini stand-in at {base_url}\n")
+    print(f"{'scenario':<13} {'endpoint':<7} {'req/s':>6} {'p50 ms':>7} {'p95 ms':>7} {'calls':>6} "
+          f"{'breaker':>8}  outcomes")
+    try:
+        for name in names:
+            settings = dict({'latency': 'normal:600:150', 'rate_429': 0, 'rate_503': 0, 'malformed': 0},
+                            **SCENARIOS[name])
+            stand_in.configure(**settings)
+            for endpoint, send in (('voice', voice_request), ('recipe', recipe_request)):
+                backend.gemini.close()
+                backend.gemini = GeminiClient('bench', base_url=base_url)
+                backend.voice_path_stats = intent_matcher.VoicePathStats()
+                backend.get_conn = (FakeDB() if endpoint == 'voice' else RecipeDB(args.same_inventory)).connect
+                stand_in.reset()
+
+                wall, latencies, outcomes = run_requests(args.requests, args.concurrency, send)
+                if endpoint == 'voice':
+                    outcomes = {path: info['requests'] for path, info in
+                                backend.voice_path_stats.stats()['paths'].items()}
+                breaker = backend.gemini.stats()['circuit']
+                print(f"{name:<13} {endpoint:<7} {len(latencies) / wall:>6.1f} "
+                      f"{percentile(latencies, 50) * 1000:>7.0f} {percentile(latencies, 95) * 1000:>7.0f} "
+                      f"{stand_in.stats()['calls']:>6} "
+                      f"{('opened' if breaker['times_opened'] else 'closed'):>8}  {describe(outcomes)}")
+    finally:
+        server.shutdown()
+        backend.gemini.close()
+        cache_dir.cleanup()
+
+    print("\n   calls: requests the stand-in received, retries included; outcomes: how voice requests")
+    print("   were answered (local / llm / fallback) and where recipes came from (gemini / fallback)")
+
+
+if __name__ == '__main__':
+    main()
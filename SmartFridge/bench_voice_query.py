@@ -0,0 +1,253 @@
+"""
+Voice query benchmark: Gemini round trips and latency per voice request
+Runs a fixed set of voice requests (questions and add/remove/update commands
+in several languages) through the backend's /api/voice/query with the
+database and Gemini replaced by in-memory fakes. Every fake Gemini call
+sleeps --latency ms (+/- --jitter), so the numbers show what sequential
+round trips cost:
+
+    before  - the previous call pattern: an intent detection call, then a
+              second call to answer a question or to translate the
+              confirmation of a non-English command
+    after   - the current handler: unambiguous commands are recognized
+              locally (intent_matcher.py), everything else takes one
+              structured-output call
+
+Usage:
+    python bench_voice_query.py
+    python bench_voice_query.py --latency 800 --jitter 200 --repeat 5
+"""
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+
+import backend
+
+CASES = [
+    ('en', "what's in my fridge?",
+     {'intent': 'none', 'reply': '- milk (1 liter) in Door\n- mutton (20 kg) in Freezer'}),
+    ('hi', 'फ्रिज में क्या है?',
+     {'intent': 'none', 'reply': '- दूध (1 लीटर) दरवाज़े में\n- मटन (20 किलो) फ्रीजर में'}),
+    ('en', 'how many mutton do I have?',
+     {'intent': 'none', 'reply': 'You have 20 kg of mutton in the Freezer.'}),
+    ('en', 'add 2 kg fish to the freezer',
+     {'intent': 'add', 'label': 'fish', 'quantity': '2 kg', 'location': 'Freezer',
+      'reply': 'Added fish (2 kg) to Freezer'}),
+    ('te', 'ఫ్రీజర్‌లో 5 కిలోల చేపను పెట్టండి',
+     {'intent': 'add', 'label': 'fish', 'quantity': '5 kg', 'location': 'Freezer',
+      'reply': 'ఫ్రీజర్‌లో చేప (5 కిలోలు) జోడించబడింది'}),
+    ('hi', 'मटन को निकालें',
+     {'intent': 'remove', 'label': 'mutton', 'reply': 'मटन हटा दिया गया',
+      'not_found_reply': 'मटन इन्वेंटरी में नहीं है'}),
+    ('en', 'update milk quantity to 2 liters',
+     {'intent': 'update', 'label': 'milk', 'field': 'quantity', 'value': '2 liters',
+      'reply': 'Updated milk quantity to 2 liters'}),
+    ('ta', 'பால் அளவை 1 லிட்டரிலிருந்து 3 லிட்டராக மாற்றவும்',
+     {'intent': 'update', 'label': 'milk', 'field': 'quantity', 'value': '3 liters',
+      'reply': 'பால் அளவு 3 லிட்டராக மாற்றப்பட்டது'}),
+    ('en', 'add a bag of frozen peas and 6 eggs',
+     {'intent': 'add', 'label': 'frozen peas', 'quantity': '1 bag', 'location': 'Freezer',
+      'reply': 'Added frozen peas (1 bag) to Freezer'}),
+]
+
+INVENTORY = [
+    {'id': 1, 'label': 'milk', 'quantity': '1 liter', 'expiry_date': None, 'location': 'Door',
+     'status': 'Fresh', 'added_date': None, 'source': 'manual', 'confidence': None, 'camera_last_seen': None},
+    {'id': 2, 'label': 'mutton', 'quantity': '20 kg', 'expiry_date': None, 'location': 'Freezer',
+     'status': 'Fresh', 'added_date': None, 'source': 'manual', 'confidence': None, 'camera_last_seen': None},
+]
+
+
+# ----------------------------------------------------------------------
+# Fakes
+# ----------------------------------------------------------------------
+class FakeCursor:
+    """Just enough SQL for the voice handler against the `item` table"""
+
+    def __init__(self, db):
+        self.db = db
+        self.lastrowid = None
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, sql, args=()):
+        sql = ' '.join(sql.split())
+        items = self.db.items
+        if sql.startswith('SELECT') and 'WHERE LOWER(label)' in sql:
+            self._rows = [dict(i) for i in items if i['label'].lower() == args[0].lower()][:1]
+        elif sql.startswith('SELECT'):
+            self._rows = [dict(i) for i in items]
+        elif sql.startswith('INSERT INTO item '):
+            self.db.next_id += 1
+            self.lastrowid = self.db.next_id
+            items.append(dict(INVENTORY[0], id=self.lastrowid, label=args[0], quantity=args[1], location=args[2]))
+        elif sql.startswith('DELETE FROM item '):
+            self.db.items = [i for i in items if i['id'] != args[0]]
+        elif sql.startswith('UPDATE item SET'):
+            field = sql.split('SET ')[1].split(' ')[0]
+            for item in items:
+                if item['id'] == args[1]:
+                    item[field] = args[0]
+        self.rowcount = 1
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class FakeDB:
+    def __init__(self):
+        self.items = [dict(i) for i in INVENTORY]
+        self.next_id = len(self.items)
+
+    def connect(self):
+        db = self
+
+        class Conn:
+            def cursor(self):
+                return FakeCursor(db)
+
+            def commit(self):
+                pass
+
+            def close(self):
+                pass
+
+        return Conn()
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self._text = text
+
+    def json(self):
+        return {'candidates': [{'content': {'parts': [{'text': self._text}]}}]}
+
+
+class FakeGemini:
+    """Stands in for the Gemini client's session.post; answers each case with its canned JSON"""
+
+    def __init__(self, latency_ms, jitter_ms):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.calls = 0
+
+    def wait(self):
+        self.calls += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.wait()
+        # The user's words are quoted on the first line (the examples further down quote others)
+        first_line = json['contents'][0]['parts'][0]['text'].split('\n', 1)[0]
+        for _, query, result in CASES:
+            if f'"{query}"' in first_line:
+                return FakeResponse(_dumps(result))
+        return FakeResponse(_dumps({'intent': 'none', 'reply': 'OK'}))
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+# ----------------------------------------------------------------------
+# Runs
+# ----------------------------------------------------------------------
+def previous_round_trips(language, result):
+    """Gemini calls the previous handler needed for one request"""
+    if result['intent'] == 'none':
+        return 2  # Detection, then the answer
+    return 2 if language != 'en' else 1  # Detection, then translating the confirmation
+
+
+def run_before(gemini, language, result):
+    """Replay the previous call pattern against the same fake Gemini"""
+    started = time.perf_counter()
+    for _ in range(previous_round_trips(language, result)):
+        gemini.wait()
+    return time.perf_counter() - started
+
+
+def run_after(client, language, query):
+    started = time.perf_counter()
+    response = client.post('/api/voice/query', json={'query': query, 'language': language},
+                           headers={'X-Cache-Bypass': '1'})
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise SystemExit(f"❌ {query!r} failed: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return elapsed
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Voice query round trips and latency with a mocked Gemini')
+    parser.add_argument('--latency', type=float, default=600, help='Fake Gemini latency per call (ms)')
+    parser.add_argument('--jitter', type=float, default=100, help='Random +/- latency (ms)')
+    parser.add_argument('--repeat', type=int, default=3, help='Times to run the whole set of requests')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    backend.app.logger.setLevel(logging.WARNING)
+    gemini = FakeGemini(args.latency, args.jitter)
+    backend.GEMINI_API_KEY = 'bench'
+    backend.TABLE_NAME = 'item'
+    backend.gemini.session.post = gemini.post
+    client = backend.app.test_client()
+
+    print(f"🧪 {len(CASES)} voice requests x {args.repeat}, fake Gemini latency "
+          f"{args.latency:.0f} ± {args.jitter:.0f} ms\n")
+    print(f"{'request':<48} {'lang':<5} {'calls':>11} {'before ms':>10} {'after ms':>9}")
+
+    before_times, after_times = [], []
+    before_calls = after_calls = 0
+    for _ in range(args.repeat):
+        db = FakeDB()
+        backend.get_conn = db.connect
+        for language, query, result in CASES:
+            calls = gemini.calls
+            before = run_before(gemini, language, result)
+            before_calls += gemini.calls - calls
+
+            calls = gemini.calls
+            after = run_after(client, language, query)
+            after_calls += gemini.calls - calls
+
+            before_times.append(before)
+            after_times.append(after)
+            if len(before_times) <= len(CASES):
+                label = query if len(query) <= 46 else query[:43] + '...'
+                print(f"{label:<48} {language:<5} {previous_round_trips(language, result):>5} -> "
+                      f"{gemini.calls - calls:<3} {before * 1000:>10.0f} {after * 1000:>9.0f}")
+
+    requests_run = len(before_times)
+    print(f"\n{'':<14} {'calls/request':>13} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, calls, times in (('before', before_calls, before_times), ('after', after_calls, after_times)):
+        print(f"{name:<14} {calls / requests_run:>13.2f} {statistics.mean(times) * 1000:>9.0f} "
+              f"{percentile(times, 50) * 1000:>8.0f} {percentile(times, 95) * 1000:>8.0f}")
+    speedup = statistics.mean(before_times) / statistics.mean(after_times)
+    print(f"\n⚡ {speedup:.2f}x lower mean latency, "
+          f"{before_calls - after_calls} fewer Gemini calls over {requests_run} requests")
+
+    stats = backend.voice_path_stats.stats()
+    print(f"\n🏠 {stats['local_fraction'] * 100:.0f}% answered locally "
+          f"(min confidence {stats['min_confidence']})")
+    for path, info in sorted(stats['paths'].items()):
+        latency = info['latency_ms']
+        print(f"   {path:<9} {info['requests']:>4} requests  mean {latency['mean']:8.2f} ms  "
+              f"p95 {latency['p95']:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Backend Client for Smart Fridge camera processes
+Sends detection events to the backend from a background thread so a slow
+backend never stalls the frame loop
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+
+
+class BackendClient:
+    """Non-blocking client for the camera endpoints of backend.py
+
+    Events are put on a bounded queue and drained by a single worker thread
+    that reuses one keep-alive requests.Session. Heartbeats and cleanups are
+    coalesced: while one is still waiting in the queue, newer calls only
+    replace its payload instead of queueing another request.
+    """
+
+    def __init__(self, base_url, camera_id=None, max_queue=100, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.camera_id = camera_id
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._pending_heartbeat = None  # latest labels for the queued heartbeat
+        self._cleanup_queued = False
+        self._worker = None
+        self._running = False
+
+        self._latencies = deque(maxlen=200)
+        self._counters = {
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'coalesced': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the background sender thread"""
+        if self._worker and self._worker.is_alive():
+            return self
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name='backend-client', daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stop the sender, giving queued events a moment to flush"""
+        if not self._running:
+            return
+        self._running = False
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._worker:
+            self._worker.join(timeout)
+        self.session.close()
+
+    def check_health(self):
+        """Synchronous backend reachability check, used once at startup"""
+        response = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
+        return response.status_code
+
+    # ------------------------------------------------------------------
+    # Producer API (called from the frame loop, never blocks)
+    # ------------------------------------------------------------------
+    def add_item(self, label, confidence, callback=None):
+        """Queue an item insert. callback(item_id or None) runs on the worker"""
+        payload = {
+            'label': label,
+            'quantity': '1 unit',
+            'location': 'Camera Detected',
+            'source': 'camera',
+            'confidence': confidence
+        }
+        if self.camera_id:
+            payload['camera_id'] = self.camera_id
+        if not self._enqueue(('add', payload, callback)):
+            if callback:
+                callback(None)
+            return False
+        return True
+
+    def heartbeat(self, labels):
+        """Queue a heartbeat, replacing the labels of one already waiting"""
+        with self._lock:
+            if self._pending_heartbeat is not None:
+                self._pending_heartbeat = list(labels)
+                self._counters['coalesced'] += 1
+                return True
+            self._pending_heartbeat = list(labels)
+        if not self._enqueue(('heartbeat', None, None)):
+            with self._lock:
+                self._pending_heartbeat = None
+            return False
+        return True
+
+    def cleanup(self):
+        """Queue a stale-item cleanup unless one is already waiting"""
+        with self._lock:
+            if self._cleanup_queued:
+                self._counters['coalesced'] += 1
+                return True
+            self._cleanup_queued = True
+        if not self._enqueue(('cleanup', None, None)):
+            with self._lock:
+                self._cleanup_queued = False
+            return False
+        return True
+
+    def stats(self):
+        """Queue depth, counters and send latency in milliseconds"""
+        with self._lock:
+            last = self._latencies[-1] if self._latencies else None
+            latencies = sorted(self._latencies)
+            counters = dict(self._counters)
+        result = {'queue_depth': self._queue.qsize()}
+        result.update(counters)
+        if latencies:
+            result['latency_ms'] = {
+                'last': round(last * 1000, 1),
+                'avg': round(sum(latencies) / len(latencies) * 1000, 1),
+                'p95': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+            }
+        else:
+            result['latency_ms'] = None
+        return result
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _enqueue(self, event):
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._counters['dropped'] += 1
+            print(f"⚠️  Backend queue full, dropped {event[0]} event")
+            return False
+
+    def _run(self):
+        while self._running or not self._queue.empty():
+            try:
+                event = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if event is None:
+                continue
+
+            kind, payload, callback = event
+            if kind == 'add':
+                result = self._send_add(payload)
+                if callback:
+                    try:
+                        callback(result)
+                    except Exception as e:
+                        print(f"⚠️  Add callback failed: {e}")
+            elif kind == 'heartbeat':
+                with self._lock:
+                    labels = self._pending_heartbeat or []
+                    self._pending_heartbeat = None
+                self._send_heartbeat(labels)
+            elif kind == 'cleanup':
+                with self._lock:
+                    self._cleanup_queued = False
+                self._send_cleanup()
+
+    def _post(self, path, payload=None):
+        started = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self._counters['failed'] += 1
+            raise
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+            self._counters['sent'] += 1
+        return response
+
+    def _send_add(self, payload):
+        label = payload['label']
+        try:
+            response = self._post('/api/items', payload)
+            if response.status_code == 200:
+                result = response.json()
+                if result.get('success'):
+                    item_id = result.get('id')
+                    print(f"✅ Added {label} to database (ID: {item_id})")
+                    return item_id
+            print(f"⚠️  Failed to add {label}: {response.text}")
+        except Exception as e:
+            print(f"❌ Error adding {label}: {e}")
+        return None
+
+    def _send_heartbeat(self, labels):
+        payload = {'labels': labels}
+        if self.camera_id:
+            payload['camera_id'] = self.camera_id
+        try:
+            response = self._post('/api/camera/heartbeat', payload)
+            if response.status_code == 200:
+                return response.json().get('updated', 0)
+        except Exception as e:
+            print(f"⚠️  Heartbeat failed: {e}")
+        return 0
+
+    def _send_cleanup(self):
+        try:
+            response = self._post('/api/camera/cleanup')
+            if response.status_code == 200:
+                removed = response.json().get('removed', 0)
+                if removed > 0:
+                    print(f"🗑️  Cleanup removed {removed} stale camera items")
+                return removed
+        except Exception as e:
+            print(f"⚠️  Cleanup failed: {e}")
+        return 0
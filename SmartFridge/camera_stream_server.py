@@ -2,26 +2,35 @@
 Camera Stream Server for Smart Fridge
 Provides HTTP endpoint for live camera feed with object detection
 Can be embedded in web UI
+Supports several cameras (e.g. door and shelf), each with its own stream
 """
 
 import cv2
-import numpy as np
-import requests
-import time
-from datetime import datetime
-from flask import Flask, Response, jsonify
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from flask import Flask, Response, jsonify, abort, request, send_from_directory
+import signal
 import threading
+import time
 import sys
 import io
 
+from camera_client import BackendClient
+from clip_recorder import ClipRecorder, list_clips, touch_clip
+from detection_engine import DetectionEngine, draw_overlays, open_frame_source
+from frame_ring import FrameRing
+from mjpeg_broadcaster import FrameBroadcaster
+from inference_backends import CLASS_NAMES_PATH, INFERENCE_BACKEND, create_detector, load_class_names
+
 # Fix Unicode encoding issues on Windows console
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-# Try to import waitress for Windows compatibility
+# Try to import waitress (production server: bounded thread pool, backpressure)
 try:
-    from waitress import serve
+    from waitress.server import create_server
     USE_WAITRESS = True
 except ImportError:
     USE_WAITRESS = False
@@ -36,327 +45,564 @@ CONFIDENCE_THRESHOLD = 0.5
 ADD_DELAY_SECONDS = 7
 REMOVE_DELAY_SECONDS = 7
 HEARTBEAT_INTERVAL = 1
+BACKEND_QUEUE_SIZE = 100  # Max pending backend events before new ones are dropped
+JPEG_QUALITY = 80  # Quality of the frames served on /video_feed
+SNAPSHOT_POLL_TIMEOUT = 30  # Max seconds a /snapshot.jpg?after= long-poll waits
+STREAM_PORT = 5001
+
+# Clip recording: the seconds around every add/remove are saved for auditing
+RECORD_CLIPS = True
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clips')
+CLIP_PRE_ROLL_SECONDS = 5
+CLIP_POST_ROLL_SECONDS = 5
+CLIP_DISK_LIMIT_MB = 500  # Least recently used clips are deleted beyond this
+
+# Serving limits. Each open /video_feed or /detections connection holds one
+# server thread, so MAX_STREAMS must stay below SERVER_THREADS to leave room
+# for /health, /snapshot.jpg etc.
+SERVER_THREADS = 16
+MAX_STREAMS = 12  # Further stream requests get 503 + Retry-After
+SLOW_CLIENT_SECONDS = 5  # Drop a viewer whose socket stays blocked this long
+OUTBUF_HIGH_WATERMARK = 1024 * 1024  # Bytes buffered per client before writes block
 ALLOWED_ITEMS = ['orange', 'banana', 'apple', 'carrot']
 
 # Alternative: Use webcam as fallback (set to 0 for default webcam)
-USE_WEBCAM_FALLBACK = False  # Set to True if ESP32-CAM is not available
+USE_WEBCAM_FALLBACK = False  # Set to True to switch to the webcam while the ESP32-CAM is down
 WEBCAM_INDEX = 0  # Change to 1, 2, etc. if you have multiple cameras
 
-# Detection state tracker
-detection_state = {}
+# Camera sources: one entry per physical camera. The first one is also served
+# on the plain /video_feed route used by the web UI. A source may also be a
+# video file or an image directory (see detection_engine.py) for offline runs.
+# Override without editing code via the CAMERA_SOURCES environment variable:
+#   CAMERA_SOURCES="door=http://10.0.0.5:81/stream|0,shelf=http://10.0.0.6:81/stream,desk=0"
+# (a bare integer is treated as a local webcam index; "|source" adds a fallback)
+# Live sources reconnect on their own after failures or stalls (see
+# SupervisedSource in detection_engine.py); the fallback is used meanwhile.
+CAMERA_SOURCES = [
+    {'id': 'door', 'source': CAMERA_URL, 'fallback': WEBCAM_INDEX if USE_WEBCAM_FALLBACK else None},
+]
+
+# Inference runs in worker processes so several cameras use several cores.
+# None = one worker per camera, capped at the CPU count.
+INFERENCE_WORKERS = None
+# Detector runtime and its options (see inference_backends.py / bench_inference.py)
+DETECTOR_BACKEND = INFERENCE_BACKEND
+DETECTOR_OPTIONS = {}
 
 # Flask app for streaming
 stream_app = Flask(__name__)
 
-# Global variables
-camera_cap = None
-output_frame = None
-lock = threading.Lock()
-running = False
+# Active cameras by id, in configuration order
+cameras = {}
+
+
+def connection_closer(environ):
+    """Callable that aborts this request's connection from another thread, or None
+
+    A server thread writing to a client that stopped reading can block for
+    good (waitress waits on its output buffer without a timeout, and its
+    channel_timeout skips channels with a request in progress). Closing the
+    connection is the only way to get that thread back.
+    """
+    check_disconnected = environ.get('waitress.client_disconnected')
+    channel = getattr(check_disconnected, '__self__', None)
+    if channel is not None and hasattr(channel, 'handle_close'):
+        def close_channel():
+            # Run on waitress's main loop: marks the channel disconnected,
+            # wakes the blocked writer (it raises ClientDisconnected) and
+            # closes the socket
+            channel.server.trigger.pull_trigger(channel.handle_close)
+        return close_channel
+
+    sock = environ.get('werkzeug.socket')  # Flask's built-in server
+    if sock is not None:
+        def close_socket():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return close_socket
+    return None
+
+
+class StreamLimiter:
+    """Caps concurrent streaming responses and drops clients that stop reading
+
+    guard() wraps a chunk generator. The time between handing a chunk to the
+    server and being asked for the next one is how long the socket write
+    blocked; with a small output buffer that is exactly the client's lag.
+    A write may also never return, so a watchdog thread closes connections
+    whose write has been blocked for more than slow_seconds.
+    """
+
+    def __init__(self, limit, slow_seconds):
+        self.limit = limit
+        self.slow_seconds = slow_seconds
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._writing = {}  # token -> (write started, close, name) while a chunk is being sent
+        self._watchdog = None
+
+    def try_acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def guard(self, chunks, name, close=None):
+        """Yield from chunks, ending the stream if the client stops reading
+
+        close() aborts the connection (see connection_closer); without it a
+        write that never returns cannot be interrupted.
+        """
+        token = object()
+        if close is not None:
+            self._start_watchdog()
+        try:
+            for chunk in chunks:
+                started = time.monotonic()
+                if close is not None:
+                    with self._lock:
+                        self._writing[token] = (started, close, name)
+                yield chunk
+                with self._lock:
+                    closed = close is not None and self._writing.pop(token, None) is None
+                if closed:
+                    return  # The watchdog already dropped this client
+                if time.monotonic() - started > self.slow_seconds:
+                    with self._lock:
+                        self.dropped += 1
+                    print(f"🐢 Dropping slow {name} client (blocked > {self.slow_seconds}s)")
+                    return
+        finally:
+            with self._lock:
+                self._writing.pop(token, None)
+            chunks.close()
+
+    def _start_watchdog(self):
+        with self._lock:
+            if self._watchdog is not None:
+                return
+            self._watchdog = threading.Thread(target=self._watch, name='slow-clients', daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        """Close connections whose current write has been blocked for more than slow_seconds"""
+        while True:
+            time.sleep(min(1.0, self.slow_seconds / 4))
+            now = time.monotonic()
+            with self._lock:
+                stuck = [(token, close, name) for token, (started, close, name) in self._writing.items()
+                         if now - started > self.slow_seconds]
+                for token, _, _ in stuck:
+                    del self._writing[token]
+                self.dropped += len(stuck)
+            for _, close, name in stuck:
+                print(f"🐢 Dropping slow {name} client (write blocked > {self.slow_seconds}s)")
+                try:
+                    close()
+                except Exception as e:
+                    print(f"⚠️  Could not close slow {name} client: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {'active': self.active, 'limit': self.limit,
+                    'rejected': self.rejected, 'dropped_slow': self.dropped}
+
+
+stream_limiter = StreamLimiter(MAX_STREAMS, SLOW_CLIENT_SECONDS)
+
+
+def streaming_response(chunks, name, **kwargs):
+    """Wrap a chunk generator in a limited, slow-client-guarded Response (or a 503)"""
+    if not stream_limiter.try_acquire():
+        chunks.close()
+        response = jsonify({'success': False, 'message': 'Too many concurrent streams, try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    response = Response(stream_limiter.guard(chunks, name, close=connection_closer(request.environ)), **kwargs)
+    # Runs when the server closes the response, even if it was never iterated
+    response.call_on_close(stream_limiter.release)
+    return response
+
+
+# Distinguishes snapshot ETags across server restarts (sequence numbers restart at 1)
+SERVER_STARTED = time.time()
+SERVER_EPOCH = format(int(SERVER_STARTED), 'x')
 
 # Load COCO class names
-classNames = []
-classFile = 'Camera/coco.names'
 try:
-    with open(classFile, 'rt') as f:
-        classNames = f.read().rstrip('\n').split('\n')
-    print(f"✅ Loaded {len(classNames)} class names")
+    classNames = load_class_names()
 except FileNotFoundError:
-    print(f"❌ Error: {classFile} not found")
+    print(f"❌ Error: {CLASS_NAMES_PATH} not found")
     exit(1)
 
-# Load model
-configPath = 'Camera/ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt'
-weightsPath = 'Camera/frozen_inference_graph.pb'
+# Per-process detector, set by _init_inference_worker()
+_worker_detector = None
+# Per-process frame rings attached by camera id (see frame_ring.py)
+_worker_rings = {}
+
+
+def _init_inference_worker(backend, options):
+    """Load the detection model once per inference worker process"""
+    global _worker_detector
+    cv2.setNumThreads(1)  # Parallelism comes from the process pool
+    _worker_detector = create_detector(backend, **options)
+    print(f"✅ Model loaded in inference worker (PID {os.getpid()}, {_worker_detector.description})")
+
+
+def _detect_in_worker(camera_id, ring_name, seq, conf_threshold):
+    """Run the detector on frame seq of a camera's shared-memory ring
+
+    Only the ring name and sequence number cross the process boundary; the
+    frame itself is read in place. Returns plain picklable lists.
+    """
+    ring = _worker_rings.get(camera_id)
+    if ring is None or ring.name != ring_name:
+        if ring is not None:
+            ring.close()  # The camera changed resolution and got a new ring
+        ring = _worker_rings[camera_id] = FrameRing.attach(ring_name)
+
+    img = ring.get(seq)
+    if img is None:
+        return [], [], []
+    result = _worker_detector.detect(img, conf_threshold)
+    if not ring.is_current(seq):
+        return [], [], []  # Overwritten while detecting; results may be torn
+    return result
+
+
+def parse_camera_sources(value):
+    """Parse "id=source|fallback,id=source" from the CAMERA_SOURCES env variable"""
+    sources = []
+    for i, entry in enumerate(part.strip() for part in value.split(',')):
+        if not entry:
+            continue
+        if '=' in entry and not entry.split('=', 1)[0].startswith('http'):
+            camera_id, source = entry.split('=', 1)
+        else:
+            camera_id, source = f"cam{i}", entry
+        source, _, fallback = source.strip().partition('|')
+        fallback = fallback.strip() or None
+        sources.append({
+            'id': camera_id.strip(),
+            'source': int(source) if source.isdigit() else source,
+            'fallback': int(fallback) if fallback and fallback.isdigit() else fallback,
+        })
+    return sources
+
+
+class CameraStream:
+    """One camera: its frame source, detection engine, latest frame and backend client"""
+
+    def __init__(self, camera_id, source, fallback=None):
+        self.camera_id = camera_id
+        # Encodes each processed frame once and wakes the /video_feed clients
+        self.broadcaster = FrameBroadcaster(jpeg_quality=JPEG_QUALITY)
+        # MJPEG cameras hand every original JPEG straight to ?raw=1 viewers
+        self.source = open_frame_source(source, fallback=fallback, on_jpeg=self.broadcaster.publish_raw)
+        self.thread = None
+        # Backend events are sent from a background thread (see camera_client.py)
+        self.backend = BackendClient(BACKEND_URL, camera_id=camera_id, max_queue=BACKEND_QUEUE_SIZE)
+        self.engine = None
+        # Frames go to the inference workers through shared memory, not pickling
+        self.ring = None
+        self.recorder = None
+        if RECORD_CLIPS:
+            self.recorder = ClipRecorder(camera_id, CLIP_DIR, pre_roll_seconds=CLIP_PRE_ROLL_SECONDS,
+                                         post_roll_seconds=CLIP_POST_ROLL_SECONDS,
+                                         disk_limit_mb=CLIP_DISK_LIMIT_MB)
+
+    @property
+    def running(self):
+        return self.engine is not None and self.engine.running
+
+    def start(self, pool):
+        self.backend.start()
+        if self.recorder:
+            self.recorder.start()
+
+        def detect(img, conf_threshold):
+            # Detect objects in a worker process (frees the GIL for other cameras)
+            seq = self.frame_ring(img).write(img)
+            return pool.submit(_detect_in_worker, self.camera_id, self.ring.name, seq, conf_threshold).result()
+
+        self.engine = DetectionEngine(
+            self.source, detect, classNames, self.backend,
+            allowed_items=ALLOWED_ITEMS,
+            confidence_threshold=CONFIDENCE_THRESHOLD,
+            add_delay=ADD_DELAY_SECONDS,
+            remove_delay=REMOVE_DELAY_SECONDS,
+            heartbeat_interval=HEARTBEAT_INTERVAL,
+            on_event=self.on_event,
+        )
+        self.thread = threading.Thread(target=self.detection_loop,
+                                       name=f"camera-{self.camera_id}", daemon=True)
+        self.thread.start()
+
+    def frame_ring(self, img):
+        """The shared-memory ring for frames like img, (re)created on first use or size change"""
+        if self.ring is None or not self.ring.fits(img):
+            self.close_ring()
+            self.ring = FrameRing.create(img.shape)
+        return self.ring
+
+    def close_ring(self):
+        ring, self.ring = self.ring, None
+        if ring is not None:
+            ring.close()
+            ring.unlink()
+
+    def stop(self):
+        if self.engine:
+            self.engine.stop()
+        self.broadcaster.close()
+        self.backend.stop()
+        if self.recorder:
+            self.recorder.stop()
+
+    def status(self):
+        return {
+            'running': self.running,
+            'camera_opened': self.source.is_opened(),
+            'source': self.source.description,
+            'connection': self.source.stats() if hasattr(self.source, 'stats') else None,
+            'frames': self.engine.frame_count if self.engine else 0,
+            'frame_ring': self.ring.stats() if self.ring else None,
+            'stream': self.broadcaster.stats(),
+            'clips': self.recorder.stats() if self.recorder else None,
+            'backend_client': self.backend.stats()
+        }
+
+    def frame_metadata(self, img, result):
+        """Boxes, labels and track state for one frame (served on /detections)"""
+        return {
+            'camera_id': self.camera_id,
+            'frame': result.frame_number,
+            'timestamp': result.timestamp.isoformat(),
+            'width': img.shape[1],
+            'height': img.shape[0],
+            'detections': [
+                {'label': label, 'confidence': round(confidence, 3), 'box': list(box), 'allowed': allowed}
+                for label, confidence, box, allowed in result.detections
+            ],
+            'tracks': {
+                label: {
+                    'consecutive_seconds': round(state['consecutive_seconds'], 2),
+                    'confidence': round(state['confidence'], 3),
+                    'db_added': state['db_added'],
+                    'db_pending': state['db_pending'],
+                }
+                for label, state in list(self.engine.detection_state.items())
+            },
+        }
+
+    def on_frame(self, img, result):
+        """Publish the frame for streaming; overlays are drawn only if a client wants them"""
+        def annotate(frame):
+            draw_overlays(frame, result, self.engine.detection_state,
+                          header_prefix=f"{self.camera_id} | ", status_color=(0, 0, 0))
+
+        # Encoded once per rendition and shared by all viewers; the camera's own
+        # JPEG is reused as the clean full-size frame when there is one
+        jpeg = self.source.last_jpeg if self.source.passthrough else None
+        self.broadcaster.publish(img, jpeg=jpeg, annotate=annotate, metadata=self.frame_metadata(img, result))
+        if not self.source.passthrough:
+            # Webcam/file sources have no original JPEGs; raw viewers get the clean frame
+            self.broadcaster.publish_raw(self.broadcaster.latest()[1])
+        if self.recorder:
+            # Reuse the clean JPEG that was just encoded for the pre-roll
+            _, jpeg = self.broadcaster.latest()
+            self.recorder.add_frame(jpeg, result.timestamp)
+
+    def on_event(self, event, label, current_time):
+        """Item added/removed: save a clip of the seconds around it"""
+        if self.recorder:
+            self.recorder.trigger(event, label, current_time)
+
+    def detection_loop(self):
+        """Capture loop for this camera; inference is offloaded to the pool"""
+        print(f"📹 [{self.camera_id}] Attempting to connect to: {self.source.description}")
+        print("   Please wait, trying to establish connection...")
+
+        if not self.source.open():
+            print(f"❌ [{self.camera_id}] Error: Cannot open camera stream")
+            print(f"   Camera source: {self.source.description}")
+            print("   ")
+            print("   Possible solutions:")
+            print("   1. Check if ESP32-CAM web interface is accessible:")
+            print("      Open in browser: http://10.181.154.254:81")
+            print("   2. Verify ESP32-CAM is streaming:")
+            print(f"      Test URL: {self.source.description}")
+            print("   3. Check if ESP32-CAM firmware is running correctly")
+            print("   4. Try restarting ESP32-CAM (power cycle)")
+            print("   5. Or set USE_WEBCAM_FALLBACK = True to use PC webcam")
+            print("   ")
+            if not self.source.handles_failures:
+                return
+            print(f"🔁 [{self.camera_id}] Will keep retrying in the background (see /health)")
+        else:
+            print(f"✅ [{self.camera_id}] Camera stream opened\n")
 
-try:
-    net = cv2.dnn_DetectionModel(weightsPath, configPath)
-    net.setInputSize(320, 320)
-    net.setInputScale(1.0 / 127.5)
-    net.setInputMean((127.5, 127.5, 127.5))
-    net.setInputSwapRB(True)
-    print(f"✅ Model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    exit(1)
+        try:
+            self.engine.run(self.on_frame)
 
+        except Exception as e:
+            print(f"❌ [{self.camera_id}] Detection loop error: {e}")
 
-def add_item_to_backend(label, confidence):
-    """Add detected item to backend via API"""
-    try:
-        response = requests.post(
-            f"{BACKEND_URL}/api/items",
-            json={
-                'label': label,
-                'quantity': '1 unit',
-                'location': 'Camera Detected',
-                'source': 'camera',
-                'confidence': confidence
-            },
-            timeout=5
-        )
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('success'):
-                item_id = result.get('id')
-                print(f"✅ Added {label} to database (ID: {item_id})")
-                return item_id
-        return None
-    except Exception as e:
-        print(f"❌ Error adding {label}: {e}")
-        return None
-
-
-def send_heartbeat(detected_labels):
-    """Send heartbeat to backend"""
-    try:
-        response = requests.post(
-            f"{BACKEND_URL}/api/camera/heartbeat",
-            json={'labels': detected_labels},
-            timeout=5
-        )
-        if response.status_code == 200:
-            result = response.json()
-            return result.get('updated', 0)
-    except Exception as e:
-        pass
-    return 0
+        finally:
+            self.source.release()
+            self.close_ring()
+            print(f"✅ [{self.camera_id}] Camera detection stopped")
 
 
-def cleanup_stale_items():
-    """Trigger backend cleanup"""
-    try:
-        response = requests.post(
-            f"{BACKEND_URL}/api/camera/cleanup",
-            timeout=5
-        )
-        if response.status_code == 200:
-            result = response.json()
-            removed = result.get('removed', 0)
-            if removed > 0:
-                print(f"🗑️  Cleanup removed {removed} stale items")
-            return removed
-    except Exception as e:
-        pass
-    return 0
-
-
-def update_detection_state(detected_items, current_time):
-    """Update detection state and handle add/remove logic"""
-    global detection_state
-    
-    detected_labels = set()
-    
-    for label, confidence in detected_items:
-        if label not in ALLOWED_ITEMS:
-            continue
-        
-        detected_labels.add(label)
-        
-        if label not in detection_state:
-            detection_state[label] = {
-                'first_seen': current_time,
-                'last_seen': current_time,
-                'consecutive_seconds': 0,
-                'db_added': False,
-                'db_id': None,
-                'confidence': confidence
-            }
-            print(f"👁️  New detection: {label} ({confidence:.2f}) ✅ ALLOWED")
-        else:
-            state = detection_state[label]
-            state['last_seen'] = current_time
-            state['confidence'] = max(state['confidence'], confidence)
-            
-            time_diff = (current_time - state['first_seen']).total_seconds()
-            state['consecutive_seconds'] = time_diff
-            
-            if not state['db_added'] and time_diff >= ADD_DELAY_SECONDS:
-                print(f"⏱️  {label} detected for {time_diff:.1f}s - Adding...")
-                db_id = add_item_to_backend(label, state['confidence'])
-                if db_id:
-                    state['db_added'] = True
-                    state['db_id'] = db_id
-    
-    all_labels = list(detection_state.keys())
-    for label in all_labels:
-        if label not in detected_labels:
-            state = detection_state[label]
-            time_since_last_seen = (current_time - state['last_seen']).total_seconds()
-            
-            if state['db_added'] and time_since_last_seen >= REMOVE_DELAY_SECONDS:
-                print(f"🗑️  {label} not detected for {time_since_last_seen:.1f}s")
-                del detection_state[label]
-            elif time_since_last_seen >= REMOVE_DELAY_SECONDS:
-                print(f"⏹️  {label} detection ended")
-                del detection_state[label]
-    
-    return list(detected_labels)
-
-
-def detection_loop():
-    """Main detection loop running in background thread"""
-    global camera_cap, output_frame, lock, running
-    
-    print("=" * 60)
-    print("🎥 Camera Stream Server Started")
-    print("=" * 60)
-    
-    # Try to connect to camera with fallback options
-    if USE_WEBCAM_FALLBACK:
-        print(f"📹 Using webcam (index {WEBCAM_INDEX})")
-        camera_cap = cv2.VideoCapture(WEBCAM_INDEX)
-        camera_source = f"Webcam {WEBCAM_INDEX}"
-    else:
-        print(f"📹 Attempting to connect to: {CAMERA_URL}")
-        print(f"   Please wait, trying to establish connection...")
-        
-        # Try with different OpenCV backends
-        camera_cap = cv2.VideoCapture(CAMERA_URL, cv2.CAP_FFMPEG)
-        camera_source = CAMERA_URL
-        
-        # If FFMPEG fails, try default backend
-        if not camera_cap.isOpened():
-            print(f"   FFMPEG backend failed, trying default backend...")
-            camera_cap = cv2.VideoCapture(CAMERA_URL)
-    
-    print(f"🔗 Backend URL: {BACKEND_URL}")
-    print(f"✅ Allowed items: {', '.join(ALLOWED_ITEMS)}")
-    print("=" * 60)
-    
-    if not camera_cap.isOpened():
-        print(f"❌ Error: Cannot open camera stream")
-        print(f"   Camera source: {camera_source}")
-        print("   ")
-        print("   Possible solutions:")
-        print("   1. Check if ESP32-CAM web interface is accessible:")
-        print(f"      Open in browser: http://10.181.154.254:81")
-        print("   2. Verify ESP32-CAM is streaming:")
-        print(f"      Test URL: {CAMERA_URL}")
-        print("   3. Check if ESP32-CAM firmware is running correctly")
-        print("   4. Try restarting ESP32-CAM (power cycle)")
-        print("   5. Or set USE_WEBCAM_FALLBACK = True to use PC webcam")
-        print("   ")
-        running = False
-        return
-    
-    print("✅ Camera stream opened\n")
-    
-    last_heartbeat = time.time()
-    last_cleanup = time.time()
-    frame_count = 0
-    
-    running = True
-    
-    try:
-        while running:
-            frame_count += 1
-            current_time = datetime.now()
-            
-            ret, img = camera_cap.read()
-            if not ret:
-                print("⚠️  Failed to grab frame")
-                time.sleep(0.1)
-                continue
-            
-            # Detect objects
-            classIds, confs, bbox = net.detect(img, confThreshold=CONFIDENCE_THRESHOLD)
-            
-            detected_items = []
-            filtered_items = []
-            
-            if len(classIds) != 0:
-                for classId, confidence, box in zip(classIds.flatten(), confs.flatten(), bbox):
-                    label = classNames[classId - 1]
-                    
-                    if label in ALLOWED_ITEMS:
-                        detected_items.append((label, float(confidence)))
-                        cv2.rectangle(img, box, color=(0, 255, 0), thickness=3)
-                        cv2.putText(img, f"{label} {confidence:.2f}", 
-                                   (box[0] + 10, box[1] + 30), 
-                                   cv2.FONT_HERSHEY_COMPLEX, 1, (0, 255, 0), 2)
-                    else:
-                        filtered_items.append(label)
-                        cv2.rectangle(img, box, color=(0, 0, 255), thickness=2)
-                        cv2.putText(img, f"{label} (FILTERED)", 
-                                   (box[0] + 10, box[1] + 30), 
-                                   cv2.FONT_HERSHEY_COMPLEX, 0.8, (0, 0, 255), 2)
-            
-            # Update detection state
-            detected_labels = update_detection_state(detected_items, current_time)
-            
-            # Send heartbeat every second
-            if time.time() - last_heartbeat >= HEARTBEAT_INTERVAL:
-                if detected_labels:
-                    send_heartbeat(detected_labels)
-                last_heartbeat = time.time()
-            
-            # Run cleanup every 3 seconds
-            if time.time() - last_cleanup >= 3:
-                cleanup_stale_items()
-                last_cleanup = time.time()
-            
-            # Display status on frame
-            status_y = 30
-            cv2.putText(img, f"Frame: {frame_count} | Allowed: {len(detected_items)} | Filtered: {len(filtered_items)}", 
-                       (10, status_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
-            
-            for label, state in detection_state.items():
-                status_y += 30
-                status_text = f"{label}: {state['consecutive_seconds']:.1f}s"
-                if state['db_added']:
-                    status_text += " [IN DB]"
-                    color = (0, 0, 0)  # Black
-                else:
-                    color = (0, 0, 0)  # Black
-                cv2.putText(img, status_text, (10, status_y), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            # Update global frame for streaming
-            with lock:
-                output_frame = img.copy()
-    
-    except Exception as e:
-        print(f"❌ Detection loop error: {e}")
-    
-    finally:
-        if camera_cap:
-            camera_cap.release()
-        running = False
-        print("✅ Camera detection stopped")
-
-
-def generate_frames():
-    """Generator function to stream frames as MJPEG"""
-    global output_frame, lock
-    
-    while True:
-        with lock:
-            if output_frame is None:
-                continue
-            
-            # Encode frame as JPEG
-            (flag, encodedImage) = cv2.imencode(".jpg", output_frame)
-            
-            if not flag:
-                continue
-        
-        # Yield frame in byte format
-        yield(b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
-              bytearray(encodedImage) + b'\r\n')
+def generate_frames(camera, width=None, quality=None, max_fps=None, overlay=True, raw=False):
+    """Generator function to stream one camera's frames as MJPEG"""
+    return camera.broadcaster.stream(width=width, quality=quality, max_fps=max_fps, overlay=overlay, raw=raw)
+
+
+def get_camera(camera_id=None):
+    """Look up a camera by id; None selects the first configured camera"""
+    if camera_id is None:
+        camera_id = next(iter(cameras), None)
+    camera = cameras.get(camera_id)
+    if camera is None:
+        abort(404, description=f"Unknown camera: {camera_id}")
+    return camera
 
 
 @stream_app.route('/video_feed')
-def video_feed():
-    """Video streaming route"""
-    return Response(generate_frames(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+@stream_app.route('/video_feed/<camera_id>')
+def video_feed(camera_id=None):
+    """Video streaming route
+
+    Optional query parameters (snapped to the renditions in mjpeg_broadcaster.py):
+        w   - max width in pixels, e.g. ?w=320 for thumbnails
+        q   - JPEG quality 1-100
+        fps - max frames per second for this client
+        overlay=0 - clean frames without burned-in boxes (render them from /detections)
+        raw=1 - the camera's own JPEGs at its full frame rate, never decoded or
+                re-encoded (no overlays; w/q are ignored, fps still applies)
+    """
+    camera = get_camera(camera_id)
+    width = request.args.get('w', type=int)
+    quality = request.args.get('q', type=int)
+    max_fps = request.args.get('fps', type=float)
+    overlay = request.args.get('overlay', '1') not in ('0', 'false', 'no')
+    raw = request.args.get('raw', '0') in ('1', 'true', 'yes')
+    return streaming_response(generate_frames(camera, width, quality, max_fps, overlay, raw), 'video_feed',
+                              mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@stream_app.route('/detections')
+@stream_app.route('/detections/<camera_id>')
+def detections(camera_id=None):
+    """Per-frame detection metadata (boxes, labels, confidence, track state)
+
+    Server-Sent Events by default; ?format=ndjson for one JSON object per line.
+    Each event carries the frame sequence number, matching the X-Frame-Seq /
+    ETag of /snapshot.jpg, so clients can draw overlays themselves.
+    """
+    camera = get_camera(camera_id)
+    fmt = request.args.get('format', 'sse')
+    if fmt == 'ndjson':
+        return streaming_response(camera.broadcaster.metadata_stream('ndjson'), 'detections',
+                                  mimetype='application/x-ndjson')
+    return streaming_response(camera.broadcaster.metadata_stream('sse'), 'detections',
+                              mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@stream_app.route('/snapshot.jpg')
+@stream_app.route('/snapshot/<camera_id>.jpg')
+def snapshot(camera_id=None):
+    """Latest already-encoded clean frame as a single JPEG (no streaming connection)
+
+    ETag is the frame sequence number (prefixed with this server's start time
+    so tags from a previous run never match). Supports If-None-Match, and
+    ?after=<seq> long-polls until a newer frame exists (max ?timeout= seconds).
+    """
+    camera = get_camera(camera_id)
+    broadcaster = camera.broadcaster
+
+    after = request.args.get('after', type=int)
+    if after is not None:
+        timeout = min(request.args.get('timeout', SNAPSHOT_POLL_TIMEOUT, type=float), SNAPSHOT_POLL_TIMEOUT)
+        seq, jpeg = broadcaster.wait_for(after, timeout=max(timeout, 0))
+        if jpeg is None:
+            seq, jpeg = broadcaster.latest()
+    else:
+        seq, jpeg = broadcaster.latest()
+
+    if jpeg is None:
+        return jsonify({'success': False, 'message': 'No frame available yet'}), 503
+
+    etag = f"{SERVER_EPOCH}-{seq}"
+    if request.if_none_match.contains(etag) or (after is not None and seq <= after):
+        response = Response(status=304)
+    else:
+        response = Response(jpeg, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.headers['X-Frame-Seq'] = str(seq)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @stream_app.route('/health')
 def health():
     """Health check"""
-    return jsonify({'status': 'ok', 'running': running, 'camera_opened': camera_cap is not None and camera_cap.isOpened()})
+    statuses = {camera_id: camera.status() for camera_id, camera in cameras.items()}
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),  # Lets backend.py match this server to its pidfile
+        'uptime_seconds': round(time.time() - SERVER_STARTED, 1),
+        'running': any(s['running'] for s in statuses.values()),
+        'camera_opened': any(s['camera_opened'] for s in statuses.values()),
+        'streams': stream_limiter.stats(),
+        'cameras': statuses
+    })
+
+
+@stream_app.route('/clips')
+def clips():
+    """Recorded add/remove clips, newest first (?camera=<id> to filter)"""
+    camera_id = request.args.get('camera')
+    return jsonify({
+        'clips': [
+            dict(clip, url=f"/clips/{clip['file']}")
+            for clip in list_clips(CLIP_DIR, camera_id)
+        ]
+    })
+
+
+@stream_app.route('/clips/<filename>')
+def clip_file(filename):
+    """Download one recorded clip (.avi) or its metadata (.json)"""
+    name, ext = os.path.splitext(filename)
+    if ext not in ('.avi', '.json'):
+        abort(404)
+    touch_clip(CLIP_DIR, name)
+    return send_from_directory(CLIP_DIR, filename, conditional=True)
+
+
+@stream_app.route('/cameras')
+def list_cameras():
+    """List configured cameras and their stream URLs"""
+    return jsonify({
+        'cameras': [
+            {'id': camera_id, 'video_feed': f"/video_feed/{camera_id}", 'running': camera.running}
+            for camera_id, camera in cameras.items()
+        ]
+    })
 
 
 @stream_app.route('/')
@@ -365,27 +611,91 @@ def index():
     return jsonify({
         'message': 'Camera Stream Server Running',
         'endpoints': {
-            '/video_feed': 'MJPEG video stream',
+            '/video_feed': 'MJPEG video stream (first camera)',
+            '/video_feed/<camera_id>': 'MJPEG video stream for one camera',
+            '/video_feed?w=320&q=50&fps=5': 'Smaller / lower quality / rate-limited stream',
+            '/video_feed?overlay=0': 'Stream without burned-in overlays',
+            '/video_feed?raw=1': "Camera's original JPEGs, passed through untouched",
+            '/detections': 'Per-frame detection metadata (SSE, or ?format=ndjson)',
+            '/snapshot.jpg': 'Latest frame as JPEG (ETag / If-None-Match, ?after=<seq> long-poll)',
+            '/snapshot/<camera_id>.jpg': 'Latest frame of one camera',
+            '/clips': 'Recorded clips around item add/remove events',
+            '/clips/<file>': 'Download a clip (.avi) or its metadata (.json)',
+            '/cameras': 'Configured cameras',
             '/health': 'Health check',
         },
-        'status': 'running' if running else 'stopped'
+        'status': 'running' if any(c.running for c in cameras.values()) else 'stopped'
     })
 
 
 def start_stream_server():
-    """Start the detection loop and stream server"""
-    # Start detection in background thread
-    detection_thread = threading.Thread(target=detection_loop, daemon=True)
-    detection_thread.start()
-    
-    # Start server (use Waitress on Windows for better subprocess compatibility)
-    print("\n🌐 Stream server starting on http://0.0.0.0:5001")
-    if USE_WAITRESS and sys.platform == 'win32':
-        print("   Using Waitress server (Windows-optimized)")
-        serve(stream_app, host='0.0.0.0', port=5001, threads=4)
-    else:
-        print("   Using Flask built-in server")
-        stream_app.run(host='0.0.0.0', port=5001, threaded=True, debug=False, use_reloader=False)
+    """Start the per-camera detection loops and stream server"""
+    sources = CAMERA_SOURCES
+    if os.getenv('CAMERA_SOURCES'):
+        sources = parse_camera_sources(os.getenv('CAMERA_SOURCES'))
+
+    workers = INFERENCE_WORKERS or min(len(sources), os.cpu_count() or 1)
+
+    print("=" * 60)
+    print("🎥 Camera Stream Server Started")
+    print("=" * 60)
+    print(f"🔗 Backend URL: {BACKEND_URL}")
+    print(f"✅ Allowed items: {', '.join(ALLOWED_ITEMS)}")
+    print(f"📷 Cameras: {', '.join(s['id'] for s in sources)}")
+    print(f"🧠 Inference workers: {workers} ({DETECTOR_BACKEND})")
+    print("=" * 60)
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_inference_worker,
+                               initargs=(DETECTOR_BACKEND, DETECTOR_OPTIONS))
+
+    # Start one detection thread per camera
+    for entry in sources:
+        camera = CameraStream(entry['id'], entry['source'], fallback=entry.get('fallback'))
+        cameras[camera.camera_id] = camera
+        camera.start(pool)
+
+    print(f"\n🌐 Stream server starting on http://0.0.0.0:{STREAM_PORT}")
+    try:
+        if USE_WAITRESS:
+            serve_production()
+        else:
+            print("   Using Flask built-in server (install waitress for production use)")
+            stream_app.run(host='0.0.0.0', port=STREAM_PORT, threaded=True, debug=False, use_reloader=False)
+    finally:
+        shutdown_cameras()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_cameras():
+    """Stop detection and wake every streaming client so its response can finish"""
+    for camera in cameras.values():
+        camera.stop()
+
+
+def serve_production():
+    """Serve with waitress: bounded threads, small per-client buffers, graceful stop"""
+    server = create_server(
+        stream_app,
+        host='0.0.0.0',
+        port=STREAM_PORT,
+        threads=SERVER_THREADS,
+        connection_limit=SERVER_THREADS * 4,
+        channel_timeout=SLOW_CLIENT_SECONDS * 6,
+        outbuf_high_watermark=OUTBUF_HIGH_WATERMARK,
+    )
+    print(f"   Using Waitress ({SERVER_THREADS} threads, max {MAX_STREAMS} streams)")
+
+    def request_shutdown(signum, frame):
+        print(f"\n⏹️  Received signal {signum}, shutting down stream server...")
+        shutdown_cameras()  # Ends the open streams so their threads are released
+        raise SystemExit(0)  # waitress catches this and drains its task threads
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, request_shutdown)  # CTRL_BREAK_EVENT from backend.py on Windows
+
+    server.run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,378 @@
+"""
+Camera stream server supervisor for the Smart Fridge backend
+Starts camera_stream_server.py as a child process and keeps it alive:
+
+    - a pidfile records the running server, guarded by a lock file, so
+      several backend workers (or a restarted backend) see the same process
+      instead of starting a second one
+    - readiness comes from the stream server's /health endpoint, polled by a
+      background thread; no request ever sleeps waiting for it
+    - if the process dies unexpectedly it is restarted with jittered
+      exponential backoff (only by the worker that started it)
+    - output is appended to the log file with a header per start
+
+status() only reads what the monitor thread last saw, so it never blocks.
+"""
+
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import requests
+
+HEALTH_URL = 'http://127.0.0.1:5001/health'
+POLL_INTERVAL = 2  # Seconds between health probes / process checks
+PROBE_TIMEOUT = 1.5
+READY_TIMEOUT = 60  # Seconds a starting server may take before it counts as unhealthy
+STOP_TIMEOUT = 5  # Seconds to wait for a graceful stop before killing
+RESTART_BASE_SECONDS = 1
+RESTART_MAX_SECONDS = 60
+STABLE_SECONDS = 60  # Ready this long -> the restart backoff starts over
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on a file, shared across processes"""
+    with open(path, 'a+') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _pid_running(pid):
+    """True if a process with this PID exists (it may belong to another user)"""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    if os.name == 'nt':
+        # os.kill() would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class CameraSupervisor:
+    """Owns the camera_stream_server.py child process for one backend"""
+
+    def __init__(self, script_path, log_path, pid_path, health_url=HEALTH_URL, logger=None):
+        self.script_path = str(script_path)
+        self.log_path = str(log_path)
+        self.pid_path = str(pid_path)
+        self.lock_path = self.pid_path + '.lock'
+        self.health_url = health_url
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._process = None  # Only set in the worker that started the server
+        self._monitor = None
+        self._stopping = threading.Event()
+        self._restart_at = None
+        self._restart_attempts = 0
+        self.restarts = 0
+        self.last_exit_code = None
+        # Last observation of the monitor thread
+        self._health = None
+        self._ready_since = None
+        self._last_probe = None
+        self._frames = None
+        self.fps = None
+
+    # ------------------------------------------------------------------
+    # pidfile
+    # ------------------------------------------------------------------
+    def _read_pidfile(self):
+        try:
+            with open(self.pid_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_pidfile(self, pid):
+        with open(self.pid_path, 'w') as f:
+            json.dump({'pid': pid, 'started_at': time.time(), 'script': self.script_path}, f)
+
+    def _remove_pidfile(self):
+        try:
+            os.remove(self.pid_path)
+        except FileNotFoundError:
+            pass
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    # ------------------------------------------------------------------
+    # Process control
+    # ------------------------------------------------------------------
+    def _spawn(self):
+        """Start the stream server and record it in the pidfile (caller holds the file lock)"""
+        with open(self.log_path, 'a', encoding='utf-8') as log:
+            log.write(f"\n===== {datetime.now().isoformat(timespec='seconds')} "
+                      f"starting {os.path.basename(self.script_path)} =====\n")
+            log.flush()
+            env = dict(os.environ, PYTHONUNBUFFERED='1')
+            process = subprocess.Popen(
+                [sys.executable, self.script_path],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                cwd=os.path.dirname(self.script_path) or None,
+                env=env,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
+            )
+        with self._lock:
+            self._process = process
+            self._restart_at = None
+            self._health = None
+            self._ready_since = None
+            self._frames = None
+            self.fps = None
+        self._write_pidfile(process.pid)
+        self._log('info', f'Camera stream server started with PID {process.pid} (log: {self.log_path})')
+        return process.pid
+
+    def _alive_pid(self):
+        """PID of a running stream server, from this worker or another one"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return self._process.pid
+        return self._pidfile_alive(self._read_pidfile())
+
+    def _pidfile_alive(self, info):
+        """PID from the pidfile if that server is still running, else None
+
+        A server that is still loading its model does not answer /health yet:
+        within READY_TIMEOUT of its start the process existing is enough.
+        After that /health must answer with its PID (the PID may have been
+        reused by an unrelated process).
+        """
+        if not info:
+            return None
+        pid = info.get('pid')
+        if _pid_running(pid) and time.time() - info.get('started_at', 0) <= READY_TIMEOUT:
+            return pid
+        health = self._probe()
+        if health and health.get('pid') == pid:
+            return pid
+        return None
+
+    def start(self):
+        """Start the stream server unless one is already running; never waits for readiness
+
+        Returns (started, pid).
+        """
+        self._ensure_monitor()
+        with _file_lock(self.lock_path):
+            pid = self._alive_pid()
+            if pid is not None:
+                return False, pid
+            with self._lock:
+                self._restart_attempts = 0
+            return True, self._spawn()
+
+    def stop(self):
+        """Stop the stream server (whichever worker started it); returns the stopped PID or None"""
+        with _file_lock(self.lock_path):
+            info = self._read_pidfile()
+            # Removing the pidfile first tells the owning worker not to restart it
+            self._remove_pidfile()
+            with self._lock:
+                process, self._process = self._process, None
+                self._restart_at = None
+            if process is not None and process.poll() is None:
+                self._terminate(process)
+                return process.pid
+            pid = self._pidfile_alive(info)
+            if pid is not None:
+                self._signal_pid(pid)
+                return pid
+            return None
+
+    def _terminate(self, process):
+        self._log('info', f'Stopping camera stream server PID {process.pid}')
+        try:
+            if sys.platform == 'win32':
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                process.terminate()
+            process.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        self.last_exit_code = process.returncode
+
+    def _signal_pid(self, pid):
+        """Ask a server started by another worker to stop"""
+        self._log('info', f'Stopping camera stream server PID {pid} (started by another worker)')
+        try:
+            os.kill(pid, signal.CTRL_BREAK_EVENT if sys.platform == 'win32' else signal.SIGTERM)
+        except OSError as e:
+            self._log('warning', f'Could not signal PID {pid}: {e}')
+
+    def shutdown(self):
+        """Backend exit: stop the monitor and the server if this worker owns it"""
+        self._stopping.set()
+        with self._lock:
+            owned = self._process is not None
+        if owned:
+            self.stop()
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+    def _ensure_monitor(self):
+        with self._lock:
+            if self._monitor is None or not self._monitor.is_alive():
+                self._monitor = threading.Thread(target=self._monitor_loop, name='camera-supervisor',
+                                                 daemon=True)
+                self._monitor.start()
+
+    def _probe(self):
+        try:
+            response = requests.get(self.health_url, timeout=PROBE_TIMEOUT)
+            if response.status_code == 200:
+                return response.json()
+        except (requests.RequestException, ValueError):
+            pass
+        return None
+
+    def _backoff(self):
+        delay = min(RESTART_MAX_SECONDS, RESTART_BASE_SECONDS * (2 ** min(self._restart_attempts, 10)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _check_process(self):
+        """Notice an unexpected exit of our child and schedule (or perform) a restart"""
+        with self._lock:
+            process = self._process
+            restart_at = self._restart_at
+        if process is not None and process.poll() is not None:
+            info = self._read_pidfile()
+            with self._lock:
+                self._process = None
+                self.last_exit_code = process.returncode
+            if info and info.get('pid') == process.pid:
+                # Still wanted: nobody called stop()
+                with self._lock:
+                    delay = self._backoff()
+                    self._restart_attempts += 1
+                    self._restart_at = time.monotonic() + delay
+                self._log('warning', f'Camera stream server exited with code {process.returncode}; '
+                                     f'restarting in {delay:.1f}s')
+            return
+
+        if restart_at is not None and time.monotonic() >= restart_at:
+            with _file_lock(self.lock_path):
+                info = self._read_pidfile()
+                with self._lock:
+                    wanted = self._restart_at is not None
+                if wanted and info is not None:
+                    self._spawn()
+                    with self._lock:
+                        self.restarts += 1
+                else:
+                    with self._lock:
+                        self._restart_at = None
+
+    def _update_health(self):
+        now = time.monotonic()
+        health = self._probe() if self._read_pidfile() else None
+        frames = None
+        if health:
+            frames = sum(c.get('frames', 0) for c in health.get('cameras', {}).values())
+        with self._lock:
+            if health and self._ready_since is None:
+                self._ready_since = now
+                self._log('info', f"Camera stream server ready (PID {health.get('pid')})")
+            elif not health:
+                self._ready_since = None
+            if frames is not None and self._frames is not None and self._last_probe:
+                elapsed = now - self._last_probe
+                self.fps = round(max(0, frames - self._frames) / elapsed, 1) if elapsed > 0 else self.fps
+            elif frames is None:
+                self.fps = None
+            self._frames = frames
+            self._health = health
+            self._last_probe = now
+            if self._ready_since is not None and now - self._ready_since >= STABLE_SECONDS:
+                self._restart_attempts = 0
+
+    def _monitor_loop(self):
+        while not self._stopping.wait(POLL_INTERVAL):
+            try:
+                self._check_process()
+                self._update_health()
+            except Exception as e:
+                self._log('warning', f'Camera supervisor check failed: {e}')
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+    def status(self):
+        """Last known state; never probes or waits"""
+        self._ensure_monitor()
+        info = self._read_pidfile()
+        now = time.monotonic()
+        with self._lock:
+            health = self._health
+            owned_alive = self._process is not None and self._process.poll() is None
+            if self._restart_at is not None:
+                state = 'restarting'
+            elif health and (not info or health.get('pid') == info.get('pid')):
+                state = 'ready'
+            elif owned_alive or info:
+                # Not answering /health (yet); info may also be a stale pidfile
+                started = info.get('started_at', time.time()) if info else time.time()
+                state = 'unhealthy' if time.time() - started > READY_TIMEOUT else 'starting'
+            else:
+                state = 'stopped'
+            return {
+                'state': state,
+                'pid': info.get('pid') if info and state != 'stopped' else None,
+                'uptime_seconds': health.get('uptime_seconds') if health else None,
+                'fps': self.fps,
+                'cameras': {
+                    camera_id: {
+                        'running': camera.get('running'),
+                        'camera_opened': camera.get('camera_opened'),
+                        'frames': camera.get('frames'),
+                        'connection': (camera.get('connection') or {}).get('state'),
+                    }
+                    for camera_id, camera in (health or {}).get('cameras', {}).items()
+                },
+                'restarts': self.restarts,
+                'next_restart_in': (round(max(0.0, self._restart_at - now), 1)
+                                    if self._restart_at is not None else None),
+                'last_exit_code': self.last_exit_code,
+                'checked_seconds_ago': round(now - self._last_probe, 1) if self._last_probe else None,
+                'log': self.log_path,
+            }
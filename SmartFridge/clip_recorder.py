@@ -0,0 +1,313 @@
+"""
+Event-triggered clip recording for the Smart Fridge stream server
+Keeps the last few seconds of already-encoded JPEG frames in memory (the
+pre-roll). When an item is added or removed, the pre-roll plus the following
+seconds (post-roll) are written to an MJPEG .avi clip by a background thread,
+with a .json sidecar describing the events, so false positives can be audited.
+The JPEGs go into the .avi as they are (no decode/re-encode), so writing a
+clip costs little more than the disk I/O.
+
+Memory is bounded by the pre-roll window and MAX_CLIP_SECONDS per clip; disk
+is bounded by a size cap that deletes least-recently-used clips first
+(serving a clip counts as a use).
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+from collections import deque
+from datetime import timedelta
+
+import cv2
+import numpy as np
+
+PRE_ROLL_SECONDS = 5
+POST_ROLL_SECONDS = 5
+MAX_CLIP_SECONDS = 30  # Repeated events extend a clip up to this length
+MAX_FPS = 30  # Caps frames kept per second of pre-roll/clip
+DISK_LIMIT_MB = 500
+WRITE_QUEUE_SIZE = 4  # Finished clips waiting for the writer; more are dropped
+
+
+class _Clip:
+    """Frames and events collected for one clip that is still recording"""
+
+    def __init__(self, frames, event, deadline):
+        self.frames = list(frames)
+        self.events = [event]
+        self.deadline = deadline
+        self.started = self.frames[0][0]
+
+
+class ClipRecorder:
+    """Pre-roll buffer, active clip and background writer for one camera"""
+
+    def __init__(self, camera_id, directory, pre_roll_seconds=PRE_ROLL_SECONDS,
+                 post_roll_seconds=POST_ROLL_SECONDS, max_clip_seconds=MAX_CLIP_SECONDS,
+                 disk_limit_mb=DISK_LIMIT_MB):
+        self.camera_id = camera_id
+        self.directory = directory
+        self.pre_roll_seconds = pre_roll_seconds
+        self.post_roll_seconds = post_roll_seconds
+        self.max_clip_seconds = max_clip_seconds
+        self.disk_limit_bytes = int(disk_limit_mb * 1024 * 1024)
+        self._pre_roll = deque(maxlen=int(pre_roll_seconds * MAX_FPS))
+        self._clip = None
+        self._pending_events = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._thread = None
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.bytes_written = 0
+        self.clips_deleted = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._writer, name=f"clips-{self.camera_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Flush the clip in progress and wait for the writer to finish"""
+        with self._lock:
+            clip, self._clip = self._clip, None
+        if clip is not None:
+            self._enqueue(clip)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def trigger(self, event, label, timestamp):
+        """Start (or extend) a clip around an add/remove event
+
+        The clip itself starts on the next add_frame(), so events raised while
+        a frame is being processed include that frame in the post-roll.
+        """
+        with self._lock:
+            self._pending_events.append(({'event': event, 'label': label, 'time': timestamp.isoformat()},
+                                         timestamp))
+
+    def add_frame(self, jpeg, timestamp):
+        """Record one encoded frame; finishes the active clip once its post-roll is over"""
+        if not jpeg:
+            return  # Nothing was encoded for this frame
+        finished = None
+        with self._lock:
+            # Pre-roll holds only the last pre_roll_seconds (and at most MAX_FPS per second)
+            self._pre_roll.append((timestamp, jpeg))
+            while (timestamp - self._pre_roll[0][0]).total_seconds() > self.pre_roll_seconds:
+                self._pre_roll.popleft()
+
+            clip = self._clip
+            if clip is not None:
+                clip.frames.append((timestamp, jpeg))
+
+            for event, at in self._pending_events:
+                post_roll_end = at + timedelta(seconds=self.post_roll_seconds)
+                if clip is None:
+                    # The pre-roll already ends with this frame
+                    clip = self._clip = _Clip(self._pre_roll, event, post_roll_end)
+                else:
+                    clip.events.append(event)
+                    clip.deadline = max(clip.deadline, post_roll_end)
+            self._pending_events = []
+
+            if clip is not None:
+                clip.deadline = min(clip.deadline, clip.started + timedelta(seconds=self.max_clip_seconds))
+                too_long = len(clip.frames) >= self.max_clip_seconds * MAX_FPS
+                if timestamp >= clip.deadline or too_long:
+                    finished, self._clip = clip, None
+
+        if finished is not None:
+            self._enqueue(finished)
+
+    def _enqueue(self, clip):
+        try:
+            self._queue.put_nowait(clip)
+        except queue.Full:
+            with self._lock:
+                self.clips_dropped += 1
+            print(f"⚠️  [{self.camera_id}] Clip writer busy, dropping clip of {len(clip.frames)} frames")
+
+    def _writer(self):
+        while True:
+            clip = self._queue.get()
+            if clip is None:
+                return
+            try:
+                self._write(clip)
+                self._enforce_disk_limit()
+            except Exception as e:
+                print(f"❌ [{self.camera_id}] Failed to write clip: {e}")
+
+    def _write(self, clip):
+        """Write the JPEGs to an MJPEG .avi plus a .json sidecar"""
+        first_time = clip.frames[0][0]
+        last_time = clip.frames[-1][0]
+        duration = (last_time - first_time).total_seconds()
+        fps = max(1.0, min(MAX_FPS, (len(clip.frames) - 1) / duration)) if duration > 0 else 10.0
+
+        first_event = clip.events[0]
+        name = (f"{self.camera_id}_{first_time.strftime('%Y%m%d_%H%M%S')}_"
+                f"{first_event['event']}_{first_event['label'].replace(' ', '-')}")
+        path = os.path.join(self.directory, name + '.avi')
+
+        dimensions = None
+        jpegs = []
+        for _, jpeg in clip.frames:
+            frame_size = jpeg_size(jpeg)
+            if frame_size is None:
+                continue  # Not a readable JPEG
+            dimensions = dimensions or frame_size
+            if frame_size != dimensions:
+                # Resolution changed mid-clip (e.g. switched to a fallback camera):
+                # only these frames are decoded and re-encoded
+                img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    continue
+                ok, encoded = cv2.imencode('.jpg', cv2.resize(img, dimensions))
+                if not ok:
+                    continue
+                jpeg = encoded.tobytes()
+            jpegs.append(jpeg)
+        if not jpegs:
+            print(f"⚠️  [{self.camera_id}] No readable frames for clip {name}, skipping")
+            return
+        write_mjpeg_avi(path, jpegs, fps, *dimensions)
+
+        with open(os.path.join(self.directory, name + '.json'), 'w') as f:
+            json.dump({
+                'camera_id': self.camera_id,
+                'start': first_time.isoformat(),
+                'end': last_time.isoformat(),
+                'frames': len(jpegs),
+                'fps': round(fps, 2),
+                'events': clip.events,
+            }, f, indent=2)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self.clips_written += 1
+            self.bytes_written += size
+        print(f"🎬 [{self.camera_id}] Saved clip {name}.avi ({len(jpegs)} frames, {size / 1024:.0f} KB)")
+
+    def _enforce_disk_limit(self):
+        """Delete least-recently-used clips until the directory fits the size cap"""
+        clips = list_clips(self.directory)
+        total = sum(c['bytes'] for c in clips)
+        for clip in sorted(clips, key=lambda c: c['last_used']):
+            if total <= self.disk_limit_bytes:
+                break
+            for ext in ('.avi', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, clip['name'] + ext))
+                except FileNotFoundError:
+                    pass
+            total -= clip['bytes']
+            with self._lock:
+                self.clips_deleted += 1
+            print(f"🧹 [{self.camera_id}] Deleted old clip {clip['name']}.avi (disk cap)")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'recording': self._clip is not None,
+                'pre_roll_frames': len(self._pre_roll),
+                'clips_written': self.clips_written,
+                'clips_dropped': self.clips_dropped,
+                'clips_deleted': self.clips_deleted,
+                'bytes_written': self.bytes_written,
+            }
+
+
+def jpeg_size(jpeg):
+    """(width, height) from a JPEG's frame header, or None if it is not a JPEG"""
+    if not jpeg or jpeg[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 <= len(jpeg):
+        if jpeg[i] != 0xFF:
+            return None
+        marker = jpeg[i + 1]
+        if marker == 0xFF:
+            i += 1  # Fill byte
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', jpeg[i + 5:i + 9])
+            return (width, height) if width and height else None
+        i += 2 + struct.unpack('>H', jpeg[i + 2:i + 4])[0]
+    return None
+
+
+def _chunk(fourcc, data):
+    return fourcc + struct.pack('<I', len(data)) + data + (b'\0' if len(data) % 2 else b'')
+
+
+def _list(kind, data):
+    return _chunk(b'LIST', kind + data)
+
+
+def write_mjpeg_avi(path, jpegs, fps, width, height):
+    """Write already-encoded JPEG frames (all width x height) into an MJPEG .avi"""
+    rate = max(1, int(round(fps * 1000)))
+    largest = max(len(jpeg) for jpeg in jpegs)
+    avih = struct.pack('<14I', int(1e6 / fps), largest * int(fps + 1), 0, 0x10, len(jpegs), 0, 1,
+                       largest, width, height, 0, 0, 0, 0)
+    strh = struct.pack('<4s4sIHHIIIIIIIIhhhh', b'vids', b'MJPG', 0, 0, 0, 0, 1000, rate, 0,
+                       len(jpegs), largest, 0xFFFFFFFF, 0, 0, 0, width, height)
+    strf = struct.pack('<IiiHH4sIiiII', 40, width, height, 1, 24, b'MJPG', width * height * 3, 0, 0, 0, 0)
+    header = _list(b'hdrl', _chunk(b'avih', avih) + _list(b'strl', _chunk(b'strh', strh) + _chunk(b'strf', strf)))
+
+    index = []
+    offset = 4  # idx1 offsets count from the 'movi' fourcc
+    for jpeg in jpegs:
+        index.append(struct.pack('<4sIII', b'00dc', 0x10, offset, len(jpeg)))
+        offset += 8 + len(jpeg) + len(jpeg) % 2
+    movi_size = offset
+    idx1 = _chunk(b'idx1', b''.join(index))
+
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 4 + len(header) + 8 + movi_size + len(idx1)) + b'AVI ')
+        f.write(header)
+        f.write(b'LIST' + struct.pack('<I', movi_size) + b'movi')
+        for jpeg in jpegs:
+            f.write(_chunk(b'00dc', jpeg))
+        f.write(idx1)
+
+
+def list_clips(directory, camera_id=None):
+    """Saved clips, newest first, with their sidecar metadata"""
+    if not os.path.isdir(directory):
+        return []
+    clips = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.avi'):
+            continue
+        name = filename[:-4]
+        path = os.path.join(directory, filename)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue  # Deleted by the disk cap meanwhile
+        meta = {}
+        try:
+            with open(os.path.join(directory, name + '.json')) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+        if camera_id and meta.get('camera_id', name.split('_')[0]) != camera_id:
+            continue
+        clips.append(dict(meta, name=name, file=filename, bytes=stat.st_size,
+                          last_used=stat.st_mtime))
+    return sorted(clips, key=lambda c: c.get('start', ''), reverse=True)
+
+
+def touch_clip(directory, name):
+    """Mark a clip as recently used so the disk cap deletes it last"""
+    try:
+        os.utime(os.path.join(directory, name + '.avi'))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,919 @@
+"""
+Detection Engine for Smart Fridge cameras
+Shared by camera_detector.py and camera_stream_server.py:
+
+    frame sources  - ESP32-CAM/network MJPEG, local webcam, video file, or a
+                     directory of images replayed at a fixed FPS
+    MjpegStreamSource - parses HTTP MJPEG itself: the camera's original JPEG
+                     bytes can be forwarded untouched, and only the newest
+                     frame is decoded when the detection loop asks for one
+    SupervisedSource - reconnects live sources after failures or stalls,
+                     with backoff and an optional fallback source
+    DetectionTracker - the add-after-7s / remove-after-7s logic per camera
+    DetectionEngine  - read -> detect -> track -> heartbeat/cleanup loop
+    draw_overlays    - boxes and status text for anyone watching
+
+Replayed sources (video files, image directories) can run faster than real
+time: frames are stamped with synthetic timestamps at the requested FPS, so
+the 7-second timers behave exactly as they would live. Together with
+DryRunBackend this lets the whole pipeline be profiled and regression-tested
+on recorded footage without a camera or a running backend.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import requests
+
+# Defaults (each entry point passes its own configuration)
+ALLOWED_ITEMS = ['orange', 'banana', 'apple', 'carrot']
+CONFIDENCE_THRESHOLD = 0.5
+ADD_DELAY_SECONDS = 7
+REMOVE_DELAY_SECONDS = 7
+HEARTBEAT_INTERVAL = 1
+CLEANUP_INTERVAL = 3
+
+# Live source supervision (see SupervisedSource)
+CAPTURE_TIMEOUT_SECONDS = 5  # OpenCV open/read timeout for network streams
+RAW_MJPEG = True  # Parse http(s) MJPEG streams ourselves instead of via cv2.VideoCapture
+MAX_JPEG_BYTES = 4 * 1024 * 1024  # Larger "frames" mean we lost sync with the stream
+STALL_SECONDS = 5  # No new frame for this long -> reconnect
+MAX_READ_FAILURES = 10  # Consecutive failed reads -> reconnect
+RECONNECT_BASE_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30
+FALLBACK_AFTER_ATTEMPTS = 3  # Failed attempts on the primary before trying the fallback
+PRIMARY_RETRY_SECONDS = 60  # While on the fallback, how often to try the primary again
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mjpeg', '.mjpg', '.mkv', '.mov')
+
+
+# ----------------------------------------------------------------------
+# Frame sources
+# ----------------------------------------------------------------------
+class FrameSource:
+    """Base class: open(), read() -> (ok, img), frame_time(), release()"""
+
+    description = 'frame source'
+    live = True
+    handles_failures = False  # True if read() already retries/paces after failures
+    passthrough = False  # True if last_jpeg holds the original bytes of the last frame
+    last_jpeg = None
+
+    def open(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def frame_time(self):
+        """Timestamp of the frame returned by the last read()"""
+        return datetime.now()
+
+    def is_opened(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class CaptureSource(FrameSource):
+    """Live cv2.VideoCapture source (network MJPEG stream or webcam index)"""
+
+    def __init__(self, target):
+        self.target = target
+        self.cap = None
+        if isinstance(target, int):
+            self.description = f"Webcam {target}"
+        else:
+            self.description = str(target)
+
+    def open(self):
+        self.release()
+        if isinstance(self.target, int):
+            self.cap = cv2.VideoCapture(self.target)
+            return self.cap.isOpened()
+
+        # Bounded open/read so a dead ESP32-CAM fails the read instead of hanging it
+        timeout_ms = int(CAPTURE_TIMEOUT_SECONDS * 1000)
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms]
+
+        # Try with different OpenCV backends
+        self.cap = cv2.VideoCapture(self.target, cv2.CAP_FFMPEG, params)
+
+        # If FFMPEG fails, try default backend
+        if not self.cap.isOpened():
+            print(f"   FFMPEG backend failed, trying default backend...")
+            self.cap = cv2.VideoCapture(self.target)
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+_CONTENT_LENGTH = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+
+
+def iter_mjpeg(chunks):
+    """Yield the JPEG bytes of each part of a multipart MJPEG byte stream
+
+    Uses the part's Content-Length when the camera sends one (ESP32-CAM
+    does) and falls back to scanning for the JPEG start/end markers.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            start = buf.find(b'\xff\xd8')
+            if start < 0:
+                del buf[:-1]  # Keep a byte in case the marker is split across chunks
+                break
+            lengths = _CONTENT_LENGTH.findall(buf, 0, start)
+            if lengths:
+                end = start + int(lengths[-1])
+                if len(buf) < end:
+                    break
+            else:
+                end = buf.find(b'\xff\xd9', start + 2)
+                if end < 0:
+                    break
+                end += 2
+            yield bytes(buf[start:end])
+            del buf[:end]
+        if len(buf) > MAX_JPEG_BYTES:
+            buf.clear()  # Garbage or a lost boundary; resync on the next frame
+
+
+class MjpegStreamSource(FrameSource):
+    """HTTP multipart MJPEG stream (ESP32-CAM) read without cv2.VideoCapture
+
+    A reader thread keeps only the newest JPEG and passes every one to
+    on_jpeg(jpeg) untouched (e.g. for /video_feed?raw=1). read() decodes just
+    the newest frame, so a slow detection loop skips frames instead of
+    falling behind, and frames nobody looks at are never decoded.
+    """
+
+    passthrough = True
+
+    def __init__(self, url, on_jpeg=None, timeout=CAPTURE_TIMEOUT_SECONDS):
+        self.url = url
+        self.on_jpeg = on_jpeg
+        self.timeout = timeout
+        self.description = url
+        self.received = 0
+        self.decoded = 0
+        self.last_jpeg = None
+        self._response = None
+        self._thread = None
+        self._condition = threading.Condition()
+        self._latest = None
+        self._seq = 0
+        self._read_seq = 0
+        self._ended = False
+
+    def open(self):
+        self.release()
+        try:
+            response = requests.get(self.url, stream=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"   Cannot connect to {self.url}: {e}")
+            return False
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code != 200 or 'multipart' not in content_type:
+            print(f"   {self.url} is not an MJPEG stream ({response.status_code}, {content_type or 'no content type'})")
+            response.close()
+            return False
+
+        with self._condition:
+            self._response = response
+            self._latest = None
+            self._seq = self._read_seq = 0
+            self._ended = False
+        self._thread = threading.Thread(target=self._reader, args=(response,), daemon=True,
+                                        name=f"mjpeg-{self.url}")
+        self._thread.start()
+        return True
+
+    def _reader(self, response):
+        try:
+            for jpeg in iter_mjpeg(response.iter_content(chunk_size=16 * 1024)):
+                with self._condition:
+                    if response is not self._response:
+                        return  # Released or reopened meanwhile
+                    self._latest = jpeg
+                    self._seq += 1
+                    self.received += 1
+                    self._condition.notify_all()
+                if self.on_jpeg:
+                    self.on_jpeg(jpeg)
+        except Exception as e:
+            if response is self._response:
+                print(f"⚠️  MJPEG stream {self.url} ended: {e}")
+        finally:
+            with self._condition:
+                if response is self._response:
+                    self._ended = True
+                    self._condition.notify_all()
+
+    def read(self):
+        """Decode the newest JPEG; waits up to timeout for one newer than the last read"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > self._read_seq or self._ended, self.timeout)
+            if self._seq <= self._read_seq:
+                return False, None
+            self._read_seq = self._seq
+            jpeg = self._latest
+        img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return False, None
+        self.decoded += 1
+        self.last_jpeg = jpeg
+        return True, img
+
+    def is_opened(self):
+        return self._response is not None and not self._ended
+
+    def release(self):
+        with self._condition:
+            response, self._response = self._response, None
+            self._ended = True
+            self._condition.notify_all()
+        if response is not None:
+            response.close()  # Unblocks the reader thread
+
+
+class ReplaySource(FrameSource):
+    """Shared pacing/timestamp logic for recorded footage
+
+    fps        - replay rate; frames are stamped start + i / fps
+    realtime   - sleep between frames to match fps (False = as fast as possible)
+    loop       - start over at the end instead of stopping
+    """
+
+    live = False
+
+    def __init__(self, fps=10.0, realtime=True, loop=False):
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self._start_time = None
+        self._index = 0
+        self._next_due = None
+
+    def _pace(self):
+        if self._start_time is None:
+            self._start_time = datetime.now()
+            self._next_due = time.monotonic()
+        if self.realtime:
+            delay = self._next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_due += 1.0 / self.fps
+        self._index += 1
+
+    def frame_time(self):
+        if self._start_time is None:
+            return datetime.now()
+        return self._start_time + timedelta(seconds=(self._index - 1) / self.fps)
+
+
+class VideoFileSource(ReplaySource):
+    """Recorded clip, replayed at its own FPS unless one is given"""
+
+    def __init__(self, path, fps=None, realtime=True, loop=False):
+        super().__init__(fps=fps or 10.0, realtime=realtime, loop=loop)
+        self.path = path
+        self.cap = None
+        self._fixed_fps = fps is not None
+        self.description = f"Video file {path}"
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        if not self._fixed_fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or self.fps
+        return True
+
+    def read(self):
+        ret, img = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, img = self.cap.read()
+        if ret:
+            self._pace()
+        return ret, img
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class ImageDirectorySource(ReplaySource):
+    """Directory of still images (sorted by name) replayed as a stream"""
+
+    def __init__(self, path, fps=10.0, realtime=True, loop=False):
+        super().__init__(fps=fps or 10.0, realtime=realtime, loop=loop)
+        self.path = path
+        self.files = []
+        self._position = 0
+        self.description = f"Image directory {path}"
+
+    def open(self):
+        self.files = sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._position = 0
+        return bool(self.files)
+
+    def read(self):
+        if self._position >= len(self.files):
+            if not self.loop or not self.files:
+                return False, None
+            self._position = 0
+        img = cv2.imread(self.files[self._position])
+        self._position += 1
+        if img is None:
+            return False, None
+        self._pace()
+        return True, img
+
+    def is_opened(self):
+        return bool(self.files)
+
+
+class SupervisedSource(FrameSource):
+    """Keeps a live source connected: reconnects after read failures or stalls
+
+    The primary source is reopened with jittered exponential backoff. After
+    FALLBACK_AFTER_ATTEMPTS failed attempts the fallback sources are tried in
+    turn; while on a fallback the primary is probed every
+    PRIMARY_RETRY_SECONDS on a background thread (frames keep coming from
+    the fallback meanwhile) and switched back to once it has opened.
+
+    read() never blocks for longer than one backoff step, so callers can
+    still check their stop flags while the camera is away.
+    """
+
+    handles_failures = True
+
+    def __init__(self, primary, fallbacks=(), stall_seconds=STALL_SECONDS,
+                 max_failures=MAX_READ_FAILURES):
+        self.sources = [primary] + list(fallbacks)
+        self.stall_seconds = stall_seconds
+        self.max_failures = max_failures
+        self.description = primary.description
+        self.current = None
+        self.state = 'connecting'
+        self.connects = 0
+        self.reconnects = 0
+        self.attempts = 0  # Failed attempts since the last successful connect
+        self.stalls = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._fallback_index = 0
+        self._next_attempt = 0.0
+        self._next_primary_retry = 0.0
+        self._probe = None  # Thread opening the primary while on a fallback
+        self._primary_ready = False  # Set by the probe, consumed by the read thread
+        self._last_frame = None
+        self._connected_at = None
+
+    @property
+    def on_fallback(self):
+        return self.current is not None and self.current is not self.sources[0]
+
+    @property
+    def passthrough(self):
+        return getattr(self.current, 'passthrough', False)
+
+    @property
+    def last_jpeg(self):
+        return getattr(self.current, 'last_jpeg', None)
+
+    def _backoff(self):
+        """Exponential delay for the current attempt count, with +/-50% jitter"""
+        delay = min(RECONNECT_MAX_SECONDS, RECONNECT_BASE_SECONDS * (2 ** min(self.attempts, 16)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _candidate(self):
+        """Primary first; alternate with the fallbacks once the primary keeps failing"""
+        fallbacks = self.sources[1:]
+        if not fallbacks or self.attempts < FALLBACK_AFTER_ATTEMPTS or self.attempts % 2 == 0:
+            return self.sources[0]
+        self._fallback_index = (self._fallback_index + 1) % len(fallbacks)
+        return fallbacks[self._fallback_index]
+
+    def _connect(self, source):
+        """Open source and make it current; returns True on success"""
+        if not source.open():
+            source.release()
+            return False
+        self._adopt(source)
+        return True
+
+    def _adopt(self, source):
+        """Make an opened source current (releasing the previous one)"""
+        now = time.monotonic()
+        with self._lock:
+            if self.current is not None and self.current is not source:
+                self.current.release()
+            if self.connects:
+                self.reconnects += 1
+            self.connects += 1
+            self.current = source
+            self.state = 'connected' if source is self.sources[0] else 'fallback'
+            self.attempts = 0
+            self._failures = 0
+            self._last_frame = self._connected_at = now
+            self._next_primary_retry = now + PRIMARY_RETRY_SECONDS
+        label = 'fallback ' if source is not self.sources[0] else ''
+        print(f"✅ Connected to {label}{source.description}")
+
+    def _probe_primary(self):
+        """Background thread: open the primary; read() switches over once it is open"""
+        primary = self.sources[0]
+        opened = primary.open()
+        with self._lock:
+            self._probe = None
+            if opened and self.state != 'closed':
+                self._primary_ready = True
+                return
+        primary.release()
+
+    def _disconnect(self, reason):
+        print(f"⚠️  {self.current.description}: {reason} - reconnecting")
+        with self._lock:
+            self.current.release()
+            self.current = None
+            self.state = 'reconnecting'
+            self.last_error = reason
+            self._next_attempt = time.monotonic()  # First retry is immediate
+
+    def _reconnect(self):
+        """One connection attempt if the backoff allows it"""
+        if self._probe is not None:
+            # The primary is being opened in the background; don't open it twice
+            time.sleep(0.05)
+            return False
+        if self._primary_ready:
+            self._primary_ready = False
+            self._adopt(self.sources[0])
+            return True
+        wait = self._next_attempt - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, 0.5))
+            return False
+        source = self._candidate()
+        if self._connect(source):
+            return True
+        with self._lock:
+            self.attempts += 1
+            self.last_error = f"cannot open {source.description}"
+            delay = self._backoff()
+            self._next_attempt = time.monotonic() + delay
+        print(f"🔌 Cannot open {source.description} (attempt {self.attempts}), retrying in {delay:.1f}s")
+        return False
+
+    def open(self):
+        """Connect to the primary, or straight to a fallback if the primary is down"""
+        for source in self.sources:
+            if self._connect(source):
+                return True
+        with self._lock:
+            self.attempts = 1
+            self.state = 'reconnecting'
+            self.last_error = f"cannot open {self.sources[0].description}"
+            self._next_attempt = time.monotonic() + self._backoff()
+        return False
+
+    def read(self):
+        if self.current is None and not self._reconnect():
+            return False, None
+
+        ret, img = self.current.read()
+        now = time.monotonic()
+        if ret and img is not None:
+            self._last_frame = now
+            self._failures = 0
+            if self.on_fallback:
+                if self._primary_ready:
+                    self._primary_ready = False
+                    self._adopt(self.sources[0])
+                elif self._probe is None and now >= self._next_primary_retry:
+                    # Opening can take seconds; the fallback keeps serving frames meanwhile
+                    self._next_primary_retry = now + PRIMARY_RETRY_SECONDS
+                    self._probe = threading.Thread(target=self._probe_primary,
+                                                   name='primary-probe', daemon=True)
+                    self._probe.start()
+            return True, img
+
+        self._failures += 1
+        if now - self._last_frame >= self.stall_seconds:
+            with self._lock:
+                self.stalls += 1
+            self._disconnect(f"no frame for {now - self._last_frame:.1f}s")
+        elif self._failures >= self.max_failures:
+            self._disconnect(f"{self._failures} failed reads")
+        else:
+            time.sleep(0.05)
+        return False, None
+
+    def is_opened(self):
+        return self.current is not None and self.current.is_opened()
+
+    def release(self):
+        with self._lock:
+            if self.current is not None:
+                self.current.release()
+                self.current = None
+            if self._primary_ready:
+                # Opened by the probe but never switched to
+                self._primary_ready = False
+                self.sources[0].release()
+            self.state = 'closed'
+
+    def stats(self):
+        """Connection state for /health"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'state': self.state,
+                'source': self.current.description if self.current else None,
+                'on_fallback': self.on_fallback,
+                'reconnects': self.reconnects,
+                'failed_attempts': self.attempts,
+                'stalls': self.stalls,
+                'last_error': self.last_error,
+                'connected_seconds': round(now - self._connected_at, 1) if self.current else None,
+                'last_frame_age': round(now - self._last_frame, 2) if self._last_frame else None,
+                'jpegs_received': getattr(self.current, 'received', None),
+                'jpegs_decoded': getattr(self.current, 'decoded', None),
+                'next_retry_in': (round(max(0.0, self._next_attempt - now), 1)
+                                  if self.current is None and self.state != 'closed' else None),
+            }
+
+
+def _capture_target(spec):
+    """Webcam index or stream URL for live specs, else None"""
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return int(spec)
+    if isinstance(spec, str) and '://' in spec:
+        return spec
+    return None
+
+
+def _live_source(target, on_jpeg=None):
+    if RAW_MJPEG and isinstance(target, str) and target.startswith(('http://', 'https://')):
+        return MjpegStreamSource(target, on_jpeg=on_jpeg)
+    return CaptureSource(target)
+
+
+def open_frame_source(spec, fps=None, realtime=True, loop=False, fallback=None, on_jpeg=None):
+    """Build a frame source from a URL, webcam index, video file or image directory
+
+    Live sources are wrapped in a SupervisedSource; fallback (a spec or list
+    of specs for other live sources) is used while the primary is down.
+    on_jpeg(jpeg) receives every original JPEG of http(s) MJPEG streams.
+    """
+    target = _capture_target(spec)
+    if target is not None:
+        if fallback is None:
+            fallback = []
+        elif not isinstance(fallback, (list, tuple)):
+            fallback = [fallback]
+        fallbacks = []
+        for fallback_spec in fallback:
+            fallback_target = _capture_target(fallback_spec)
+            if fallback_target is None:
+                raise ValueError(f"Fallback must be a stream URL or webcam index: {fallback_spec}")
+            fallbacks.append(_live_source(fallback_target, on_jpeg))
+        return SupervisedSource(_live_source(target, on_jpeg), fallbacks)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps=fps or 10.0, realtime=realtime, loop=loop)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, fps=fps, realtime=realtime, loop=loop)
+    raise ValueError(f"Unknown frame source: {spec}")
+
+
+# ----------------------------------------------------------------------
+# Backend stand-in for offline runs
+# ----------------------------------------------------------------------
+class DryRunBackend:
+    """Same interface as camera_client.BackendClient, but only records events"""
+
+    def __init__(self, camera_id=None):
+        self.camera_id = camera_id
+        self.events = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def start(self):
+        return self
+
+    def stop(self, timeout=None):
+        pass
+
+    def add_item(self, label, confidence, callback=None):
+        with self._lock:
+            item_id = self._next_id
+            self._next_id += 1
+            self.events.append(('add', label, confidence))
+        print(f"🧪 [dry-run] Would add {label} ({confidence:.2f})")
+        if callback:
+            callback(item_id)
+        return True
+
+    def heartbeat(self, labels):
+        with self._lock:
+            self.events.append(('heartbeat', tuple(labels)))
+        return True
+
+    def cleanup(self):
+        with self._lock:
+            self.events.append(('cleanup',))
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {'queue_depth': 0, 'dry_run': True, 'events': len(self.events)}
+
+
+# ----------------------------------------------------------------------
+# Detection state
+# ----------------------------------------------------------------------
+def _on_item_added(state):
+    """Build the callback that records the backend insert result in state"""
+    def callback(item_id):
+        state['db_pending'] = False
+        if item_id:
+            state['db_added'] = True
+            state['db_id'] = item_id
+    return callback
+
+
+class DetectionTracker:
+    """Per-camera detection state and add/remove logic
+
+    state structure:
+    {
+        "apple": {
+            "first_seen": datetime,
+            "last_seen": datetime,
+            "consecutive_seconds": 6.5,
+            "db_added": False,
+            "db_pending": False,
+            "db_id": None,
+            "confidence": 0.85
+        }
+    }
+
+    on_event(event, label, current_time) is called with 'added' when an item
+    is sent to the backend and 'removed' when an added item disappears.
+    """
+
+    def __init__(self, backend, allowed_items=ALLOWED_ITEMS,
+                 add_delay=ADD_DELAY_SECONDS, remove_delay=REMOVE_DELAY_SECONDS, on_event=None):
+        self.backend = backend
+        self.allowed_items = allowed_items
+        self.add_delay = add_delay
+        self.remove_delay = remove_delay
+        self.on_event = on_event
+        self.state = {}
+
+    def update(self, detected_items, current_time):
+        """Update detection state and handle add/remove logic"""
+        detected_labels = set()
+
+        # Process currently detected items
+        for label, confidence in detected_items:
+            # Filter: Only process allowed items
+            if label not in self.allowed_items:
+                continue
+
+            detected_labels.add(label)
+
+            if label not in self.state:
+                # First time seeing this object
+                self.state[label] = {
+                    'first_seen': current_time,
+                    'last_seen': current_time,
+                    'consecutive_seconds': 0,
+                    'db_added': False,
+                    'db_pending': False,
+                    'db_id': None,
+                    'confidence': confidence
+                }
+                print(f"👁️  New detection: {label} (confidence: {confidence:.2f}) ✅ ALLOWED")
+            else:
+                # Update existing detection
+                state = self.state[label]
+                state['last_seen'] = current_time
+                state['confidence'] = max(state['confidence'], confidence)
+
+                # Calculate consecutive detection duration
+                time_diff = (current_time - state['first_seen']).total_seconds()
+                state['consecutive_seconds'] = time_diff
+
+                # The insert is queued; the callback flips db_added once it lands
+                if not state['db_added'] and not state['db_pending'] and time_diff >= self.add_delay:
+                    print(f"⏱️  {label} detected continuously for {time_diff:.1f}s - Adding to database...")
+                    state['db_pending'] = True
+                    self.backend.add_item(label, state['confidence'], callback=_on_item_added(state))
+                    if self.on_event:
+                        self.on_event('added', label, current_time)
+
+        # Check for items that are no longer detected
+        for label in list(self.state.keys()):
+            if label in detected_labels:
+                continue
+            state = self.state[label]
+            time_since_last_seen = (current_time - state['last_seen']).total_seconds()
+
+            if state['db_added'] and time_since_last_seen >= self.remove_delay:
+                print(f"🗑️  {label} not detected for {time_since_last_seen:.1f}s - Will be removed by cleanup")
+                del self.state[label]
+                if self.on_event:
+                    self.on_event('removed', label, current_time)
+            elif time_since_last_seen >= self.remove_delay:
+                print(f"⏹️  {label} detection ended (never added to DB)")
+                del self.state[label]
+
+        return list(detected_labels)
+
+
+# ----------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------
+class FrameResult:
+    """What the engine learned from one frame"""
+
+    __slots__ = ('frame_number', 'timestamp', 'detections', 'detected_labels', 'detect_seconds')
+
+    def __init__(self, frame_number, timestamp, detections, detected_labels, detect_seconds):
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.detections = detections  # [(label, confidence, [x, y, w, h], allowed)]
+        self.detected_labels = detected_labels
+        self.detect_seconds = detect_seconds
+
+    @property
+    def allowed_count(self):
+        return sum(1 for d in self.detections if d[3])
+
+
+class DetectionEngine:
+    """Frame loop shared by both camera entry points
+
+    detect(img, conf_threshold) -> (class_ids, confidences, boxes); pass a
+    detector's detect method, or a function that runs it elsewhere (e.g. in
+    a process pool). on_event is passed to the DetectionTracker.
+    """
+
+    def __init__(self, source, detect, class_names, backend,
+                 allowed_items=ALLOWED_ITEMS, confidence_threshold=CONFIDENCE_THRESHOLD,
+                 add_delay=ADD_DELAY_SECONDS, remove_delay=REMOVE_DELAY_SECONDS,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, cleanup_interval=CLEANUP_INTERVAL,
+                 on_event=None):
+        self.source = source
+        self.detect = detect
+        self.class_names = class_names
+        self.backend = backend
+        self.allowed_items = allowed_items
+        self.confidence_threshold = confidence_threshold
+        self.heartbeat_interval = heartbeat_interval
+        self.cleanup_interval = cleanup_interval
+        self.tracker = DetectionTracker(backend, allowed_items, add_delay, remove_delay, on_event=on_event)
+        self.frame_count = 0
+        self.running = False
+        self._last_heartbeat = None
+        self._last_cleanup = None
+
+    @property
+    def detection_state(self):
+        return self.tracker.state
+
+    def process(self, img, current_time):
+        """Detect, track and talk to the backend for one frame"""
+        self.frame_count += 1
+
+        detect_started = time.perf_counter()
+        classIds, confs, bbox = self.detect(img, self.confidence_threshold)
+        detect_seconds = time.perf_counter() - detect_started
+
+        detected_items = []
+        detections = []
+        for classId, confidence, box in zip(classIds, confs, bbox):
+            label = self.class_names[classId - 1]
+            allowed = label in self.allowed_items
+            if allowed:
+                detected_items.append((label, confidence))
+            detections.append((label, confidence, box, allowed))
+
+        detected_labels = self.tracker.update(detected_items, current_time)
+
+        # Heartbeat/cleanup timers follow frame time so replays behave like live runs
+        if self._last_heartbeat is None:
+            self._last_heartbeat = self._last_cleanup = current_time
+        if (current_time - self._last_heartbeat).total_seconds() >= self.heartbeat_interval:
+            if detected_labels:
+                self.backend.heartbeat(detected_labels)
+            self._last_heartbeat = current_time
+        if (current_time - self._last_cleanup).total_seconds() >= self.cleanup_interval:
+            self.backend.cleanup()
+            self._last_cleanup = current_time
+
+        return FrameResult(self.frame_count, current_time, detections, detected_labels, detect_seconds)
+
+    def run(self, on_frame=None, stop_event=None):
+        """Read frames until the source ends or stop_event is set
+
+        on_frame(img, result) is called after every processed frame; return
+        False from it to stop the loop.
+        """
+        self.running = True
+        try:
+            while self.running and not (stop_event and stop_event.is_set()):
+                ret, img = self.source.read()
+                if not ret:
+                    if not self.source.live:
+                        print(f"⏹️  End of {self.source.description}")
+                        break
+                    if not self.source.handles_failures:
+                        print("⚠️  Failed to grab frame from camera")
+                        time.sleep(0.1)
+                    continue
+
+                result = self.process(img, self.source.frame_time())
+                if on_frame and on_frame(img, result) is False:
+                    break
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
+
+
+def draw_overlays(img, result, detection_state, header_prefix='', queue_depth=None,
+                  status_color=None):
+    """Draw boxes and status text onto the frame
+
+    status_color=None colors each tracked item by state (in DB / sending /
+    waiting); pass a BGR tuple to draw all status text in one color.
+    """
+    for label, confidence, box, allowed in result.detections:
+        if allowed:
+            # Draw GREEN bounding box for allowed items
+            cv2.rectangle(img, box, color=(0, 255, 0), thickness=3)
+            cv2.putText(img, f"{label} {confidence:.2f}",
+                        (box[0] + 10, box[1] + 30),
+                        cv2.FONT_HERSHEY_COMPLEX, 1, (0, 255, 0), 2)
+        else:
+            # Draw RED bounding box for filtered items
+            cv2.rectangle(img, box, color=(0, 0, 255), thickness=2)
+            cv2.putText(img, f"{label} (FILTERED)",
+                        (box[0] + 10, box[1] + 30),
+                        cv2.FONT_HERSHEY_COMPLEX, 0.8, (0, 0, 255), 2)
+
+    # Display status on frame
+    allowed_count = result.allowed_count
+    header = (f"{header_prefix}Frame: {result.frame_number} | Allowed: {allowed_count} | "
+              f"Filtered: {len(result.detections) - allowed_count}")
+    if queue_depth is not None:
+        header += f" | Queue: {queue_depth}"
+    status_y = 30
+    cv2.putText(img, header, (10, status_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                status_color or (255, 255, 255), 2)
+
+    for label, state in list(detection_state.items()):
+        status_y += 30
+        status_text = f"{label}: {state['consecutive_seconds']:.1f}s"
+        if state['db_added']:
+            status_text += " [IN DB]"
+            color = (0, 255, 0)
+        elif state['db_pending']:
+            status_text += " [SENDING]"
+            color = (255, 255, 0)
+        else:
+            color = (0, 255, 255)
+        cv2.putText(img, status_text, (10, status_y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color or color, 2)
@@ -0,0 +1,330 @@
+"""
+Local stand-in for the Gemini API, for load tests and offline runs
+Implements the two endpoints backend.py calls:
+
+    POST /v1beta/models/<model>:generateContent
+    POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+
+Answers are built from the request: recipe prompts get a JSON array of
+recipes made from the listed ingredients, voice prompts (structured output)
+get what intent_matcher.py makes of the query, or a short inventory summary
+for questions; anything else gets "OK". --canned FILE (JSON object: query ->
+answer object or text) fixes the answers to particular voice queries.
+
+Faults, also adjustable while running with POST /_control {"rate_503": 0.2, ...}:
+    latency    fixed:600 | uniform:200:900 | normal:600:150 | lognormal:600:0.5 | exponential:600
+               (milliseconds; lognormal takes the median and sigma)
+    rate_429   fraction of calls answered 429 RESOURCE_EXHAUSTED (immediately)
+    rate_503   fraction answered 503 UNAVAILABLE (after a quarter of the latency)
+    malformed  fraction answered 200 with text cut off halfway (not valid JSON)
+GET /_stats counts calls and injected faults; POST /_reset clears the counts.
+
+Run:
+    python fake_gemini_server.py --port 5055 --latency normal:600:150 --rate-503 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:5055/v1beta GEMINI_API_KEY=test python backend.py
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+import voice_assistant
+from intent_matcher import IntentMatcher
+from response_cache import normalize_query
+
+DEFAULT_PORT = 5055
+DEFAULT_LATENCY = 'normal:600:150'
+CHUNK_CHARS = 40  # Text per streamed event
+FIRST_CHUNK_SHARE = 0.3  # Part of the latency spent before the first streamed event
+
+RECIPE_TEMPLATES = [
+    ('{a} Curry', 'Saute onions, tomatoes and spices, add {a} and simmer until cooked. Serve with rice.'),
+    ('{a} and {b} Sabzi', 'Temper mustard seeds and curry leaves, add {a} and {b}, cook with turmeric and salt.'),
+    ('{b} Pulao', 'Fry whole spices in ghee, add rice, {b} and water, cook covered until fluffy.'),
+    ('{a} Rasam', 'Boil tamarind water with tomato, pepper and {a}. Temper with ghee, cumin and curry leaves.'),
+    ('Masala {b} Paratha', 'Mix {b} with spices, stuff into dough, roll out and cook on a hot tawa with ghee.'),
+]
+
+_VOICE_QUERY = re.compile(r'"(.*)"\s*$')
+_INGREDIENTS = re.compile(r'using these ingredients from my fridge:\s*(.+)')
+_REPLY_LANGUAGE = re.compile(r'^Reply language:\s*(.+)$', re.MULTILINE)
+
+
+def parse_latency(spec):
+    """'normal:600:150' -> function returning a delay in seconds"""
+    name, *params = str(spec).split(':')
+    try:
+        params = [float(p) for p in params]
+    except ValueError:
+        raise ValueError(f'Bad latency spec: {spec}')
+    shapes = {
+        'fixed': (1, lambda p: p[0]),
+        'uniform': (2, lambda p: random.uniform(p[0], p[1])),
+        'normal': (2, lambda p: random.gauss(p[0], p[1])),
+        'lognormal': (2, lambda p: random.lognormvariate(math.log(max(p[0], 1e-3)), p[1])),
+        'exponential': (1, lambda p: random.expovariate(1 / p[0]) if p[0] > 0 else 0),
+    }
+    if name not in shapes or len(params) != shapes[name][0]:
+        raise ValueError(f'Bad latency spec: {spec} (see --help)')
+    sample = shapes[name][1]
+    return lambda: max(0.0, sample(params)) / 1000
+
+
+class StandIn:
+    """Settings, counters and answer templates of the stand-in server"""
+
+    def __init__(self, latency=DEFAULT_LATENCY, rate_429=0.0, rate_503=0.0, malformed=0.0, canned=None):
+        self._lock = threading.Lock()
+        self.matcher = IntentMatcher()
+        self.canned = {normalize_query(query): answer for query, answer in (canned or {}).items()}
+        self.configure(latency=latency, rate_429=rate_429, rate_503=rate_503, malformed=malformed)
+        self.reset()
+
+    def configure(self, **settings):
+        """Change latency / fault rates; unknown or bad settings raise ValueError"""
+        with self._lock:
+            for name, value in settings.items():
+                if name == 'latency':
+                    self._sample_latency = parse_latency(value)
+                    self.latency = value
+                elif name in ('rate_429', 'rate_503', 'malformed'):
+                    value = float(value)
+                    if not 0 <= value <= 1:
+                        raise ValueError(f'{name} must be between 0 and 1')
+                    setattr(self, name, value)
+                else:
+                    raise ValueError(f'Unknown setting: {name}')
+
+    def settings(self):
+        with self._lock:
+            return {'latency': self.latency, 'rate_429': self.rate_429, 'rate_503': self.rate_503,
+                    'malformed': self.malformed}
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'calls': 0, 'streams': 0, 'recipe': 0, 'voice': 0, 'other': 0,
+                           'injected_429': 0, 'injected_503': 0, 'malformed': 0, 'unauthorized': 0}
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, in_flight=self.in_flight, max_in_flight=self.max_in_flight)
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def roll(self):
+        """(fault or None, delay seconds) for one call"""
+        with self._lock:
+            delay = self._sample_latency()
+            draw = random.random()
+            if draw < self.rate_429:
+                return '429', 0.0
+            draw -= self.rate_429
+            if draw < self.rate_503:
+                return '503', delay / 4
+            draw -= self.rate_503
+            if draw < self.malformed:
+                return 'malformed', delay
+            return None, delay
+
+    # ------------------------------------------------------------------
+    # Answers
+    # ------------------------------------------------------------------
+    def answer(self, payload):
+        """(kind, text) for a generateContent request body"""
+        try:
+            prompt = payload['contents'][0]['parts'][0]['text']
+        except (KeyError, IndexError, TypeError):
+            prompt = ''
+        schema = (payload.get('generationConfig') or {}).get('responseSchema')
+        if schema:
+            return 'voice', self.voice_answer(prompt)
+        match = _INGREDIENTS.search(prompt)
+        if match and 'recipe' in prompt.lower():
+            return 'recipe', self.recipe_answer(match.group(1))
+        return 'other', 'OK'
+
+    @staticmethod
+    def recipe_answer(ingredients_text):
+        ingredients = [i.strip() for i in ingredients_text.split(',') if i.strip()] or ['vegetables']
+        recipes = []
+        for n, (title, steps) in enumerate(RECIPE_TEMPLATES[:3]):
+            a = ingredients[n % len(ingredients)]
+            b = ingredients[(n + 1) % len(ingredients)]
+            recipes.append({
+                'title': title.format(a=a.title(), b=b.title()),
+                'ingredients': f"{a}, {b}, + suggested: onion, tomato, cumin, turmeric",
+                'instructions': steps.format(a=a.lower(), b=b.lower()),
+            })
+        return json.dumps(recipes, ensure_ascii=False)
+
+    def voice_answer(self, prompt):
+        lines = prompt.split('\n')
+        match = _VOICE_QUERY.search(lines[0])
+        query = match.group(1) if match else ''
+        canned = self.canned.get(normalize_query(query))
+        if canned is not None:
+            return canned if isinstance(canned, str) else json.dumps(canned, ensure_ascii=False)
+
+        language = 'en'
+        match = _REPLY_LANGUAGE.search(prompt)
+        if match:
+            language = next((code for code, name in voice_assistant.LANGUAGE_NAMES.items()
+                             if name == match.group(1).strip()), 'en')
+        result = self.matcher.classify(query, language)
+        answer = {key: result.get(key, '') for key in voice_assistant.RESPONSE_SCHEMA['properties']}
+        if answer['intent'] == 'none' or not answer['label']:
+            answer = dict.fromkeys(answer, '')
+            answer['intent'] = 'none'
+            answer['reply'] = self.inventory_summary(lines)
+        return json.dumps(answer, ensure_ascii=False)
+
+    @staticmethod
+    def inventory_summary(lines):
+        """'You have N items: ...' from the prompt's inventory block"""
+        try:
+            start = lines.index('Current inventory:') + 1
+        except ValueError:
+            return 'I could not see your inventory.'
+        block = []
+        for line in lines[start:]:
+            if not line.strip():
+                break
+            block.append(line.strip())
+        return 'Here is what you have:\n' + '\n'.join(f"- {line.lstrip('- ')}" for line in block[:20])
+
+
+def create_app(stand_in):
+    app = Flask(__name__)
+
+    def error(code, status, message):
+        return jsonify({'error': {'code': code, 'message': message, 'status': status}}), code
+
+    @app.route('/v1beta/models/<path:target>', methods=['POST'])
+    def generate(target):
+        model, _, method = target.partition(':')
+        if method not in ('generateContent', 'streamGenerateContent'):
+            return error(404, 'NOT_FOUND', f'Method {method or "(none)"} not found')
+        if not (request.headers.get('x-goog-api-key') or request.args.get('key')):
+            stand_in.count('unauthorized')
+            return error(403, 'PERMISSION_DENIED', 'Method doesn\'t allow unregistered callers')
+        payload = request.get_json(silent=True) or {}
+        streaming = method == 'streamGenerateContent'
+        stand_in.count('calls')
+        if streaming:
+            stand_in.count('streams')
+
+        fault, delay = stand_in.roll()
+        if fault == '429':
+            stand_in.count('injected_429')
+            return error(429, 'RESOURCE_EXHAUSTED', 'Resource has been exhausted (e.g. check quota).')
+
+        stand_in.enter()
+        try:
+            if fault == '503':
+                time.sleep(delay)
+                stand_in.count('injected_503')
+                return error(503, 'UNAVAILABLE', 'The model is overloaded. Please try again later.')
+            kind, text = stand_in.answer(payload)
+            stand_in.count(kind)
+            if fault == 'malformed':
+                stand_in.count('malformed')
+                text = text[:len(text) // 2]
+            if not streaming:
+                time.sleep(delay)
+                return jsonify(_candidate(text, model, payload))
+        finally:
+            if not streaming or fault == '503':
+                stand_in.leave()
+
+        def events():
+            try:
+                chunks = [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)] or ['']
+                time.sleep(delay * FIRST_CHUNK_SHARE)
+                gap = delay * (1 - FIRST_CHUNK_SHARE) / max(1, len(chunks) - 1)
+                for n, chunk in enumerate(chunks):
+                    if n:
+                        time.sleep(gap)
+                    body = _candidate(chunk, model, payload, last=n == len(chunks) - 1)
+                    yield f"data: {json.dumps(body, ensure_ascii=False)}\r\n\r\n"
+            finally:
+                stand_in.leave()
+
+        return Response(events(), mimetype='text/event-stream')
+
+    @app.route('/_control', methods=['POST'])
+    def control():
+        try:
+            stand_in.configure(**(request.get_json(silent=True) or {}))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'settings': stand_in.settings()})
+
+    @app.route('/_stats', methods=['GET'])
+    def stats():
+        return jsonify({'success': True, 'settings': stand_in.settings(), 'counts': stand_in.stats()})
+
+    @app.route('/_reset', methods=['POST'])
+    def reset():
+        stand_in.reset()
+        return jsonify({'success': True})
+
+    return app
+
+
+def _candidate(text, model, payload, last=True):
+    prompt_chars = sum(len(part.get('text', '')) for content in payload.get('contents', [])
+                       for part in content.get('parts', []))
+    body = {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}],
+        'modelVersion': model,
+    }
+    if last:
+        body['candidates'][0]['finishReason'] = 'STOP'
+        body['usageMetadata'] = {'promptTokenCount': prompt_chars // 4, 'candidatesTokenCount': len(text) // 4,
+                                 'totalTokenCount': (prompt_chars + len(text)) // 4}
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Gemini stand-in with latency and failure injection')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', default=DEFAULT_LATENCY,
+                        help='fixed:MS | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA | exponential:MEAN')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Fraction of calls answered 429')
+    parser.add_argument('--rate-503', type=float, default=0.0, help='Fraction of calls answered 503')
+    parser.add_argument('--malformed', type=float, default=0.0, help='Fraction of answers cut off halfway')
+    parser.add_argument('--canned', help='JSON file: voice query -> answer object or text')
+    args = parser.parse_args()
+
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding='utf-8') as f:
+            canned = json.load(f)
+    stand_in = StandIn(latency=args.latency, rate_429=args.rate_429, rate_503=args.rate_503,
+                       malformed=args.malformed, canned=canned)
+    print(f"🤖 Gemini stand-in on http://{args.host}:{args.port}/v1beta  {stand_in.settings()}")
+    create_app(stand_in).run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
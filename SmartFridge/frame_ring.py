@@ -0,0 +1,184 @@
+"""
+Shared-memory frame ring buffer for the Smart Fridge camera pipeline
+A fixed number of preallocated uint8 frames live in one
+multiprocessing.shared_memory block, preceded by a small int64 header:
+
+    [slots, height, width, channels, write_seq, slot_seq[0] ... slot_seq[slots-1]]
+
+The capture side write()s each frame into the next slot and gets back its
+sequence number. Any process that knows the ring's name can attach() and
+get(seq) a NumPy view of that frame - no pickling, no copy. A slot is marked
+-1 while it is being written; readers call is_current(seq) after using a view
+to make sure the writer did not lap them in the meantime.
+
+One writer per ring. Size the ring so the writer cannot lap the slowest
+reader (the stream server keeps at most one frame per camera in flight).
+
+Compare against pickling frames to a process pool:
+    python frame_ring.py --bench
+"""
+
+import argparse
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FRAME_RING_SLOTS = 4
+
+_SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _WRITE_SEQ = range(5)
+_HEADER_FIELDS = 5
+_ALIGN = 64
+
+
+def _header_bytes(slots):
+    size = (_HEADER_FIELDS + slots) * 8
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class FrameRing:
+    """Preallocated frames in shared memory, addressed by sequence number"""
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        slots = int(np.ndarray((1,), dtype=np.int64, buffer=shm.buf)[0])
+        self._header = np.ndarray((_HEADER_FIELDS + slots,), dtype=np.int64, buffer=shm.buf)
+        self.slots = slots
+        self.shape = tuple(int(v) for v in self._header[_HEIGHT:_CHANNELS + 1])
+        self._slot_seq = self._header[_HEADER_FIELDS:]
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8,
+                                  buffer=shm.buf, offset=_header_bytes(slots))
+
+    @classmethod
+    def create(cls, shape, slots=FRAME_RING_SLOTS, name=None):
+        """Allocate a new ring for frames of shape (height, width[, channels])"""
+        if len(shape) == 2:
+            shape = shape + (1,)
+        frame_bytes = int(np.prod(shape))
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=_header_bytes(slots) + slots * frame_bytes)
+        header = np.ndarray((_HEADER_FIELDS + slots,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_SLOTS] = slots
+        header[_HEIGHT:_CHANNELS + 1] = shape
+        del header  # Views must not outlive close()
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Open an existing ring created by another process"""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def latest_seq(self):
+        return int(self._header[_WRITE_SEQ])
+
+    def fits(self, img):
+        return img.dtype == np.uint8 and img.reshape(img.shape[:2] + (-1,)).shape == self.shape
+
+    def write(self, img):
+        """Copy img into the next slot; returns its sequence number (1, 2, ...)"""
+        seq = int(self._header[_WRITE_SEQ]) + 1
+        slot = seq % self.slots
+        self._slot_seq[slot] = -1  # Readers treat the slot as torn until the copy is done
+        self._frames[slot] = img.reshape(self.shape)
+        self._slot_seq[slot] = seq
+        self._header[_WRITE_SEQ] = seq
+        return seq
+
+    def get(self, seq):
+        """Zero-copy view of frame seq, or None if it was already overwritten"""
+        slot = seq % self.slots
+        if self._slot_seq[slot] != seq:
+            return None
+        frame = self._frames[slot]
+        return frame[:, :, 0] if self.shape[2] == 1 else frame
+
+    def is_current(self, seq):
+        """True while frame seq is still intact in its slot"""
+        return self._slot_seq[seq % self.slots] == seq
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'slots': self.slots,
+            'shape': list(self.shape),
+            'latest_seq': self.latest_seq,
+            'bytes': self.shm.size,
+        }
+
+    def close(self):
+        """Drop this process's mapping (call unlink() too if you created it)"""
+        self._header = self._slot_seq = self._frames = None
+        self.shm.close()
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+
+# ----------------------------------------------------------------------
+# Benchmark: frame transfer to a worker process, pickled vs shared memory
+# ----------------------------------------------------------------------
+_bench_ring = None
+
+
+def _bench_pickled(img):
+    return int(img[0, 0, 0])
+
+
+def _bench_attach(name):
+    global _bench_ring
+    _bench_ring = FrameRing.attach(name)
+
+
+def _bench_shared(seq):
+    img = _bench_ring.get(seq)
+    return int(img[0, 0, 0]) if img is not None else -1
+
+
+def bench(width, height, frames):
+    from concurrent.futures import ProcessPoolExecutor
+
+    img = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+    print(f"🧪 {frames} frames of {width}x{height} to one worker process\n")
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pool.submit(_bench_pickled, img).result()  # Warm up the worker
+        started = time.perf_counter()
+        for _ in range(frames):
+            pool.submit(_bench_pickled, img).result()
+        pickled = (time.perf_counter() - started) / frames * 1000
+
+    ring = FrameRing.create(img.shape)
+    try:
+        with ProcessPoolExecutor(max_workers=1, initializer=_bench_attach, initargs=(ring.name,)) as pool:
+            pool.submit(_bench_shared, ring.write(img)).result()
+            started = time.perf_counter()
+            for _ in range(frames):
+                pool.submit(_bench_shared, ring.write(img)).result()
+            shared = (time.perf_counter() - started) / frames * 1000
+    finally:
+        ring.close()
+        ring.unlink()
+
+    print(f"   pickled frame : {pickled:6.2f} ms/frame")
+    print(f"   shared ring   : {shared:6.2f} ms/frame ({pickled / shared:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shared-memory frame ring buffer')
+    parser.add_argument('--bench', action='store_true', help='Compare with pickling frames to a worker')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.width, args.height, args.frames)
+    else:
+        parser.print_help()
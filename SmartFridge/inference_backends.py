@@ -0,0 +1,222 @@
+"""
+Inference Backends for Smart Fridge camera detection
+One place to load the SSD MobileNet detector, with a choice of runtime:
+
+    opencv     - cv2.dnn_DetectionModel (configurable DNN backend/target/threads)
+    onnx       - ONNX Runtime on CPU (optional, needs onnxruntime + an .onnx export)
+    onnx-int8  - ONNX Runtime with an int8-quantized copy of the .onnx model
+
+Every detector exposes detect(img, conf_threshold) and returns plain lists
+(class_ids, confidences, boxes) with boxes as [x, y, w, h] in pixels, so
+callers can treat all backends the same (and pickle results across processes).
+
+Configuration comes from environment variables so each device can be tuned
+without code changes; run bench_inference.py to pick the fastest option.
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Optional dependency: ONNX Runtime
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNX_AVAILABLE = False
+
+# Model files
+CLASS_NAMES_PATH = 'Camera/coco.names'
+CONFIG_PATH = 'Camera/ssd_mobilenet_v3_large_coco_2020_01_14.pbtxt'
+WEIGHTS_PATH = 'Camera/frozen_inference_graph.pb'
+# ONNX export of the same detector (e.g. via tf2onnx) with TF Object Detection
+# API style outputs: detection_boxes / detection_classes / detection_scores
+ONNX_MODEL_PATH = os.getenv('ONNX_MODEL_PATH', 'Camera/ssd_mobilenet_v3_large_coco.onnx')
+INT8_MODEL_PATH = os.getenv('INT8_MODEL_PATH', 'Camera/ssd_mobilenet_v3_large_coco_int8.onnx')
+# Output tensor names, matched exactly (a ':0' suffix is ignored). For an
+# export with other names set e.g.
+# ONNX_OUTPUT_NAMES=boxes=Identity_1,classes=Identity_2,scores=Identity_4
+ONNX_OUTPUT_NAMES = {
+    'boxes': 'detection_boxes',
+    'classes': 'detection_classes',
+    'scores': 'detection_scores',
+}
+ONNX_OUTPUT_NAMES.update(
+    pair.strip().split('=', 1) for pair in os.getenv('ONNX_OUTPUT_NAMES', '').split(',') if '=' in pair
+)
+
+# Defaults (override per device with environment variables)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'opencv')
+INFERENCE_INPUT_SIZE = int(os.getenv('INFERENCE_INPUT_SIZE', '320'))
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', '0'))  # 0 = library default
+DNN_BACKEND = os.getenv('DNN_BACKEND', 'default')
+DNN_TARGET = os.getenv('DNN_TARGET', 'cpu')
+
+BACKENDS = ['opencv', 'onnx', 'onnx-int8']
+
+DNN_BACKENDS = {
+    'default': cv2.dnn.DNN_BACKEND_DEFAULT,
+    'opencv': cv2.dnn.DNN_BACKEND_OPENCV,
+    'inference_engine': cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE,
+    'cuda': cv2.dnn.DNN_BACKEND_CUDA,
+}
+
+DNN_TARGETS = {
+    'cpu': cv2.dnn.DNN_TARGET_CPU,
+    'opencl': cv2.dnn.DNN_TARGET_OPENCL,
+    'opencl_fp16': cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    'cuda': cv2.dnn.DNN_TARGET_CUDA,
+    'cuda_fp16': cv2.dnn.DNN_TARGET_CUDA_FP16,
+}
+
+
+def load_class_names(path=CLASS_NAMES_PATH):
+    """Load the COCO label list (index = class id - 1)"""
+    with open(path, 'rt') as f:
+        return f.read().rstrip('\n').split('\n')
+
+
+class OpenCVDetector:
+    """SSD MobileNet through cv2.dnn_DetectionModel"""
+
+    name = 'opencv'
+
+    def __init__(self, input_size=INFERENCE_INPUT_SIZE, threads=INFERENCE_THREADS,
+                 dnn_backend=DNN_BACKEND, dnn_target=DNN_TARGET,
+                 weights_path=WEIGHTS_PATH, config_path=CONFIG_PATH):
+        if dnn_backend not in DNN_BACKENDS:
+            raise ValueError(f"Unknown DNN backend '{dnn_backend}' (choose from {', '.join(DNN_BACKENDS)})")
+        if dnn_target not in DNN_TARGETS:
+            raise ValueError(f"Unknown DNN target '{dnn_target}' (choose from {', '.join(DNN_TARGETS)})")
+        if threads:
+            cv2.setNumThreads(threads)
+
+        self.input_size = input_size
+        self.net = cv2.dnn_DetectionModel(weights_path, config_path)
+        self.net.setPreferableBackend(DNN_BACKENDS[dnn_backend])
+        self.net.setPreferableTarget(DNN_TARGETS[dnn_target])
+        self.net.setInputSize(input_size, input_size)
+        self.net.setInputScale(1.0 / 127.5)
+        self.net.setInputMean((127.5, 127.5, 127.5))
+        self.net.setInputSwapRB(True)
+        self.description = f"opencv[{dnn_backend}/{dnn_target}] {input_size}x{input_size}"
+
+    def detect(self, img, conf_threshold):
+        classIds, confs, bbox = self.net.detect(img, confThreshold=conf_threshold)
+        if len(classIds) == 0:
+            return [], [], []
+        return (
+            [int(c) for c in np.array(classIds).flatten()],
+            [float(c) for c in np.array(confs).flatten()],
+            [[int(v) for v in box] for box in bbox],
+        )
+
+
+class OnnxDetector:
+    """SSD MobileNet through ONNX Runtime on CPU
+
+    Expects a TF Object Detection API style export: NHWC image input and
+    detection_boxes (normalized ymin, xmin, ymax, xmax), detection_classes
+    (COCO ids, same numbering as coco.names) and detection_scores outputs.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, input_size=INFERENCE_INPUT_SIZE,
+                 threads=INFERENCE_THREADS, output_names=None):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime is not installed (pip install onnxruntime)")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model not found: {model_path}")
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_is_uint8 = 'uint8' in model_input.type
+        self.input_size = input_size
+
+        # Exact names only: SSD exports also carry raw_detection_boxes,
+        # raw_detection_scores and detection_multiclass_scores
+        output_names = output_names or ONNX_OUTPUT_NAMES
+        index_of = {output.name.split(':')[0]: i for i, output in enumerate(self.session.get_outputs())}
+        self.output_index = {}
+        for key, output_name in output_names.items():
+            if output_name.split(':')[0] in index_of:
+                self.output_index[key] = index_of[output_name.split(':')[0]]
+        missing = [output_names[key] for key in ('boxes', 'classes', 'scores') if key not in self.output_index]
+        if missing:
+            raise ValueError(f"ONNX model is missing outputs: {', '.join(missing)} "
+                             f"(has {', '.join(index_of)}; set ONNX_OUTPUT_NAMES)")
+        self.description = f"{self.name} {os.path.basename(model_path)} {input_size}x{input_size}"
+
+    def _preprocess(self, img):
+        blob = cv2.resize(img, (self.input_size, self.input_size))
+        blob = cv2.cvtColor(blob, cv2.COLOR_BGR2RGB)
+        if self.input_is_uint8:
+            return blob[np.newaxis, ...]
+        # Same normalization as the OpenCV path: (x - 127.5) / 127.5
+        return ((blob.astype(np.float32) - 127.5) / 127.5)[np.newaxis, ...]
+
+    def detect(self, img, conf_threshold):
+        height, width = img.shape[:2]
+        outputs = self.session.run(None, {self.input_name: self._preprocess(img)})
+        boxes = outputs[self.output_index['boxes']][0]
+        classes = outputs[self.output_index['classes']][0]
+        scores = outputs[self.output_index['scores']][0]
+
+        class_ids, confs, bbox = [], [], []
+        for box, class_id, score in zip(boxes, classes, scores):
+            if score < conf_threshold:
+                continue
+            ymin, xmin, ymax, xmax = box
+            x, y = int(xmin * width), int(ymin * height)
+            bbox.append([x, y, int(xmax * width) - x, int(ymax * height) - y])
+            class_ids.append(int(class_id))
+            confs.append(float(score))
+        return class_ids, confs, bbox
+
+
+class OnnxInt8Detector(OnnxDetector):
+    """ONNX Runtime with the int8-quantized model (see quantize_model)"""
+
+    name = 'onnx-int8'
+
+    def __init__(self, model_path=INT8_MODEL_PATH, input_size=INFERENCE_INPUT_SIZE,
+                 threads=INFERENCE_THREADS, output_names=None):
+        super().__init__(model_path=model_path, input_size=input_size, threads=threads,
+                         output_names=output_names)
+
+
+def create_detector(backend=None, **options):
+    """Build a detector for the given backend name (default: INFERENCE_BACKEND)"""
+    backend = backend or INFERENCE_BACKEND
+    if backend == 'opencv':
+        return OpenCVDetector(**options)
+    if backend == 'onnx':
+        return OnnxDetector(**options)
+    if backend == 'onnx-int8':
+        return OnnxInt8Detector(**options)
+    raise ValueError(f"Unknown inference backend '{backend}' (choose from {', '.join(BACKENDS)})")
+
+
+def quantize_model(source_path=ONNX_MODEL_PATH, target_path=INT8_MODEL_PATH):
+    """Write an int8 (dynamic, weight-only) quantized copy of an ONNX model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+    return target_path
+
+
+if __name__ == '__main__':
+    # python inference_backends.py quantize [source.onnx] [target.onnx]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'quantize':
+        output = quantize_model(*sys.argv[2:4])
+        print(f"✅ Wrote int8 model to {output}")
+    else:
+        print("Usage: python inference_backends.py quantize [source.onnx] [target.onnx]")
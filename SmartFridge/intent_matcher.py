@@ -0,0 +1,464 @@
+"""
+Local fast path for voice commands
+Recognizes unambiguous add / remove / update commands in the ten supported
+languages without calling Gemini. The keyword lists from the voice prompt,
+plus units, locations and common item names, are compiled into regex
+unions (longest alternative first, so "take out" beats "take" and
+"ತೆಗೆದುಹಾಕು" beats "ಹಾಕು"). classify() returns the same fields as
+voice_assistant.parse_result() plus a confidence; anything that looks like a
+question, names several items or leaves the item unknown scores low and is
+left to the model. An item name that is not in ITEMS only scores high with
+an explicit amount and unit ("2 kg", "3 bottles") or a location after a
+preposition ("to the freezer"): "put on some music" or "remove the expired
+items" must not touch the database. "remove 2 eggs" becomes a reduction by
+2 rather than deleting the row; reductions by a measured amount ("1 kg")
+go to the model, since the backend can only subtract counts.
+
+VoicePathStats records how each voice request was answered (local, llm,
+cache, fallback) and how long it took.
+"""
+
+import datetime
+import os
+import re
+import threading
+from collections import deque
+
+MIN_CONFIDENCE = float(os.getenv('LOCAL_INTENT_MIN_CONFIDENCE', '0.8'))
+
+INTENT_KEYWORDS = {
+    'add': [
+        'add', 'put', 'store', 'keep', 'insert',
+        'डालें', 'डालो', 'डाल दो', 'रखो', 'रखें', 'रख दो',        # Hindi
+        'टाका', 'ठेवा',                                          # Marathi
+        'పెట్టు', 'పెట్టండి', 'చేర్చు', 'చేర్చండి',                  # Telugu
+        'சேர்', 'சேர்க்கவும்', 'வைக்கவும்',                          # Tamil
+        'ಹಾಕು', 'ಹಾಕಿ', 'ಸೇರಿಸಿ',                                # Kannada
+        'ഇടുക', 'ചേർക്കുക', 'വയ്ക്കുക',                           # Malayalam
+        'রাখুন', 'রাখো', 'যোগ করুন',                              # Bengali
+        'મૂકો', 'ઉમેરો',                                          # Gujarati
+        'ਪਾਓ', 'ਰੱਖੋ',                                            # Punjabi
+    ],
+    'remove': [
+        'remove', 'delete', 'take out', 'throw away', 'throw out', 'discard',
+        'निकालें', 'निकालो', 'निकाल दो', 'हटाओ', 'हटाएं', 'हटा दो',
+        'काढा', 'काढून टाका',
+        'తీసివేయి', 'తీసివేయండి', 'తొలగించు', 'తొలగించండి',
+        'எடு', 'நீக்கு', 'நீக்கவும்',
+        'ತೆಗೆದುಹಾಕು', 'ತೆಗೆದುಹಾಕಿ',
+        'നീക്കം',
+        'সরান', 'সরাও', 'বাদ দিন',
+        'દૂર', 'કાઢો',
+        'ਹਟਾਓ', 'ਕੱਢੋ',
+    ],
+    'update': [
+        'update', 'change', 'modify', 'set', 'move', 'reduce', 'decrease',
+        'बदलें', 'बदलो', 'बदल दें',
+        'बदला',
+        'మార్చు', 'మార్చండి', 'మారుస్తున్నాను',
+        'மாற்று', 'மாற்றவும்',
+        'ಬದಲಿಸು', 'ಬದಲಿಸಿ', 'ಬದಲಾಯಿಸಿ',
+        'മാറ്റുക',
+        'পরিবর্তন', 'বদলান',
+        'બદલો',
+        'ਬਦਲੋ',
+    ],
+}
+REDUCE_KEYWORDS = {'reduce', 'decrease'}
+MOVE_KEYWORDS = {'move'}
+
+# Words naming the field of an update; a quantity word alone also signals an update
+FIELD_WORDS = {
+    'quantity': ['quantity', 'amount', 'मात्रा', 'क्वांटिटी', 'క్వాంటిటీ', 'పరిమాణం', 'அளவ',
+                 'ಪ್ರಮಾಣ', 'അളവ', 'প্রমাণ', 'পরিমাণ', 'જથ્થો', 'ਮਾਤਰਾ'],
+    'expiry_date': ['expiry date', 'expiry', 'expiration date', 'expiration', 'expires'],
+    'location': ['location', 'place'],
+}
+
+# Questions always go to the model
+QUESTION_WORDS = [
+    'what', "what's", 'whats', 'how', 'which', 'where', 'when', 'why', 'who', 'is there', 'are there',
+    'do i', 'do we', 'does', 'can i', 'can you', 'should', 'could', 'recipe', 'recipes', 'suggest', 'tell me',
+    'क्या', 'कितना', 'कितने', 'कितनी', 'कहाँ', 'कहां', 'कब', 'कौन', 'काय', 'किती', 'कुठे',
+    'ఏమి', 'ఏం', 'ఎంత', 'ఎన్ని', 'ఎక్కడ', 'ఎప్పుడు',
+    'என்ன', 'எவ்வளவு', 'எத்தனை', 'எங்கே', 'எப்போது',
+    'ಏನು', 'ಎಷ್ಟು', 'ಎಲ್ಲಿ', 'ಯಾವಾಗ',
+    'എന്ത്', 'എത്ര', 'എവിടെ', 'എപ്പോൾ',
+    'কী', 'কি ', 'কত', 'কোথায়', 'কখন',
+    'શું', 'કેટલ', 'ક્યાં', 'ક્યારે',
+    'ਕੀ ', 'ਕਿੰਨ', 'ਕਿੱਥੇ', 'ਕਦੋਂ',
+]
+
+# Several items in one command: let the model split them
+CONJUNCTIONS = ['and', '&', 'और', 'तथा', 'आणि', 'మరియు', 'மற்றும்', 'ಮತ್ತು', 'എന്നിവ', 'এবং', 'અને', 'ਅਤੇ']
+
+LOCATIONS = {
+    'Freezer': ['freezer', 'फ्रीजर', 'फ्रीज़र', 'ఫ్రీజర్', 'ஃப்ரீசர்', 'ஃப்ரீஸர்', 'ಫ್ರೀಜರ್', 'ഫ്രീസർ', 'ফ্রিজার',
+                'ફ્રીઝર', 'ਫ੍ਰੀਜ਼ਰ', 'ਫਰੀਜ਼ਰ'],
+    'Fridge': ['fridge', 'refrigerator', 'inventory', 'फ्रिज', 'इन्वेंटरी', 'ఫ్రిజ్', 'ஃப்ரிட்ஜ்', 'ಫ್ರಿಜ್', 'ഫ്രിഡ്ജ',
+               'ফ্রিজ', 'ફ્રિજ', 'ਫ੍ਰਿਜ'],
+    'Door': ['door', 'दरवाज़े', 'दरवाजे', 'డోర్', 'கதவ', 'ಬಾಗಿಲ', 'ഡോർ', 'দরজা', 'દરવાજ', 'ਦਰਵਾਜ਼ੇ'],
+    'Top Shelf': ['top shelf'],
+    'Middle Shelf': ['middle shelf'],
+    'Bottom Shelf': ['bottom shelf'],
+}
+
+UNITS = {
+    'kg': ['kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms', 'किलो', 'కిలో', 'కేజీ', 'கிலோ', 'ಕೆಜಿ', 'ಕಿಲೋ',
+           'കിലോ', 'কেজি', 'কিলো', 'કિલો', 'ਕਿਲੋ'],
+    'g': ['g', 'gm', 'gms', 'gram', 'grams', 'ग्राम', 'గ్రాము', 'గ్రాముల', 'கிராம்', 'ಗ್ರಾಂ', 'ഗ്രാം', 'গ্রাম',
+          'ગ્રામ', 'ਗ੍ਰਾਮ'],
+    'liter': ['l', 'ltr', 'ltrs', 'liter', 'liters', 'litre', 'litres', 'लीटर', 'లీటర్', 'லிட்டர', 'ಲೀಟರ್',
+              'ലിറ്റർ', 'লিটার', 'લિટર', 'ਲੀਟਰ'],
+    'ml': ['ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres'],
+    'unit': ['unit', 'units', 'piece', 'pieces', 'pcs', 'pc'],
+    'bottle': ['bottle', 'bottles'],
+    'packet': ['packet', 'packets', 'pack', 'packs'],
+    'dozen': ['dozen', 'दर्जन'],
+}
+PLURAL_UNITS = {'liter': 'liters', 'unit': 'units', 'dozen': 'dozen', 'bottle': 'bottles', 'packet': 'packets'}
+UNKNOWN_ITEM_CONFIDENCE = 0.6  # Below MIN_CONFIDENCE: a guessed item name with no amount or place goes to the model
+LOCATION_PREPOSITIONS = {'in', 'into', 'inside', 'to', 'on'}
+SOURCE_PREPOSITIONS = {'from', 'out of'}  # "from the freezer" is where an item was, not where it goes
+MEASURED_REDUCE_CONFIDENCE = 0.6  # Below MIN_CONFIDENCE: "remove 1 kg chicken" goes to the model
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+}
+
+# Common items as said in each language -> the English label stored in the database
+ITEMS = {
+    'chicken': ['चिकन', 'చికెన్', 'சிக்கன்', 'ಚಿಕನ್', 'ചിക്കൻ', 'চিকেন', 'ચિકન', 'ਚਿਕਨ'],
+    'mutton': ['मटन', 'మటన్', 'மட்டன்', 'ಮಟನ್', 'മട്ടൻ', 'মাটন', 'મટન', 'ਮਟਨ'],
+    'fish': ['मछली', 'मासे', 'చేప', 'மீன்', 'ಮೀನು', 'മീൻ', 'মাছ', 'માછલી', 'ਮੱਛੀ'],
+    'milk': ['दूध', 'పాలు', 'பால்', 'ಹಾಲು', 'പാൽ', 'দুধ', 'દૂધ', 'ਦੁੱਧ'],
+    'egg': ['अंडा', 'अंडे', 'గుడ్లు', 'గుడ్డు', 'முட்டை', 'ಮೊಟ್ಟೆ', 'മുട്ട', 'ডিম', 'ઈંડા', 'ਅੰਡੇ', 'ਅੰਡਾ'],
+    'tomato': ['टमाटर', 'टोमॅटो', 'టమాటా', 'టమోటా', 'தக்காளி', 'ಟೊಮೆಟೊ', 'ಟೊಮ್ಯಾಟೊ', 'തക്കാളി', 'টমেটো',
+               'ટામેટા', 'ਟਮਾਟਰ'],
+    'onion': ['प्याज', 'कांदा', 'ఉల్లిపాయ', 'வெங்காய', 'ಈರುಳ್ಳಿ', 'ഉള്ളി', 'পেঁয়াজ', 'ડુંગળી', 'ਪਿਆਜ਼'],
+    'potato': ['आलू', 'बटाटा', 'బంగాళాదుంప', 'உருளைக்கிழங்கு', 'ಆಲೂಗಡ್ಡೆ', 'ഉരുളക്കിഴങ്ങ', 'আলু', 'બટાકા',
+               'ਆਲੂ'],
+    'paneer': ['पनीर', 'పనీర్', 'பனீர்', 'ಪನೀರ್', 'പനീർ', 'পনির', 'પનીર', 'ਪਨੀਰ'],
+    'curd': ['दही', 'పెరుగు', 'தயிர்', 'ಮೊಸರು', 'തൈര', 'দই', 'દહીં', 'ਦਹੀਂ'],
+    'butter': ['मक्खन', 'వెన్న', 'வெண்ணெய்', 'ಬೆಣ್ಣೆ', 'വെണ്ണ', 'মাখন', 'માખણ', 'ਮੱਖਣ'],
+    'rice': ['चावल', 'तांदूळ', 'బియ్యం', 'அரிசி', 'ಅಕ್ಕಿ', 'അരി', 'চাল', 'ચોખા', 'ਚੌਲ'],
+    'apple': ['सेब', 'सफरचंद', 'ఆపిల్', 'ஆப்பிள்', 'ಸೇಬು', 'ആപ്പിൾ', 'আপেল', 'સફરજન', 'ਸੇਬ'],
+    'banana': ['केला', 'केले', 'केळी', 'అరటి', 'வாழைப்பழ', 'ಬಾಳೆಹಣ್ಣು', 'কলা', 'કેળા', 'ਕੇਲਾ', 'ਕੇਲੇ'],
+}
+
+# English filler words that are never part of an item name
+STOPWORDS = {
+    'to', 'the', 'in', 'into', 'inside', 'of', 'from', 'my', 'our', 'a', 'an', 'some', 'please', 'by', 'at', 'on',
+    'for', 'it', 'item', 'items', 'quantity', 'new', 'now', 'date', 'as', 'with', 'this', 'that', 'up', 'more',
+    'kindly', 'just', 'also', 'again', 'out', 'all', 'i', 'me', 'we', 'us', 'want', 'need', 'would', 'like',
+    "let's", 'let', 'go', 'ahead', 'there', 'here',
+}
+
+# Short confirmations for non-English users ("<details>: <verb>"), so the
+# local path does not need the model to phrase them
+CONFIRMATIONS = {
+    'hi': ('जोड़ा गया', 'हटाया गया', 'अपडेट किया गया', 'इन्वेंटरी में नहीं मिला'),
+    'mr': ('जोडले', 'काढले', 'अपडेट केले', 'इन्व्हेंटरीमध्ये सापडले नाही'),
+    'te': ('జోడించబడింది', 'తీసివేయబడింది', 'అప్‌డేట్ చేయబడింది', 'ఇన్వెంటరీలో లేదు'),
+    'ta': ('சேர்க்கப்பட்டது', 'நீக்கப்பட்டது', 'புதுப்பிக்கப்பட்டது', 'இருப்பில் இல்லை'),
+    'kn': ('ಸೇರಿಸಲಾಗಿದೆ', 'ತೆಗೆದುಹಾಕಲಾಗಿದೆ', 'ನವೀಕರಿಸಲಾಗಿದೆ', 'ಇನ್ವೆಂಟರಿಯಲ್ಲಿ ಇಲ್ಲ'),
+    'ml': ('ചേർത്തു', 'നീക്കം ചെയ്തു', 'അപ്ഡേറ്റ് ചെയ്തു', 'ഇൻവെന്ററിയിൽ ഇല്ല'),
+    'bn': ('যোগ করা হয়েছে', 'সরানো হয়েছে', 'আপডেট করা হয়েছে', 'ইনভেন্টরিতে নেই'),
+    'gu': ('ઉમેરવામાં આવ્યું', 'દૂર કરવામાં આવ્યું', 'અપડેટ કરવામાં આવ્યું', 'ઇન્વેન્ટરીમાં નથી'),
+    'pa': ('ਜੋੜਿਆ ਗਿਆ', 'ਹਟਾਇਆ ਗਿਆ', 'ਅੱਪਡੇਟ ਕੀਤਾ ਗਿਆ', 'ਇਨਵੈਂਟਰੀ ਵਿੱਚ ਨਹੀਂ ਹੈ'),
+}
+
+MONTHS = {name: i + 1 for i, name in enumerate(
+    ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+     'november', 'december'])}
+MONTHS.update({name[:3]: number for name, number in list(MONTHS.items())})
+MONTHS['sept'] = 9
+
+_LATIN_WORD = re.compile(r"[a-z][a-z'\-]*")
+_MONTH = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_ISO_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_DAY_MONTH = re.compile(rf'(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH})\b\.?(?:,?\s+(\d{{4}}))?')
+_MONTH_DAY = re.compile(rf'\b({_MONTH})\b\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?')
+
+
+def _union(table):
+    """Regex matching any surface form in {canonical: [surface, ...]}, longest first
+
+    Latin words only match whole words; Indic forms match anywhere, since
+    case suffixes attach to them ("చేపను", "కేజీలకు").
+    """
+    lookup = {}
+    for canonical, surfaces in table.items():
+        for surface in surfaces:
+            lookup[surface.lower()] = canonical
+    parts = []
+    for surface in sorted(lookup, key=len, reverse=True):
+        escaped = re.escape(surface).replace(r'\ ', r'\s+')
+        parts.append(rf'(?<![a-z]){escaped}(?![a-z])' if surface.isascii() else escaped)
+    return re.compile('|'.join(parts)), lookup
+
+
+class IntentMatcher:
+    """Compiled keyword, unit, location and item unions; classify() is thread-safe"""
+
+    def __init__(self):
+        self._intents, self._intent_of = _union(INTENT_KEYWORDS)
+        self._fields, self._field_of = _union(FIELD_WORDS)
+        self._questions, _ = _union({'question': QUESTION_WORDS})
+        self._conjunctions, _ = _union({'and': CONJUNCTIONS})
+        self._locations, self._location_of = _union(LOCATIONS)
+        # The English label itself (and its plural) names the item too
+        self._items, self._item_of = _union({label: [label, _plural(label)] + names for label, names in ITEMS.items()})
+        units, self._unit_of = _union(UNITS)
+        numbers = '|'.join(NUMBER_WORDS)
+        self._quantity = re.compile(
+            rf'(\d+(?:\.\d+)?|(?<![a-z])(?:{numbers})(?![a-z]))\s*(?:({units.pattern}))?')
+
+    def classify(self, text, language='en'):
+        """Fields like voice_assistant.parse_result() plus 'confidence' and 'reason'"""
+        text = ' '.join((text or '').lower().split())
+        result = {'intent': 'none', 'label': '', 'quantity': '', 'location': '', 'field': '', 'value': '',
+                  'reply': '', 'not_found_reply': '', 'confidence': 0.0, 'reason': ''}
+
+        def give_up(reason):
+            result['reason'] = reason
+            return result
+
+        if '?' in text or self._questions.search(text):
+            return give_up('question')
+        if self._conjunctions.search(text) or ',' in text:
+            return give_up('several items')
+
+        spans = []  # Parts of the text that are explained (not the item name)
+
+        keywords = [(m.group(), m.span()) for m in self._intents.finditer(text)]
+        intents = {self._intent_of[re.sub(r'\s+', ' ', k)] for k, _ in keywords}
+        fields = [(self._field_of[re.sub(r'\s+', ' ', m.group())], m.span()) for m in self._fields.finditer(text)]
+        if not intents and any(f == 'quantity' for f, _ in fields):
+            intents = {'update'}  # "मटन की मात्रा 25 किलो करें"
+        if len(intents) != 1:
+            return give_up('no command' if not intents else 'several commands')
+        intent = intents.pop()
+        spans += [span for _, span in keywords] + [span for _, span in fields]
+        said = {re.sub(r'\s+', ' ', k) for k, _ in keywords}
+
+        locations = [(self._location_of[m.group()], m.span()) for m in self._locations.finditer(text)]
+        spans += [span for _, span in locations]
+        sources = [location for location, (start, _) in locations
+                   if _preceded_by(text, start, SOURCE_PREPOSITIONS)]
+        destinations = [location for location, (start, _) in locations
+                        if not _preceded_by(text, start, SOURCE_PREPOSITIONS)]
+        # "to the freezer" names a place; "keep the fridge door closed" does not
+        placed = any(not text[start:end].isascii() or _preceded_by(text, start, LOCATION_PREPOSITIONS)
+                     for _, (start, end) in locations)
+
+        date, date_span = _find_date(text)
+        if date_span:
+            spans.append(date_span)
+
+        quantities = []
+        with_unit = False
+        for m in self._quantity.finditer(text):
+            if date_span and date_span[0] <= m.start() < date_span[1]:
+                continue
+            unit = m.group(2) and self._unit_of[re.sub(r'\s+', ' ', m.group(2))]
+            with_unit = with_unit or bool(unit)
+            quantities.append((_format_quantity(m.group(1), unit), m.span(), unit))
+        spans += [span for _, span, _ in quantities]
+        # A whole number of items ("2 eggs", "3 pieces"): the only kind of
+        # amount the backend can take away from a row
+        amount = quantities[-1][0].split()[0] if quantities else '1'
+        counted = not quantities or (quantities[-1][2] in (None, 'unit') and amount.isdigit())
+
+        # The item: a known name in any script, else the leftover English words
+        items = {self._item_of[m.group()] for m in self._items.finditer(text)}
+        spans += [m.span() for m in self._items.finditer(text)]
+        leftover = _blank(text, spans)
+        words = [w for w in _LATIN_WORD.findall(leftover) if w not in STOPWORDS]
+        if len(items) > 1:
+            return give_up('several items')
+        known_item = bool(items)
+        if items:
+            label = items.pop()
+            if words:
+                return give_up('unknown words next to the item')
+        elif words:
+            label = ' '.join(_singular(w) for w in words)
+        else:
+            return give_up('no item')
+        if len(label.split()) > 3:
+            return give_up('long item name')
+
+        confidence = 0.95
+        if not known_item and not (with_unit or placed):
+            confidence = UNKNOWN_ITEM_CONFIDENCE
+            result['reason'] = 'unknown item without amount or place'
+        if intent == 'remove' and quantities:
+            # "remove 2 eggs" takes two away; deleting the row would lose the rest
+            intent, said = 'update', said | REDUCE_KEYWORDS
+        reducing = intent == 'update' and bool(said & REDUCE_KEYWORDS)
+        if reducing and not counted:
+            confidence = min(confidence, MEASURED_REDUCE_CONFIDENCE)
+            result['reason'] = 'reduction by a measured amount'
+        result.update(intent=intent, label=label)
+        if intent == 'add':
+            result['quantity'] = quantities[-1][0] if quantities else '1 unit'
+            result['location'] = destinations[-1] if destinations else 'Fridge'
+            if not quantities:
+                confidence -= 0.05
+            if sources:
+                # "add 2 apples from the freezer": moved, bought, or taken out? Let the model decide
+                confidence = min(confidence, UNKNOWN_ITEM_CONFIDENCE)
+                result['reason'] = 'add with a source location'
+        elif intent == 'update':
+            if reducing:
+                field, value = 'quantity', f'reduce:{amount}'
+            elif date or any(f == 'expiry_date' for f, _ in fields):
+                field, value = 'expiry_date', date
+            elif said & MOVE_KEYWORDS or any(f == 'location' for f, _ in fields):
+                field, value = 'location', destinations[-1] if destinations else ''
+            else:
+                # "from 20 kg to 30 kg" -> the last amount is the new one
+                field, value = 'quantity', quantities[-1][0] if quantities else ''
+            if not value:
+                return give_up(f'no new {field}')
+            result.update(field=field, value=value)
+
+        if not text.isascii():
+            confidence -= 0.05  # Native-script words we skipped may still qualify the item
+        result['confidence'] = round(confidence, 2)
+        result.update(_confirmations(result, language))
+        return result
+
+
+def _preceded_by(text, start, words):
+    before = _LATIN_WORD.findall(text[:start])
+    while before and before[-1] in ('the', 'my', 'our', 'a', 'an'):
+        before.pop()
+    return bool(before) and (before[-1] in words or ' '.join(before[-2:]) in words)
+
+
+def _blank(text, spans):
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = ' ' * (end - start)
+    return ''.join(chars)
+
+
+def _singular(word):
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def _plural(word):
+    if word.endswith(('o', 'sh', 'ch')):
+        return word + 'es'
+    return word + 's'
+
+
+def _format_quantity(number, unit):
+    amount = NUMBER_WORDS.get(number) or float(number)
+    amount = int(amount) if float(amount).is_integer() else amount
+    unit = unit or 'unit'
+    return f"{amount} {PLURAL_UNITS.get(unit, unit) if amount != 1 else unit}"
+
+
+def _find_date(text):
+    """(YYYY-MM-DD, span) for '2025-11-15', '25th November 2025', 'Dec 15' ...; (None, None) otherwise"""
+    today = datetime.date.today()
+    for pattern in (_ISO_DATE, _DAY_MONTH, _MONTH_DAY):
+        m = pattern.search(text)
+        if not m:
+            continue
+        try:
+            if pattern is _ISO_DATE:
+                date = datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+            else:
+                day, month, year = ((m.group(1), m.group(2), m.group(3)) if pattern is _DAY_MONTH
+                                    else (m.group(2), m.group(1), m.group(3)))
+                month = MONTHS[month]
+                if year:
+                    date = datetime.date(int(year), month, int(day))
+                else:
+                    # No year: the next time that day comes round
+                    date = datetime.date(today.year, month, int(day))
+                    if date < today:
+                        date = datetime.date(today.year + 1, month, int(day))
+        except ValueError:
+            return None, None
+        return date.isoformat(), m.span()
+    return None, None
+
+
+def _confirmations(result, language):
+    """'reply' / 'not_found_reply' in the user's language ('' for English: the backend has its own)"""
+    verbs = CONFIRMATIONS.get(language)
+    if not verbs:
+        return {}
+    added, removed, updated, not_found = verbs
+    label = result['label']
+    if result['intent'] == 'add':
+        reply = f"✓ {label} ({result['quantity']}), {result['location']}: {added}"
+    elif result['intent'] == 'remove':
+        reply = f"✓ {label}: {removed}"
+    else:
+        reply = f"✓ {label} → {result['value']}: {updated}"
+    return {'reply': reply, 'not_found_reply': f"❌ {label}: {not_found}"}
+
+
+class VoicePathStats:
+    """How voice requests were answered and how long each path takes"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._latencies = {}
+        self._window = window
+        self._first_bytes = deque(maxlen=window)
+
+    def record(self, path, seconds):
+        with self._lock:
+            self._counts[path] = self._counts.get(path, 0) + 1
+            self._latencies.setdefault(path, deque(maxlen=self._window)).append(seconds)
+
+    def record_first_byte(self, seconds):
+        """Time until a streamed voice request sent its first event"""
+        with self._lock:
+            self._first_bytes.append(seconds)
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._counts.values())
+            paths = {}
+            for path, count in self._counts.items():
+                latencies = sorted(self._latencies[path])
+                paths[path] = {
+                    'requests': count,
+                    'fraction': round(count / total, 3),
+                    'latency_ms': {
+                        'mean': round(sum(latencies) / len(latencies) * 1000, 2),
+                        'p50': round(latencies[len(latencies) // 2] * 1000, 2),
+                        'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+                    },
+                }
+            first_bytes = sorted(self._first_bytes)
+            return {
+                'requests': total,
+                'local_fraction': round(self._counts.get('local', 0) / total, 3) if total else None,
+                'min_confidence': MIN_CONFIDENCE,
+                'paths': paths,
+                'stream_ttfb_ms': {
+                    'samples': len(first_bytes),
+                    'p50': round(first_bytes[len(first_bytes) // 2] * 1000, 2) if first_bytes else None,
+                    'p95': round(first_bytes[min(len(first_bytes) - 1, int(len(first_bytes) * 0.95))] * 1000, 2)
+                    if first_bytes else None,
+                },
+            }
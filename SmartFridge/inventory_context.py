@@ -0,0 +1,242 @@
+"""
+Inventory context for Gemini prompts
+The voice prompt used to carry one full sentence per inventory row. This
+builds a compact block instead:
+
+    - rows with the same label and location are merged (quantities with the
+      same unit are added up, the earliest expiry date is kept)
+    - items are grouped under one line per location
+    - if everything does not fit in the token budget, the items the query
+      mentions, the location it asks about and items expiring soon go in
+      first, then the rest by expiry date; what is left out is summarized
+      as a count per location
+
+Compiling (merging and sorting) is cached per inventory version, a hash of
+the rows, so only the per-query selection runs on every request.
+"""
+
+import datetime
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from intent_matcher import ITEMS, LOCATIONS
+from response_cache import fingerprint
+
+TOKEN_BUDGET = int(os.getenv('INVENTORY_TOKEN_BUDGET', '1200'))
+EXPIRING_DAYS = 3  # "Expiring soon" as in /api/voice/query's rule-based answer
+CACHED_VERSIONS = 4
+
+_QUANTITY = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(.*?)\s*$')
+_WORD = re.compile(r"[^\W\d_][\w'\-]*")
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count: ~4 characters per token for English text"""
+    return (len(text) + 3) // 4
+
+
+def inventory_version(items):
+    """Hash of the rows that matter for the prompt; changes whenever one of them does"""
+    return fingerprint(*(
+        f"{item.get('label')}|{item.get('quantity')}|{item.get('location')}|"
+        f"{item.get('expiry_date')}|{item.get('status')}"
+        for item in items
+    ))
+
+
+def full_inventory_text(items):
+    """The previous prompt format (one sentence per row), for size comparisons"""
+    return "\n".join([
+        f"- {item['label']} ({item.get('quantity', 'N/A')}) in {item.get('location', 'unknown location')}, "
+        f"expires: {item.get('expiry_date', 'no expiry set')}, status: {item.get('status', 'N/A')}"
+        for item in items
+    ])
+
+
+def _to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if value:
+        try:
+            return datetime.date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _add_quantities(quantities):
+    """'2 kg' + '500 g' stays a list, '2 kg' + '3 kg' becomes '5 kg'"""
+    totals = OrderedDict()
+    other = []
+    for quantity in quantities:
+        match = _QUANTITY.match(str(quantity or ''))
+        if match:
+            unit = match.group(2).lower()
+            totals[unit] = totals.get(unit, 0) + float(match.group(1))
+        elif quantity:
+            other.append(str(quantity))
+    parts = [f"{total:g} {unit}".strip() for unit, total in totals.items()]
+    return ' + '.join(parts + other)
+
+
+class InventoryContext:
+    """Builds the inventory block of a prompt under a token budget"""
+
+    def __init__(self, budget=TOKEN_BUDGET, expiring_days=EXPIRING_DAYS):
+        self.budget = budget
+        self.expiring_days = expiring_days
+        self._lock = threading.Lock()
+        self._compiled = OrderedDict()  # (version, date) -> merged entries, most recent last
+        self._counts = {'builds': 0, 'compiled': 0, 'reused': 0, 'trimmed': 0}
+
+    # ------------------------------------------------------------------
+    # Compile (cached per inventory version)
+    # ------------------------------------------------------------------
+    def compile(self, items, version=None):
+        """Merged entries for these rows, sorted by location then expiry"""
+        version = version or inventory_version(items)
+        today = datetime.date.today()
+        key = (version, today)
+        with self._lock:
+            entries = self._compiled.get(key)
+            if entries is not None:
+                self._compiled.move_to_end(key)
+                self._counts['reused'] += 1
+                return entries
+
+        merged = OrderedDict()
+        for item in items:
+            label = str(item.get('label') or '').strip()
+            if not label:
+                continue
+            location = str(item.get('location') or 'Fridge').strip()
+            entry = merged.setdefault((label.casefold(), location.casefold()), {
+                'label': label, 'location': location, 'quantities': [], 'rows': 0,
+                'expiry': None, 'statuses': set(),
+            })
+            entry['rows'] += 1
+            entry['quantities'].append(item.get('quantity'))
+            expiry = _to_date(item.get('expiry_date'))
+            if expiry and (entry['expiry'] is None or expiry < entry['expiry']):
+                entry['expiry'] = expiry
+            status = str(item.get('status') or '').strip()
+            if status and status.lower() != 'fresh':
+                entry['statuses'].add(status)
+
+        entries = []
+        for entry in merged.values():
+            days_left = (entry['expiry'] - today).days if entry['expiry'] else None
+            words = {word.rstrip('s') for word in _WORD.findall(entry['label'].casefold())}
+            entry = {
+                'label': entry['label'],
+                'location': entry['location'],
+                'days_left': days_left,
+                'words': words,
+                'text': self._describe(entry, days_left),
+            }
+            entry['tokens'] = estimate_tokens(entry['text']) + 1  # + separator
+            entries.append(entry)
+        entries.sort(key=lambda e: (e['location'].casefold(),
+                                    e['days_left'] if e['days_left'] is not None else 10 ** 6,
+                                    e['label'].casefold()))
+
+        with self._lock:
+            self._compiled[key] = entries
+            while len(self._compiled) > CACHED_VERSIONS:
+                self._compiled.popitem(last=False)
+            self._counts['compiled'] += 1
+        return entries
+
+    @staticmethod
+    def _describe(entry, days_left):
+        text = entry['label']
+        quantity = _add_quantities(entry['quantities'])
+        if quantity:
+            text += f" {quantity}"
+        notes = []
+        if entry['rows'] > 1:
+            notes.append(f"x{entry['rows']}")
+        if days_left is not None:
+            if days_left < 0:
+                notes.append(f"expired {entry['expiry'].isoformat()}")
+            else:
+                notes.append(f"exp {entry['expiry'].isoformat()}")
+        notes.extend(sorted(entry['statuses']))
+        if notes:
+            text += f" ({', '.join(notes)})"
+        return text
+
+    # ------------------------------------------------------------------
+    # Select (per query)
+    # ------------------------------------------------------------------
+    def build(self, items, query_text='', version=None):
+        """Inventory block for the prompt: everything if it fits, otherwise the relevant part"""
+        entries = self.compile(items, version)
+        with self._lock:
+            self._counts['builds'] += 1
+        if not entries:
+            return ''
+        if sum(e['tokens'] for e in entries) <= self.budget:
+            return self._render(entries)
+
+        mentioned_labels, mentioned_locations = self._mentions(query_text)
+
+        def priority(entry):
+            if entry['words'] & mentioned_labels:
+                return 0
+            if entry['days_left'] is not None and entry['days_left'] <= self.expiring_days:
+                return 1
+            if entry['location'].casefold() in mentioned_locations:
+                return 2
+            return 3
+
+        ranked = sorted(range(len(entries)), key=lambda i: (
+            priority(entries[i]),
+            entries[i]['days_left'] if entries[i]['days_left'] is not None else 10 ** 6,
+        ))
+        budget = self.budget - 20  # Room for the "more items" line
+        chosen = set()
+        for i in ranked:
+            if entries[i]['tokens'] <= budget:
+                chosen.add(i)
+                budget -= entries[i]['tokens']
+        with self._lock:
+            self._counts['trimmed'] += 1
+
+        left_out = OrderedDict()
+        for i, entry in enumerate(entries):
+            if i not in chosen:
+                left_out[entry['location']] = left_out.get(entry['location'], 0) + 1
+        text = self._render([entries[i] for i in sorted(chosen)])
+        summary = ', '.join(f"{count} in {location}" for location, count in left_out.items())
+        return f"{text}\n(+ {sum(left_out.values())} more items not listed: {summary})"
+
+    @staticmethod
+    def _mentions(query_text):
+        """Item words and locations the query talks about (any supported language)"""
+        text = (query_text or '').casefold()
+        labels = {word.rstrip('s') for word in _WORD.findall(text)}
+        for label, names in ITEMS.items():
+            if any(name in text for name in names):
+                labels.add(label)
+        locations = set()
+        for location, names in LOCATIONS.items():
+            # "fridge" / "inventory" mean everything, not one compartment
+            if location != 'Fridge' and any(name in text for name in names):
+                locations.add(location.casefold())
+        return labels, locations
+
+    @staticmethod
+    def _render(entries):
+        lines = OrderedDict()
+        for entry in entries:
+            lines.setdefault(entry['location'], []).append(entry['text'])
+        return '\n'.join(f"{location}: {'; '.join(texts)}" for location, texts in lines.items())
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, budget_tokens=self.budget, cached_versions=len(self._compiled))
@@ -0,0 +1,162 @@
+"""
+Background job queue for the Smart Fridge backend
+Slow work (recipe generation) runs on a small pool of worker threads instead
+of on the request thread:
+
+    - submit(fn, **params) returns a job right away; clients poll get() or
+      follow watch(), a generator of job snapshots for Server-Sent Events
+    - at most max_queued jobs wait for a worker; beyond that submit() raises
+      QueueFull so the caller can answer 503 instead of piling up work
+    - finished jobs are kept for ttl seconds, then evicted
+
+Jobs only live in this process: with several backend workers, poll the one
+that accepted the job.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 2
+MAX_QUEUED = 20
+JOB_TTL_SECONDS = 600
+FINISHED = ('done', 'failed')
+
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting"""
+
+
+class JobQueue:
+    """Runs submitted fn(**params) calls; fn returns (result, ok)"""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queued=MAX_QUEUED, ttl=JOB_TTL_SECONDS,
+                 name='jobs', logger=None):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._condition = threading.Condition()
+        self._jobs = OrderedDict()  # id -> job, oldest first
+        self._counts = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'evicted': 0}
+
+    def submit(self, fn, **params):
+        """Queue a job and return its snapshot; raises QueueFull"""
+        with self._condition:
+            self._evict()
+            if self._count_state('queued') >= self.max_queued:
+                self._counts['rejected'] += 1
+                raise QueueFull(f'{self.max_queued} jobs already queued')
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'version': 0,
+                'call': (fn, params),
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+            }
+            self._counts['submitted'] += 1
+            snapshot = self._snapshot(self._jobs[job_id])
+        self._executor.submit(self._run, job_id)
+        return snapshot
+
+    def _run(self, job_id):
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            fn, params = job['call']
+            self._update(job, status='running', started_at=time.time())
+        try:
+            result, ok = fn(**params)
+            error = None
+        except Exception as e:
+            if self.logger:
+                self.logger.exception('Job %s failed', job_id)
+            result, ok, error = None, False, str(e)
+        status = 'done' if ok else 'failed'
+        with self._condition:
+            self._counts[status] += 1
+            if job_id in self._jobs:
+                self._update(self._jobs[job_id], status=status, result=result, error=error,
+                             finished_at=time.time())
+
+    def _update(self, job, **changes):
+        job.update(changes)
+        job['version'] += 1
+        self._condition.notify_all()
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if unknown or evicted"""
+        with self._condition:
+            self._evict()
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def watch(self, job_id, timeout=120, keepalive=15):
+        """Generator of snapshots each time the job changes, None as a keep-alive tick
+
+        Ends after the job finishes, disappears or timeout seconds pass.
+        """
+        deadline = time.monotonic() + timeout
+        version = -1
+        while True:
+            with self._condition:
+                job = self._jobs.get(job_id)
+                if job is not None and job['version'] == version:
+                    self._condition.wait(min(keepalive, max(0.0, deadline - time.monotonic())))
+                    job = self._jobs.get(job_id)
+                snapshot = self._snapshot(job) if job else None
+            if snapshot is None:
+                return
+            if snapshot['version'] != version:
+                version = snapshot['version']
+                yield snapshot
+                if snapshot['status'] in FINISHED:
+                    return
+            else:
+                yield None
+            if time.monotonic() >= deadline:
+                return
+
+    def _count_state(self, status):
+        return sum(1 for job in self._jobs.values() if job['status'] == status)
+
+    def _evict(self):
+        """Drop finished jobs older than ttl (call with the lock held)"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in FINISHED and now - job['finished_at'] > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._counts['evicted'] += len(expired)
+
+    @staticmethod
+    def _snapshot(job):
+        snapshot = {key: value for key, value in job.items() if key != 'call'}
+        end = job['finished_at'] or time.time()
+        snapshot['age_seconds'] = round(end - job['created_at'], 3)
+        return snapshot
+
+    def stats(self):
+        with self._condition:
+            self._evict()
+            return {
+                'max_workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'ttl_seconds': self.ttl,
+                'queued': self._count_state('queued'),
+                'running': self._count_state('running'),
+                'stored': len(self._jobs),
+                'counts': dict(self._counts),
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
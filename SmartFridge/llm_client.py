@@ -0,0 +1,446 @@
+"""
+Shared Gemini client for the Smart Fridge backend
+Every Gemini call goes through one GeminiClient:
+
+    - one pooled requests.Session (keep-alive connections are reused)
+    - a deadline per call; each attempt's timeout is cut to what is left
+    - retries with jittered exponential backoff for 429 / 5xx / network
+      errors, run on the client's own worker threads: submit() returns a
+      Future right away, so a request handler can stop waiting and serve its
+      fallback while the retries carry on (and e.g. fill a cache)
+    - separate worker pools per kind of call ('interactive' for voice,
+      'batch' for recipes), so a burst of slow recipe calls cannot hold every
+      thread while a voice answer waits in the queue
+    - a circuit breaker: after CIRCUIT_FAILURE_THRESHOLD failures in a row
+      calls fail fast with CircuitOpenError for CIRCUIT_RESET_SECONDS, then a
+      single trial call decides whether it closes again
+    - single-flight: calls made with the same key while one is in flight
+      wait on that call's Future instead of sending their own request
+    - stream(): streamGenerateContent over SSE, handing each text chunk to a
+      callback as it arrives (no retries: chunks may already be on screen)
+
+stats() reports breaker state, call counts and latency percentiles.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GEMINI_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta'
+GEMINI_MODEL = 'gemini-2.0-flash'
+POOL_SIZE = 10  # Keep-alive connections to the API
+POOLS = {'interactive': 4, 'batch': 4}  # Threads running calls and their retries, per kind of call
+DEFAULT_POOL = 'batch'
+DEFAULT_DEADLINE = 15
+RETRY_BASE_SECONDS = 1
+RETRY_MAX_SECONDS = 8
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """A Gemini call failed; status is the HTTP status if there was one"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(LLMError):
+    """Gemini is considered down; the call was not attempted"""
+
+
+class DeadlineExceeded(LLMError):
+    """No successful answer before the call's deadline"""
+
+
+class CircuitBreaker:
+    """closed -> (threshold failures) -> open -> (reset_seconds) -> half_open -> closed / open"""
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_running = False
+
+    def allow(self):
+        """True if a call may go out now (in half-open state, only one trial call)"""
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or (self.state == 'closed'
+                                             and self.consecutive_failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def record_abandoned(self):
+        """A call that was let through ended without an answer from Gemini (e.g. its
+        deadline passed in the queue): a half-open trial counts as failed, so the
+        breaker reopens instead of waiting for a verdict that never comes"""
+        with self._lock:
+            if self.state == 'half_open' and self._trial_running:
+                self._trial_running = False
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'times_opened': self.times_opened,
+                'retry_in_seconds': retry_in,
+            }
+
+
+class GeminiClient:
+    """Pooled, deadline-bounded, circuit-broken generateContent calls"""
+
+    def __init__(self, api_key, model=GEMINI_MODEL, base_url=GEMINI_BASE_URL, pool_size=POOL_SIZE,
+                 pools=None, breaker=None, logger=None):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.breaker = breaker or CircuitBreaker()
+        self.logger = logger
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executors = {
+            name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"gemini-{name}")
+            for name, workers in (pools or POOLS).items()
+        }
+        self._pool_sizes = dict(pools or POOLS)
+        self._pending = dict.fromkeys(self._executors, 0)  # Submitted, not finished, per pool
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self._first_chunks = deque(maxlen=500)  # Time to the first streamed chunk
+        self._in_flight = {}  # key -> Future of the call everyone with that key waits on
+        self._counts = {'calls': 0, 'succeeded': 0, 'failed': 0, 'attempts': 0, 'retries': 0,
+                        'short_circuited': 0, 'deadline_exceeded': 0, 'abandoned': 0, 'coalesced': 0,
+                        'streams': 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def _log(self, level, message, *args):
+        if self.logger:
+            getattr(self.logger, level)(message, *args)
+
+    def url(self, method='generateContent'):
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+    def submit(self, payload, deadline=DEFAULT_DEADLINE, retries=2, pool=DEFAULT_POOL):
+        """Start a call on the pool's threads; the Future gives the response JSON or raises LLMError"""
+        executor = self._executors.get(pool)
+        if executor is None:
+            raise ValueError(f"Unknown Gemini pool '{pool}' (choose from {', '.join(self._executors)})")
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            future = Future()
+            future.set_exception(CircuitOpenError('Gemini circuit breaker is open'))
+            return future
+        with self._lock:
+            self._pending[pool] += 1
+        future = executor.submit(self._call, payload, time.monotonic() + deadline, retries)
+        future.add_done_callback(lambda f: self._finished(pool))
+        return future
+
+    def _finished(self, pool):
+        with self._lock:
+            self._pending[pool] -= 1
+
+    def coalesce(self, key, payload, deadline=DEFAULT_DEADLINE, retries=2, pool=DEFAULT_POOL):
+        """submit(), unless a call with this key is in flight: then (its Future, True)
+
+        Returns (future, shared). Only the caller with shared=False should do
+        the one-off work around the answer (saving it, caching it).
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counts['coalesced'] += 1
+                return future, True
+            # Registered before the call starts, so callers arriving meanwhile find it
+            future = self._in_flight[key] = Future()
+        future.add_done_callback(lambda f: self._land(key, f))
+        try:
+            call = self.submit(payload, deadline=deadline, retries=retries, pool=pool)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        call.add_done_callback(lambda f: self._relay(f, future))
+        return future, False
+
+    @staticmethod
+    def _relay(call, future):
+        if call.cancelled():
+            future.cancel()  # The client was closed before the call ran
+        elif call.exception() is not None:
+            future.set_exception(call.exception())
+        else:
+            future.set_result(call.result())
+
+    def _land(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def generate(self, payload, deadline=DEFAULT_DEADLINE, retries=2, wait=None, on_late_result=None, key=None,
+                 pool=DEFAULT_POOL):
+        """Blocking call: response JSON, or LLMError after at most `wait` (default: deadline) seconds
+
+        With wait < deadline the caller gets DeadlineExceeded early while the
+        retries go on in the background; if they still succeed,
+        on_late_result(response_json) is called on a client thread. With a key,
+        identical concurrent calls share one request (see coalesce()).
+        """
+        if key is None:
+            future = self.submit(payload, deadline=deadline, retries=retries, pool=pool)
+        else:
+            future, shared = self.coalesce(key, payload, deadline=deadline, retries=retries, pool=pool)
+            if shared:
+                on_late_result = None  # The caller that started the call handles it
+        return self.wait(future, deadline if wait is None else wait, on_late_result)
+
+    def wait(self, future, wait, on_late_result=None):
+        """Result of a submitted call, or DeadlineExceeded after `wait` seconds"""
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            self._count('abandoned')
+            if on_late_result is not None:
+                future.add_done_callback(lambda f: self._deliver_late(f, on_late_result))
+            raise DeadlineExceeded(f'No answer from Gemini within {wait}s')
+
+    def _deliver_late(self, future, callback):
+        if future.exception() is not None:
+            return
+        try:
+            callback(future.result())
+        except Exception as e:
+            self._log('warning', 'Handling a late Gemini answer failed: %s', e)
+
+    def _settled(self, fn, *args):
+        """fn(*args), making sure the breaker hears how a call it let through ended
+
+        LLMErrors are recorded where they are raised; anything else (a bug, a
+        failing on_text callback) abandons the call.
+        """
+        try:
+            return fn(*args)
+        except LLMError:
+            raise
+        except Exception:
+            self.breaker.record_abandoned()
+            self._count('failed')
+            raise
+
+    def _call(self, payload, deadline_at, retries):
+        return self._settled(self._attempts, payload, deadline_at, retries)
+
+    def _attempts(self, payload, deadline_at, retries):
+        """Attempts with backoff until success, a non-retryable error, the deadline or an open breaker"""
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                # Only reached right after allow(): nothing was sent since
+                self.breaker.record_abandoned()
+                self._count('deadline_exceeded')
+                self._count('failed')
+                raise DeadlineExceeded('Gemini call deadline exceeded')
+            self._count('attempts')
+            started = time.monotonic()
+            try:
+                response = self.session.post(self.url(), json=payload, timeout=remaining,
+                                             headers={'x-goog-api-key': self.api_key})
+                status = response.status_code
+                error = None if status == 200 else LLMError(f"HTTP {status}: {response.text[:200]}", status)
+            except requests.RequestException as e:
+                status = None
+                error = LLMError(f'{type(e).__name__}: {e}')
+
+            if error is None:
+                try:
+                    result = response.json()
+                except ValueError:
+                    error = LLMError('Gemini returned invalid JSON', status)
+                else:
+                    self.breaker.record_success()
+                    with self._lock:
+                        self._latencies.append(time.monotonic() - started)
+                        self._counts['succeeded'] += 1
+                    return result
+
+            retryable = status is None or status in RETRYABLE_STATUS
+            # Only availability problems count against Gemini's health; a 400 means it is up
+            if retryable:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._log('warning', 'Gemini attempt %d failed: %s', attempt + 1, error)
+
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            if (not retryable or attempt >= retries
+                    or time.monotonic() + delay >= deadline_at or not self._wait_for_breaker(delay)):
+                self._count('failed')
+                raise error
+            attempt += 1
+            self._count('retries')
+
+    def stream(self, payload, deadline=DEFAULT_DEADLINE, on_text=None):
+        """Blocking streamGenerateContent call: on_text(chunk) per text chunk, returns the whole text
+
+        Runs on the caller's thread. Fails with LLMError like generate(), but is
+        never retried: the caller may already have passed chunks on.
+        """
+        self._count('calls')
+        self._count('streams')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError('Gemini circuit breaker is open')
+        return self._settled(self._stream, payload, deadline, on_text)
+
+    def _stream(self, payload, deadline, on_text):
+        self._count('attempts')
+        deadline_at = time.monotonic() + deadline
+        started = time.monotonic()
+        pieces = []
+        try:
+            response = self.session.post(self.url('streamGenerateContent') + '?alt=sse', json=payload,
+                                         timeout=deadline, headers={'x-goog-api-key': self.api_key}, stream=True)
+            with response:
+                if response.status_code != 200:
+                    error = LLMError(f"HTTP {response.status_code}: {response.text[:200]}", response.status_code)
+                    self._stream_failed(error, response.status_code in RETRYABLE_STATUS)
+                for line in response.iter_lines(decode_unicode=True):
+                    if time.monotonic() > deadline_at:
+                        self._count('deadline_exceeded')
+                        self._stream_failed(DeadlineExceeded('Gemini stream deadline exceeded'), True)
+                    if not line or not line.startswith('data:'):
+                        continue
+                    try:
+                        piece = self.text(json.loads(line[5:]))
+                    except (ValueError, LLMError):
+                        continue  # e.g. the last event only carries finishReason / usage
+                    if not pieces:
+                        with self._lock:
+                            self._first_chunks.append(time.monotonic() - started)
+                    pieces.append(piece)
+                    if on_text is not None:
+                        on_text(piece)
+        except requests.RequestException as e:
+            self._stream_failed(LLMError(f'{type(e).__name__}: {e}'), True)
+        if not pieces:
+            self._stream_failed(LLMError('Gemini stream ended without text'), False)
+        self.breaker.record_success()
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+            self._counts['succeeded'] += 1
+        return ''.join(pieces)
+
+    def _stream_failed(self, error, retryable):
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._count('failed')
+        self._log('warning', 'Gemini stream failed: %s', error)
+        raise error
+
+    def _wait_for_breaker(self, delay):
+        """Back off, then check the breaker still lets us through"""
+        time.sleep(delay)
+        return self.breaker.allow()
+
+    @staticmethod
+    def text(result):
+        """Text of the first candidate in a generateContent response"""
+        try:
+            return result['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError('Unexpected Gemini response shape')
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            first_chunks = sorted(self._first_chunks)
+            counts = dict(self._counts)
+            in_flight = len(self._in_flight)
+            pools = {name: {'workers': self._pool_sizes[name], 'pending': pending}
+                     for name, pending in self._pending.items()}
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+        return {
+            'configured': bool(self.api_key),
+            'model': self.model,
+            'base_url': self.base_url,
+            'circuit': self.breaker.stats(),
+            'counts': counts,
+            'in_flight': in_flight,
+            'pools': pools,
+            'latency_ms': {
+                'samples': len(latencies),
+                'mean': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                'p50': pct(0.5),
+                'p95': pct(0.95),
+                'max': round(latencies[-1] * 1000, 1) if latencies else None,
+            },
+            'stream_first_chunk_ms': {
+                'samples': len(first_chunks),
+                'p50': round(first_chunks[len(first_chunks) // 2] * 1000, 1) if first_chunks else None,
+                'p95': round(first_chunks[min(len(first_chunks) - 1, int(len(first_chunks) * 0.95))] * 1000, 1)
+                if first_chunks else None,
+            },
+        }
+
+    def close(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,107 @@
+"""
+Load test for the camera stream server
+Opens many concurrent /video_feed viewers and reports per-viewer frame rates,
+rejections (503) and what the server says about its streams in /health
+
+Run camera_stream_server.py first (a recorded clip works, no camera needed):
+    CAMERA_SOURCES="door=recording.mp4" python camera_stream_server.py
+    python load_test_stream.py --viewers 50 --duration 20
+    python load_test_stream.py --viewers 50 --slow 5 --query "w=320&q=50&fps=5"
+"""
+
+import argparse
+import threading
+import time
+
+import requests
+
+BOUNDARY = b'--frame'
+
+
+def viewer(index, url, duration, slow, results):
+    """One client: read the MJPEG stream for `duration` seconds and count frames"""
+    result = {'index': index, 'status': None, 'frames': 0, 'bytes': 0, 'error': None,
+              'slow': slow, 'ended_early': False}
+    results[index] = result
+    try:
+        with requests.get(url, stream=True, timeout=(5, 30)) as response:
+            result['status'] = response.status_code
+            if response.status_code != 200:
+                return
+            if slow:
+                # A laggard: stop reading and let the server's buffers fill up
+                time.sleep(duration)
+                return
+            deadline = time.time() + duration
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                result['bytes'] += len(chunk)
+                result['frames'] += chunk.count(BOUNDARY)
+                if time.time() >= deadline:
+                    break
+            else:
+                result['ended_early'] = True
+    except Exception as e:
+        result['error'] = str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent viewer load test for camera_stream_server.py')
+    parser.add_argument('--server', default='http://127.0.0.1:5001')
+    parser.add_argument('--path', default='/video_feed')
+    parser.add_argument('--query', default='', help='Extra query string, e.g. "w=320&fps=5"')
+    parser.add_argument('--viewers', type=int, default=50)
+    parser.add_argument('--slow', type=int, default=0, help='How many of the viewers never read (laggards)')
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds each viewer stays connected')
+    parser.add_argument('--ramp', type=float, default=2.0, help='Seconds over which viewers connect')
+    args = parser.parse_args()
+
+    url = f"{args.server}{args.path}" + (f"?{args.query}" if args.query else '')
+    print(f"🚦 {args.viewers} viewers ({args.slow} slow) -> {url} for {args.duration:.0f}s")
+
+    results = {}
+    threads = []
+    for i in range(args.viewers):
+        t = threading.Thread(target=viewer, args=(i, url, args.duration, i < args.slow, results), daemon=True)
+        threads.append(t)
+        t.start()
+        time.sleep(args.ramp / max(args.viewers, 1))
+
+    # Sample the server's own view while everyone is connected
+    time.sleep(min(args.duration / 2, 5))
+    try:
+        health = requests.get(f"{args.server}/health", timeout=5).json()
+        print(f"🩺 Server streams mid-test: {health.get('streams')}")
+    except Exception as e:
+        print(f"⚠️  /health failed during test: {e}")
+
+    for t in threads:
+        t.join(args.duration + 40)
+
+    fast = [r for r in results.values() if not r['slow']]
+    ok = [r for r in fast if r['status'] == 200]
+    rejected = [r for r in results.values() if r['status'] == 503]
+    errors = [r for r in results.values() if r['error']]
+    fps = sorted(r['frames'] / args.duration for r in ok)
+
+    print("\n" + "=" * 60)
+    print(f"Connected: {len(ok)} | Rejected (503): {len(rejected)} | Errors: {len(errors)}")
+    if fps:
+        print(f"Per-viewer fps: min {fps[0]:.1f} | median {fps[len(fps) // 2]:.1f} | max {fps[-1]:.1f}")
+        total_mb = sum(r['bytes'] for r in ok) / 1e6
+        print(f"Total received: {total_mb:.1f} MB ({total_mb * 8 / args.duration:.1f} Mbit/s)")
+    ended = [r for r in ok if r['ended_early']]
+    if ended:
+        print(f"Streams closed by server early: {len(ended)}")
+    for r in errors[:5]:
+        print(f"  viewer {r['index']}: {r['error']}")
+
+    try:
+        health = requests.get(f"{args.server}/health", timeout=5).json()
+        print(f"🩺 Server streams after test: {health.get('streams')}")
+    except Exception as e:
+        print(f"⚠️  /health failed after test: {e}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+MJPEG Broadcaster for the Smart Fridge stream server
+The detection loop publishes each new frame once; it is JPEG-encoded exactly
+once per rendition and tagged with a sequence number. Every connected
+/video_feed client blocks on a Condition until a newer frame exists, so adding
+viewers costs no extra encoding and idle clients use no CPU.
+
+Renditions: clients may ask for a smaller width and/or lower JPEG quality
+(e.g. phones on Wi-Fi, dashboard thumbnails), and with or without burned-in
+overlays. Requests are snapped to a small fixed set so the number of encodes
+stays bounded, and a rendition is only encoded while at least one client is
+subscribed to it. Per-client FPS caps drop intermediate frames instead of
+queueing them.
+
+The clean full-size frame (DEFAULT_RENDITION) is always kept for snapshots.
+Overlays are drawn only when an overlay rendition has subscribers; other
+clients can render them from the per-frame metadata (see /detections).
+
+RAW_RENDITION carries the camera's own JPEG bytes (publish_raw), at the
+camera's frame rate and without any decode or re-encode.
+"""
+
+import json
+import threading
+import time
+
+import cv2
+
+JPEG_QUALITY = 80
+CLIENT_WAIT_TIMEOUT = 5.0  # Seconds a client waits before re-checking for shutdown
+
+# Allowed renditions (0 = full width). Requests snap to these.
+RENDITION_WIDTHS = (320, 640, 0)
+RENDITION_QUALITIES = (50, 70, 85)
+MAX_CLIENT_FPS = 30
+
+
+def multipart_chunk(jpeg):
+    """Wrap one JPEG in the multipart/x-mixed-replace framing used by /video_feed"""
+    return b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+def rendition_key(width=None, quality=None, overlay=False, raw=False):
+    """Snap a requested width/quality to an allowed (width, quality, overlay) rendition
+
+    width=None and quality=None keep full width and JPEG_QUALITY. raw=True
+    selects the camera's original JPEGs and ignores everything else.
+    """
+    if raw:
+        return ('raw', None, False)
+    snapped_width = 0
+    if width:
+        snapped_width = next((w for w in RENDITION_WIDTHS if w and w >= width), 0)
+    snapped_quality = None
+    if quality:
+        snapped_quality = min(RENDITION_QUALITIES, key=lambda q: abs(q - quality))
+    return (snapped_width, snapped_quality, bool(overlay))
+
+
+DEFAULT_RENDITION = rendition_key()
+RAW_RENDITION = rendition_key(raw=True)
+
+
+class _Rendition:
+    """Latest JPEG for one (width, quality, overlay) combination and its subscriber count"""
+
+    __slots__ = ('width', 'quality', 'overlay', 'subscribers', 'jpeg', 'seq')
+
+    def __init__(self, width, quality, overlay):
+        self.width = width
+        self.quality = quality
+        self.overlay = overlay
+        self.subscribers = 0
+        self.jpeg = None
+        self.seq = 0
+
+
+class FrameBroadcaster:
+    """Latest encoded frame per rendition plus a Condition that wakes waiting clients"""
+
+    def __init__(self, jpeg_quality=JPEG_QUALITY):
+        self.jpeg_quality = jpeg_quality
+        self._condition = threading.Condition()
+        self._renditions = {
+            DEFAULT_RENDITION: _Rendition(*DEFAULT_RENDITION),
+            RAW_RENDITION: _Rendition(*RAW_RENDITION),
+        }
+        self._seq = 0
+        self._metadata = None
+        self._closed = False
+        self.clients = 0
+        self.metadata_clients = 0
+        self.encoded_frames = 0
+        self.overlay_frames = 0
+        self.raw_frames = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def wants_overlay(self):
+        """True while at least one client is subscribed to burned-in overlays"""
+        with self._condition:
+            return any(r.overlay and r.subscribers > 0 for r in self._renditions.values())
+
+    def _encode(self, img, rendition):
+        if rendition.width and img.shape[1] > rendition.width:
+            height = int(img.shape[0] * rendition.width / img.shape[1])
+            img = cv2.resize(img, (rendition.width, height), interpolation=cv2.INTER_AREA)
+        quality = rendition.quality or self.jpeg_quality
+        flag, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return encoded.tobytes() if flag else None
+
+    def publish(self, img, jpeg=None, annotate=None, metadata=None):
+        """Encode a frame once per active rendition and wake waiting clients
+
+        jpeg      - already-encoded bytes of img, used as-is for the default rendition
+        annotate  - annotate(img) draws overlays in place; only called when an
+                    overlay rendition has subscribers (after clean ones are encoded)
+        metadata  - JSON-serializable dict describing this frame (see /detections)
+
+        Returns the new sequence number.
+        """
+        with self._condition:
+            active = [r for key, r in self._renditions.items()
+                      if key == DEFAULT_RENDITION or (r.subscribers > 0 and key != RAW_RENDITION)]
+        clean = [r for r in active if not r.overlay]
+        annotated = [r for r in active if r.overlay]
+
+        # Encode outside the lock so clients are never blocked on imencode
+        encoded = []
+        for rendition in clean:
+            if rendition.width == 0 and rendition.quality is None and jpeg is not None:
+                data = jpeg
+            elif img is None:
+                continue
+            else:
+                data = self._encode(img, rendition)
+            if data is not None:
+                encoded.append((rendition, data))
+
+        drew_overlay = False
+        if annotated and img is not None:
+            if annotate:
+                annotate(img)  # Clean renditions are already encoded, so draw in place
+                drew_overlay = True
+            for rendition in annotated:
+                data = self._encode(img, rendition)
+                if data is not None:
+                    encoded.append((rendition, data))
+
+        with self._condition:
+            self._seq += 1
+            for rendition, data in encoded:
+                rendition.jpeg = data
+                rendition.seq = self._seq
+            if metadata is not None:
+                self._metadata = dict(metadata, seq=self._seq)
+            self.encoded_frames += len(encoded)
+            self.overlay_frames += int(drew_overlay)
+            self._condition.notify_all()
+            return self._seq
+
+    def publish_jpeg(self, jpeg):
+        """Publish already-encoded JPEG bytes as the default rendition"""
+        return self.publish(None, jpeg=jpeg)
+
+    def publish_raw(self, jpeg):
+        """Forward one of the camera's own JPEGs to raw subscribers as-is"""
+        with self._condition:
+            rendition = self._renditions[RAW_RENDITION]
+            self._seq += 1
+            rendition.jpeg = jpeg
+            rendition.seq = self._seq
+            self.raw_frames += 1
+            if rendition.subscribers:
+                self._condition.notify_all()
+            return self._seq
+
+    def latest(self, key=DEFAULT_RENDITION):
+        """(seq, jpeg) of the newest frame; jpeg is None before the first frame"""
+        with self._condition:
+            rendition = self._renditions.get(key)
+            if rendition is None:
+                return 0, None
+            return rendition.seq, rendition.jpeg
+
+    def latest_metadata(self):
+        with self._condition:
+            return self._metadata
+
+    def wait_for(self, after_seq, key=DEFAULT_RENDITION, timeout=CLIENT_WAIT_TIMEOUT):
+        """Block until a frame newer than after_seq exists for this rendition
+
+        Returns (seq, jpeg), or (after_seq, None) on timeout or shutdown.
+        """
+        with self._condition:
+            rendition = self._renditions[key]
+            self._condition.wait_for(lambda: rendition.seq > after_seq or self._closed, timeout)
+            if self._closed or rendition.seq <= after_seq:
+                return after_seq, None
+            return rendition.seq, rendition.jpeg
+
+    def wait_for_metadata(self, after_seq, timeout=CLIENT_WAIT_TIMEOUT):
+        """Like wait_for, for the per-frame detection metadata"""
+        def ready():
+            return self._closed or (self._metadata is not None and self._metadata['seq'] > after_seq)
+
+        with self._condition:
+            self._condition.wait_for(ready, timeout)
+            if self._closed or self._metadata is None or self._metadata['seq'] <= after_seq:
+                return after_seq, None
+            return self._metadata['seq'], self._metadata
+
+    def close(self):
+        """Wake every client so their generators can finish"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _subscribe(self, key):
+        with self._condition:
+            rendition = self._renditions.get(key)
+            if rendition is None:
+                rendition = self._renditions[key] = _Rendition(*key)
+            rendition.subscribers += 1
+            self.clients += 1
+
+    def _unsubscribe(self, key):
+        with self._condition:
+            rendition = self._renditions[key]
+            rendition.subscribers -= 1
+            self.clients -= 1
+            if rendition.subscribers == 0 and key not in (DEFAULT_RENDITION, RAW_RENDITION):
+                # Nobody is watching: stop encoding and free the cached frame
+                del self._renditions[key]
+
+    def stream(self, width=None, quality=None, max_fps=None, overlay=False, raw=False):
+        """Generator of multipart chunks for one client
+
+        Slow clients and FPS-capped clients always get the newest frame;
+        anything published in between is dropped, never queued.
+        """
+        key = rendition_key(width, quality, overlay, raw)
+        interval = 1.0 / min(max_fps, MAX_CLIENT_FPS) if max_fps else 0
+        self._subscribe(key)
+        try:
+            seq = 0
+            next_due = 0.0
+            while not self._closed:
+                if interval:
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                seq, jpeg = self.wait_for(seq, key)
+                if jpeg is None:
+                    continue
+                next_due = time.monotonic() + interval
+                yield multipart_chunk(jpeg)
+        finally:
+            self._unsubscribe(key)
+
+    def metadata_stream(self, fmt='sse'):
+        """Generator of per-frame detection metadata as SSE events or NDJSON lines"""
+        with self._condition:
+            self.metadata_clients += 1
+        try:
+            seq = 0
+            while not self._closed:
+                seq, metadata = self.wait_for_metadata(seq)
+                if metadata is None:
+                    if fmt == 'sse':
+                        yield ': keep-alive\n\n'  # Lets the server notice closed connections
+                    continue
+                payload = json.dumps(metadata, separators=(',', ':'))
+                if fmt == 'ndjson':
+                    yield payload + '\n'
+                else:
+                    yield f"id: {seq}\nevent: detections\ndata: {payload}\n\n"
+        finally:
+            with self._condition:
+                self.metadata_clients -= 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                'seq': self._seq,
+                'clients': self.clients,
+                'metadata_clients': self.metadata_clients,
+                'encoded_frames': self.encoded_frames,
+                'overlay_frames': self.overlay_frames,
+                'raw_frames': self.raw_frames,
+                'renditions': {
+                    ('raw' if key == RAW_RENDITION else
+                     f"{r.width or 'full'}@{r.quality or self.jpeg_quality}{'+overlay' if r.overlay else ''}"): r.subscribers
+                    for key, r in self._renditions.items()
+                },
+            }
@@ -0,0 +1,210 @@
+"""
+Small response caches for the Smart Fridge backend
+ResponseCache - in-process LRU + TTL, thread-safe, with hit/miss counters.
+                Used to answer repeated voice questions without calling Gemini.
+DiskCache     - same idea, but one JSON file per entry so it survives
+                restarts and is shared by every worker. Used for recipes.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_SPACES = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = '?!.,;:।॥ '
+
+
+def normalize_query(text):
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    text = unicodedata.normalize('NFC', text or '').casefold()
+    text = _SPACES.sub(' ', text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def fingerprint(*parts):
+    """Short stable hash of some text parts (e.g. the inventory as sent to the model)"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:16]
+
+
+class ResponseCache:
+    """Least-recently-used cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Cached value or None; counts a hit or a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def bypass(self):
+        """Count a request that skipped the cache on purpose"""
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        """Drop everything (e.g. after the inventory changed)"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class DiskCache:
+    """JSON-file-per-key cache with a wall-clock TTL and a cap on the number of files
+
+    Keys should already be hashes (see fingerprint()); values must be
+    JSON-serializable. Writes are atomic (temp file + rename).
+    """
+
+    def __init__(self, directory, ttl=86400, max_entries=500):
+        self.directory = str(directory)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.expirations = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """(value, stored_at) or None; counts a hit or a miss"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            entry = None
+        if entry is not None and entry['expires_at'] <= time.time():
+            self._remove(path)
+            with self._lock:
+                self.expirations += 1
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry['value'], entry['stored_at']
+
+    def put(self, key, value):
+        now = time.time()
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'stored_at': now, 'expires_at': now + self.ttl, 'value': value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._prune()
+
+    def bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith('.json')]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                pass
+        return entries
+
+    def _prune(self):
+        """Delete the oldest entries beyond max_entries"""
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        for _, path in sorted(entries)[:len(entries) - self.max_entries]:
+            self._remove(path)
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        for _, path in self._entries():
+            self._remove(path)
+
+    def stats(self):
+        entries = len(self._entries())
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'directory': self.directory,
+            }
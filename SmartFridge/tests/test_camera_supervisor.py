@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import camera_supervisor
+from camera_supervisor import CameraSupervisor
+
+
+@pytest.fixture
+def make_supervisor(tmp_path, monkeypatch):
+    """Supervisors ("backend workers") sharing one pidfile, without monitor threads"""
+    monkeypatch.setattr(CameraSupervisor, '_ensure_monitor', lambda self: None)
+    monkeypatch.setattr(camera_supervisor.random, 'uniform', lambda low, high: 1.0)
+    created = []
+
+    def make(code='import time; time.sleep(30)'):
+        script = tmp_path / f"server{len(created)}.py"
+        script.write_text(code)
+        # Nothing listens here: /health never answers, like a server still loading its model
+        supervisor = CameraSupervisor(script, tmp_path / 'server.log', tmp_path / 'server.pid',
+                                      health_url='http://127.0.0.1:9/health')
+        created.append(supervisor)
+        return supervisor
+
+    yield make
+    for supervisor in created:
+        with supervisor._lock:
+            process = supervisor._process
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_second_worker_sees_a_server_that_is_still_loading(make_supervisor):
+    first, second = make_supervisor(), make_supervisor()
+    started, pid = first.start()
+    assert started
+    assert second.start() == (False, pid)  # No duplicate while /health is not up yet
+    assert json.load(open(first.pid_path))['pid'] == pid
+    assert second.status()['state'] == 'starting'
+
+    # The other worker can stop it too; the owner then does not restart it
+    assert second.stop() == pid
+    first._process.wait(5)
+    first._check_process()
+    assert first._restart_at is None
+
+
+def test_stale_pidfile_is_replaced(make_supervisor):
+    supervisor = make_supervisor()
+    with open(supervisor.pid_path, 'w') as f:
+        json.dump({'pid': dead_pid(), 'started_at': time.time()}, f)
+    started, pid = supervisor.start()
+    assert started and pid == supervisor._process.pid
+
+
+def test_old_pidfile_needs_health(make_supervisor):
+    supervisor = make_supervisor()
+    # A live PID (ours) but started long ago and not answering /health: a reused PID
+    with open(supervisor.pid_path, 'w') as f:
+        json.dump({'pid': os.getpid(),
+                   'started_at': time.time() - camera_supervisor.READY_TIMEOUT - 1}, f)
+    started, pid = supervisor.start()
+    assert started and pid != os.getpid()
+
+
+def test_crashed_server_restarts_with_growing_backoff(make_supervisor, monkeypatch):
+    monkeypatch.setattr(camera_supervisor, 'RESTART_BASE_SECONDS', 1)
+    monkeypatch.setattr(camera_supervisor, 'RESTART_MAX_SECONDS', 4)
+    supervisor = make_supervisor('raise SystemExit(3)')
+    supervisor.start()
+
+    delays = []
+    for restart in range(1, 5):
+        supervisor._process.wait(5)
+        before = time.monotonic()
+        supervisor._check_process()
+        assert supervisor.last_exit_code == 3
+        assert supervisor.status()['state'] == 'restarting'
+        delays.append(round(supervisor._restart_at - before))
+        supervisor._restart_at = time.monotonic()  # Skip the wait
+        supervisor._check_process()
+        assert supervisor.restarts == restart
+    assert delays == [1, 2, 4, 4]  # Doubles, capped at RESTART_MAX_SECONDS
+
+    # A new start() begins the backoff again
+    supervisor._process.wait(5)
+    supervisor._check_process()
+    supervisor.stop()
+    supervisor.start()
+    assert supervisor._restart_attempts == 0
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from clip_recorder import ClipRecorder, jpeg_size, write_mjpeg_avi
+
+
+def encode(width, height, shade):
+    img = np.full((height, width, 3), shade, np.uint8)
+    return cv2.imencode('.jpg', img)[1].tobytes()
+
+
+def read_back(path):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, img = capture.read()
+        if not ok:
+            break
+        frames.append(img)
+    capture.release()
+    return frames
+
+
+def test_jpeg_size():
+    assert jpeg_size(encode(64, 48, 0)) == (64, 48)
+    assert jpeg_size(b'not a jpeg') is None
+    assert jpeg_size(None) is None
+
+
+def test_write_mjpeg_avi_plays_back(tmp_path):
+    jpegs = [encode(64, 48, shade) for shade in (0, 100, 200)]
+    path = str(tmp_path / 'clip.avi')
+    write_mjpeg_avi(path, jpegs, 10.0, 64, 48)
+
+    frames = read_back(path)
+    assert len(frames) == 3
+    assert frames[0].shape == (48, 64, 3)
+    assert abs(int(frames[2].mean()) - 200) < 5
+
+
+def test_clip_skips_missing_frames_and_resizes(tmp_path):
+    recorder = ClipRecorder('cam', str(tmp_path), pre_roll_seconds=1, post_roll_seconds=1).start()
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    recorder.add_frame(encode(64, 48, 50), start)
+    recorder.trigger('added', 'milk', start)
+    recorder.add_frame(None, start + timedelta(seconds=0.2))
+    recorder.add_frame(encode(32, 24, 50), start + timedelta(seconds=0.4))
+    recorder.add_frame(b'garbage', start + timedelta(seconds=0.6))
+    recorder.add_frame(encode(64, 48, 50), start + timedelta(seconds=1.2))
+    recorder.stop()
+
+    assert recorder.stats()['clips_written'] == 1
+    (avi,) = tmp_path.glob('*.avi')
+    frames = read_back(str(avi))
+    assert len(frames) == 3
+    assert all(frame.shape == (48, 64, 3) for frame in frames)
+    meta = json.loads(avi.with_suffix('.json').read_text())
+    assert meta['frames'] == 3
+    assert meta['events'][0]['label'] == 'milk'
@@ -0,0 +1,102 @@
+import pytest
+
+from intent_matcher import MIN_CONFIDENCE, IntentMatcher, VoicePathStats
+
+matcher = IntentMatcher()
+
+# (language, query, expected fields) - all recognized locally
+COMMANDS = [
+    ('en', 'add 2 kg fish to the freezer', {'intent': 'add', 'label': 'fish', 'quantity': '2 kg', 'location': 'Freezer'}),
+    ('en', 'add milk', {'intent': 'add', 'label': 'milk', 'quantity': '1 unit', 'location': 'Fridge'}),
+    ('en', 'add 2 tomatoes', {'intent': 'add', 'label': 'tomato', 'quantity': '2 units'}),
+    ('en', 'store 2 bottles of water', {'intent': 'add', 'label': 'water', 'quantity': '2 bottles'}),
+    ('en', 'add 3 packets of noodles', {'intent': 'add', 'label': 'noodle', 'quantity': '3 packets'}),
+    ('en', 'put the cheese in the door', {'intent': 'add', 'label': 'cheese', 'location': 'Door'}),
+    ('en', 'remove mutton', {'intent': 'remove', 'label': 'mutton'}),
+    ('en', 'take out the chicken', {'intent': 'remove', 'label': 'chicken'}),
+    ('en', 'update milk quantity to 2 liters', {'intent': 'update', 'label': 'milk', 'field': 'quantity', 'value': '2 liters'}),
+    ('en', 'reduce eggs by 2', {'intent': 'update', 'label': 'egg', 'field': 'quantity', 'value': 'reduce:2'}),
+    ('en', 'move yogurt to the freezer', {'intent': 'update', 'label': 'yogurt', 'field': 'location', 'value': 'Freezer'}),
+    ('en', 'move chicken from the fridge to the freezer',
+     {'intent': 'update', 'label': 'chicken', 'field': 'location', 'value': 'Freezer'}),
+    ('en', 'remove 2 eggs', {'intent': 'update', 'label': 'egg', 'field': 'quantity', 'value': 'reduce:2'}),
+    ('en', 'remove one egg', {'intent': 'update', 'label': 'egg', 'field': 'quantity', 'value': 'reduce:1'}),
+    ('en', 'remove 2 pieces of chicken', {'intent': 'update', 'label': 'chicken', 'value': 'reduce:2'}),
+    ('en', 'set expiry date of chicken 25th November 2025',
+     {'intent': 'update', 'label': 'chicken', 'field': 'expiry_date', 'value': '2025-11-25'}),
+    ('te', 'ఫ్రీజర్‌లో 5 కిలోల చేపను పెట్టండి', {'intent': 'add', 'label': 'fish', 'quantity': '5 kg', 'location': 'Freezer'}),
+    ('hi', 'मटन को निकालें', {'intent': 'remove', 'label': 'mutton'}),
+]
+
+# Must never be acted on without the model: they would write or delete rows
+NOT_COMMANDS = [
+    'put on some music',
+    'keep quiet',
+    'keep the fridge door closed',
+    'set an alarm for 7',
+    'delete everything',
+    'take out the trash',
+    'remove the expired items',
+    'put the milk in the trash',
+    # Only whole counts can be taken off a row; "1 kg" of "2 kg" needs the model
+    'remove 1 kg chicken',
+    'remove 1.5 eggs',
+    'reduce chicken by 500 g',
+    # "from" names where the item was, not where it goes
+    'add 2 apples from the freezer',
+    'move chicken from the freezer',
+    'add milk and eggs',
+    'add a bag of frozen peas and 6 eggs',
+    "what's in my fridge?",
+    'how many eggs do I have',
+]
+
+
+@pytest.mark.parametrize('language, query, expected', COMMANDS)
+def test_commands_are_recognized(language, query, expected):
+    result = matcher.classify(query, language)
+    assert result['confidence'] >= MIN_CONFIDENCE, result['reason']
+    for field, value in expected.items():
+        assert result[field] == value, field
+
+
+@pytest.mark.parametrize('query', NOT_COMMANDS)
+def test_ambiguous_requests_go_to_the_model(query):
+    assert matcher.classify(query, 'en')['confidence'] < MIN_CONFIDENCE
+
+
+def test_unknown_item_needs_an_amount_or_place():
+    assert matcher.classify('add yogurt')['confidence'] < MIN_CONFIDENCE
+    assert matcher.classify('add 500 g yogurt')['confidence'] >= MIN_CONFIDENCE
+    assert matcher.classify('add yogurt to the freezer')['confidence'] >= MIN_CONFIDENCE
+    # A bare number is not a unit: "set an alarm for 7"
+    assert matcher.classify('add 7 yogurt')['confidence'] < MIN_CONFIDENCE
+
+
+def test_remove_with_an_amount_never_deletes_the_row():
+    for query in ('remove 2 eggs', 'remove 1 kg chicken', 'remove three apples'):
+        result = matcher.classify(query)
+        assert result['intent'] != 'remove' or result['confidence'] < MIN_CONFIDENCE, query
+    assert matcher.classify('remove 1 kg chicken')['reason'] == 'reduction by a measured amount'
+    assert matcher.classify('remove chicken')['intent'] == 'remove'
+
+
+def test_source_location_is_not_a_destination():
+    assert matcher.classify('add 2 apples from the freezer')['location'] != 'Freezer'
+    assert matcher.classify('add 2 apples to the freezer')['location'] == 'Freezer'
+
+
+def test_non_english_confirmation():
+    result = matcher.classify('मटन को निकालें', 'hi')
+    assert result['reply'] and result['not_found_reply']
+
+
+def test_voice_path_stats():
+    stats = VoicePathStats()
+    stats.record('local', 0.001)
+    stats.record('llm', 0.5)
+    stats.record_first_byte(0.2)
+    summary = stats.stats()
+    assert summary['requests'] == 2
+    assert summary['local_fraction'] == 0.5
+    assert summary['stream_ttfb_ms']['samples'] == 1
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, QueueFull
+
+
+def wait_for(queue, job_id, status, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job and job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never became {status}")
+
+
+def test_submit_beyond_max_queued_raises_queue_full():
+    gate = threading.Event()
+    queue = JobQueue(max_workers=1, max_queued=2)
+    running = queue.submit(lambda: (gate.wait(5), True))
+    wait_for(queue, running['id'], 'running')
+    waiting = [queue.submit(lambda: ('ok', True)) for _ in range(2)]
+    with pytest.raises(QueueFull):
+        queue.submit(lambda: ('ok', True))
+    assert queue.stats()['counts']['rejected'] == 1
+    assert queue.stats()['queued'] == 2
+
+    gate.set()
+    for job in waiting:
+        assert wait_for(queue, job['id'], 'done')['result'] == 'ok'
+    # Room again once the queue drained
+    assert queue.submit(lambda: ('ok', True))['status'] == 'queued'
+    queue.close()
+
+
+def test_finished_jobs_are_evicted_after_ttl():
+    queue = JobQueue(ttl=0.2)
+    done = queue.submit(lambda x: (x * 2, True), x=21)
+    failed = queue.submit(lambda: (None, False))
+    assert wait_for(queue, done['id'], 'done')['result'] == 42
+    wait_for(queue, failed['id'], 'failed')
+    time.sleep(0.3)
+    assert queue.get(done['id']) is None and queue.get(failed['id']) is None
+    stats = queue.stats()
+    assert stats['counts']['evicted'] == 2 and stats['stored'] == 0
+    queue.close()
+
+
+def test_running_jobs_are_not_evicted():
+    gate = threading.Event()
+    queue = JobQueue(ttl=0)
+    job = queue.submit(lambda: (gate.wait(5), True))
+    wait_for(queue, job['id'], 'running')
+    time.sleep(0.05)
+    assert queue.get(job['id'])['status'] == 'running'
+    gate.set()
+    queue.close()
+
+
+def test_exceptions_mark_the_job_failed():
+    def boom():
+        raise RuntimeError('no ingredients')
+
+    queue = JobQueue()
+    job = wait_for(queue, queue.submit(boom)['id'], 'failed')
+    assert job['error'] == 'no ingredients'
+    queue.close()
+
+
+def test_watch_follows_the_job_to_the_end():
+    gate = threading.Event()
+    queue = JobQueue(max_workers=1)
+    job = queue.submit(lambda: (gate.wait(5) and 'recipes', True))
+    updates = queue.watch(job['id'], timeout=5, keepalive=0.05)
+    statuses = []
+    for snapshot in updates:
+        if snapshot is None:
+            gate.set()  # Keep-alive tick while running
+            continue
+        statuses.append(snapshot['status'])
+    assert statuses[-1] == 'done'
+    assert statuses == sorted(set(statuses), key=statuses.index)  # No repeats
+    queue.close()
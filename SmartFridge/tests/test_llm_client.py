@@ -0,0 +1,227 @@
+import json
+import threading
+import time
+
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker, CircuitOpenError, DeadlineExceeded, GeminiClient, LLMError
+
+
+class SlowClient(GeminiClient):
+    """_call() sleeps instead of talking to Gemini"""
+
+    def __init__(self, seconds, **options):
+        super().__init__('test', **options)
+        self.seconds = seconds
+
+    def _call(self, payload, deadline_at, retries):
+        time.sleep(self.seconds)
+        return payload
+
+
+def test_batch_burst_does_not_starve_interactive_calls():
+    client = SlowClient(0.3, pools={'interactive': 1, 'batch': 2})
+    burst = [client.submit({'n': i}, pool='batch') for i in range(6)]
+    started = time.monotonic()
+    assert client.generate({'voice': 1}, pool='interactive') == {'voice': 1}
+    assert time.monotonic() - started < 0.5  # Not queued behind the 0.9 s of batch work
+    assert client.stats()['pools']['batch']['pending'] > 0
+    for future in burst:
+        future.result()
+    assert client.stats()['pools']['batch']['pending'] == 0
+    client.close()
+
+
+def test_unknown_pool():
+    client = SlowClient(0)
+    with pytest.raises(ValueError):
+        client.submit({}, pool='nope')
+    client.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_client.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.stats()['times_opened'] == 1
+
+
+def test_breaker_half_open_allows_one_trial_then_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()  # The trial call
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()  # Only one at a time
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.stats()['times_opened'] == 2
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
+
+
+def test_open_breaker_short_circuits_calls():
+    client = SlowClient(0, breaker=CircuitBreaker(failure_threshold=1))
+    client.breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        client.generate({})
+    assert client.stats()['counts']['short_circuited'] == 1
+    client.close()
+
+
+class GatedClient(GeminiClient):
+    """_call() blocks until released, then returns or raises what the test set"""
+
+    def __init__(self, **options):
+        super().__init__('test', **options)
+        self.release = threading.Event()
+        self.calls = 0
+        self.error = None
+
+    def _call(self, payload, deadline_at, retries):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {'answer': payload['n']}
+
+
+def test_coalesce_shares_one_call():
+    client = GatedClient()
+    first, shared_first = client.coalesce('key', {'n': 1})
+    second, shared_second = client.coalesce('key', {'n': 2})
+    other, shared_other = client.coalesce('other', {'n': 3})
+    assert (shared_first, shared_second, shared_other) == (False, True, False)
+    assert second is first and other is not first
+    client.release.set()
+    assert second.result(1) == {'answer': 1}
+    assert client.calls == 2
+    assert client.stats()['counts']['coalesced'] == 1
+    client.close()
+
+
+def test_coalesce_propagates_failure_and_forgets_the_key():
+    client = GatedClient()
+    client.error = LLMError('HTTP 503', 503)
+    first, _ = client.coalesce('key', {'n': 1})
+    second, shared = client.coalesce('key', {'n': 1})
+    assert shared
+    client.release.set()
+    for future in (first, second):
+        with pytest.raises(LLMError):
+            future.result(1)
+
+    # A finished call is not reused: the next caller starts a new one
+    client.error = None
+    third, shared = client.coalesce('key', {'n': 3})
+    assert not shared
+    assert third.result(1) == {'answer': 3}
+    assert client.stats()['in_flight'] == 0
+    client.close()
+
+
+def test_generate_with_key_waits_on_the_shared_call():
+    client = GatedClient()
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(client.generate({'n': 7}, key='k')))
+               for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.1)
+    client.release.set()
+    for waiter in waiters:
+        waiter.join(2)
+    assert results == [{'answer': 7}] * 3
+    assert client.calls == 1
+    client.close()
+
+
+def half_open_client(**options):
+    """Client whose breaker has just gone half-open (next call is the trial)"""
+    client = GeminiClient('test', breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0.05), **options)
+    client.breaker.record_failure()
+    time.sleep(0.06)
+    return client
+
+
+def test_trial_that_expires_in_the_queue_releases_the_breaker():
+    client = half_open_client(pools={'batch': 1})
+    client._executors['batch'].submit(time.sleep, 0.2)  # Keeps the only worker busy
+    trial = client.submit({}, deadline=0.05)
+    with pytest.raises(DeadlineExceeded):
+        trial.result(2)
+    assert client.breaker.state == 'open'
+    time.sleep(0.06)
+    assert client.breaker.allow()  # A new trial, not CircuitOpenError forever
+    client.close()
+
+
+def test_trial_that_crashes_releases_the_breaker():
+    client = half_open_client()
+
+    def broken_post(*args, **kwargs):
+        raise RuntimeError('not a requests error')
+
+    client.session.post = broken_post
+    with pytest.raises(RuntimeError):
+        client.generate({})
+    assert client.breaker.state == 'open'
+    time.sleep(0.06)
+    assert client.breaker.allow()
+    client.close()
+
+
+class FakeStreamResponse:
+    status_code = 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self, decode_unicode=False):
+        yield 'data: ' + json.dumps({'candidates': [{'content': {'parts': [{'text': 'hello'}]}}]})
+
+
+def test_stream_callback_error_releases_the_breaker():
+    client = half_open_client()
+    client.session.post = lambda *args, **kwargs: FakeStreamResponse()
+
+    def on_text(piece):
+        raise BrokenPipeError('client went away')
+
+    with pytest.raises(BrokenPipeError):
+        client.stream({}, on_text=on_text)
+    assert client.breaker.state == 'open'
+    assert client.stats()['counts']['failed'] == 1
+    time.sleep(0.06)
+    assert client.stream({}) == 'hello'
+    assert client.breaker.state == 'closed'
+    client.close()
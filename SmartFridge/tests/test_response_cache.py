@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import response_cache
+from response_cache import DiskCache, ResponseCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.put('a', 1)
+    clock[0] += 59
+    assert cache.get('a') == 1
+    clock[0] += 1
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['entries'] == 0
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_put_refreshes_ttl_and_recency(clock):
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    clock[0] += 50
+    cache.put('a', 10)
+    cache.put('c', 3)  # Evicts 'b', not the rewritten 'a'
+    clock[0] += 50
+    assert cache.get('a') == 10
+    assert cache.get('b') is None
+
+
+def test_clear_counts_an_invalidation(clock):
+    cache = ResponseCache()
+    cache.clear()
+    cache.put('a', 1)
+    cache.clear()
+    assert cache.get('a') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_disk_cache_ttl_and_cap(clock, tmp_path):
+    cache = DiskCache(tmp_path, ttl=60, max_entries=2)
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, [key])
+        os.utime(tmp_path / f"{key}.json", (i, i))  # Oldest first for the cap
+    cache.put('c', ['c'])
+    assert cache.get('a') is None
+    assert cache.get('c') == (['c'], clock[0])
+    clock[0] += 60
+    assert cache.get('c') is None
+    assert cache.stats()['expirations'] == 1
+
+
+@pytest.mark.parametrize('query, normalized', [
+    ("  What's in my   FRIDGE?? ", "what's in my fridge"),
+    ('फ्रिज में क्या है?', 'फ्रिज में क्या है'),
+    ('Milk।', 'milk'),
+])
+def test_normalize_query(query, normalized):
+    assert normalize_query(query) == normalized
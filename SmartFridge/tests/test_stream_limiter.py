@@ -0,0 +1,90 @@
+import importlib
+import socket
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+waitress_server = pytest.importorskip('waitress.server')
+
+
+def endless_chunks():
+    chunk = b'x' * 65536
+    while True:
+        yield chunk
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # The module loads Camera/coco.names relative to SmartFridge/ on import
+    monkeypatch.chdir(Path(__file__).resolve().parent.parent)
+    camera_stream_server = importlib.import_module('camera_stream_server')
+    limiter = camera_stream_server.StreamLimiter(limit=2, slow_seconds=1)
+    monkeypatch.setattr(camera_stream_server, 'stream_limiter', limiter)
+    app = Flask(__name__)
+    app.add_url_rule('/feed', 'feed',
+                     lambda: camera_stream_server.streaming_response(endless_chunks(), 'feed'))
+    server = waitress_server.create_server(app, host='127.0.0.1', port=0, threads=4,
+                                           outbuf_high_watermark=256 * 1024, channel_timeout=60)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    yield server, limiter
+    # Close every socket on the server's own loop, which then returns;
+    # handle_close() also wakes writers still blocked on a stalled client
+    def stop():
+        for channel in list(server.active_channels.values()):
+            channel.handle_close()
+        server.asyncore.close_all(server._map)
+
+    server.trigger.pull_trigger(stop)
+    thread.join(5)
+    server.task_dispatcher.shutdown()
+
+
+def stalled_client(port):
+    """Requests the feed, then never reads"""
+    client = socket.socket()
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    client.connect(('127.0.0.1', port))
+    client.sendall(b'GET /feed HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    return client
+
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_client_that_never_reads_is_dropped(server):
+    server, limiter = server
+    clients = [stalled_client(int(server.effective_port)) for _ in range(2)]
+    assert wait_until(lambda: limiter.stats()['active'] == 2, 2)
+    # Both writers block for good on full buffers; the watchdog must free them
+    assert wait_until(lambda: limiter.stats() == dict(limiter.stats(), active=0, dropped_slow=2), 5), \
+        limiter.stats()
+
+    # Their slots (and server threads) are available again
+    again = stalled_client(int(server.effective_port))
+    assert wait_until(lambda: limiter.stats()['active'] == 1, 2)
+    assert limiter.stats()['rejected'] == 0
+    for client in clients + [again]:
+        client.close()
+
+
+def test_client_that_keeps_reading_is_not_dropped(server):
+    server, limiter = server
+    client = socket.create_connection(('127.0.0.1', int(server.effective_port)))
+    client.sendall(b'GET /feed HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    received = 0
+    deadline = time.monotonic() + 2.5  # Longer than slow_seconds
+    while time.monotonic() < deadline:
+        received += len(client.recv(65536))
+    assert received > 1024 * 1024
+    assert limiter.stats()['dropped_slow'] == 0 and limiter.stats()['active'] == 1
+    client.close()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import detection_engine
+from detection_engine import FrameSource, SupervisedSource
+
+
+class FakeSource(FrameSource):
+    def __init__(self, description, up=True, open_seconds=0.0):
+        self.description = description
+        self.up = up
+        self.open_seconds = open_seconds
+        self.opened = False
+        self.open_calls = 0
+        self.opening = threading.Event()
+
+    def open(self):
+        self.open_calls += 1
+        self.opening.set()
+        time.sleep(self.open_seconds)
+        self.opened = self.up
+        return self.up
+
+    def read(self):
+        return (True, self.description) if self.opened else (False, None)
+
+    def is_opened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+
+
+def test_primary_is_probed_without_blocking_reads(monkeypatch):
+    monkeypatch.setattr(detection_engine, 'PRIMARY_RETRY_SECONDS', 0)
+    primary, fallback = FakeSource('primary', up=False), FakeSource('fallback')
+    source = SupervisedSource(primary, [fallback])
+    assert source.open() and source.on_fallback
+
+    primary.up, primary.open_seconds = True, 0.5
+    primary.opening.clear()
+    started = time.monotonic()
+    assert source.read() == (True, 'fallback')  # Starts the probe
+    assert primary.opening.wait(1)
+    assert source.read() == (True, 'fallback')  # Still served while the primary opens
+    assert time.monotonic() - started < 0.3
+
+    deadline = time.monotonic() + 2
+    while source.on_fallback and time.monotonic() < deadline:
+        source.read()
+        time.sleep(0.01)
+    assert not source.on_fallback
+    assert source.read() == (True, 'primary')
+    assert not fallback.opened
+    source.release()
+
+
+def test_failed_probe_stays_on_fallback(monkeypatch):
+    monkeypatch.setattr(detection_engine, 'PRIMARY_RETRY_SECONDS', 0)
+    primary, fallback = FakeSource('primary', up=False), FakeSource('fallback')
+    source = SupervisedSource(primary, [fallback])
+    source.open()
+    calls = primary.open_calls
+
+    source.read()
+    deadline = time.monotonic() + 1
+    while primary.open_calls == calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert source.read() == (True, 'fallback')
+    assert source.on_fallback and not primary.opened
+    source.release()
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from voice_assistant import RESPONSE_SCHEMA, ReplyStream, parse_result
+
+REPLIES = [
+    'You have **2 kg** of fish in the freezer.',
+    'Line one\nline "two"\ttabbed \\ backslash',
+    'फ्रिज में **दूध** है',
+    'Emoji \U0001F95B and é',  # Surrogate pair and a BMP escape once ensure_ascii'd
+    'Stars: * single, **bold**, trailing *',
+]
+
+
+def answer(reply, ensure_ascii=True, intent='none'):
+    """Gemini's answer as it is streamed: every schema field, in the schema's propertyOrdering"""
+    fields = dict.fromkeys(RESPONSE_SCHEMA['propertyOrdering'], '')
+    assert set(fields) == set(RESPONSE_SCHEMA['properties'])
+    fields.update(intent=intent, reply=reply, not_found_reply='"reply": "not **this** one"')
+    return json.dumps(fields, ensure_ascii=ensure_ascii)
+
+
+def streamed(text, chunks):
+    """Concatenated feed() output for text split into the given chunk sizes"""
+    stream, out, i = ReplyStream(), [], 0
+    for size in chunks:
+        out.append(stream.feed(text[i:i + size]))
+        i += size
+    out.append(stream.feed(text[i:]))
+    return ''.join(out), stream
+
+
+@pytest.mark.parametrize('reply', REPLIES)
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_any_single_split_decodes_the_same(reply, ensure_ascii):
+    text = answer(reply, ensure_ascii)
+    expected = reply.replace('**', '')
+    for split in range(len(text) + 1):
+        assert streamed(text, [split])[0] == expected, split
+
+
+@pytest.mark.parametrize('reply', REPLIES)
+def test_one_character_chunks(reply):
+    text = answer(reply)
+    decoded, stream = streamed(text, [1] * len(text))
+    assert decoded == reply.replace('**', '')
+    assert stream.intent == 'none'
+    assert stream.text == text
+    # Same reply as the final parse of the complete answer
+    result = parse_result(stream.text)
+    assert result['intent'] == 'none'
+    assert decoded == result['reply'].strip().replace('**', '')
+
+
+def test_escape_is_held_until_complete():
+    stream = ReplyStream()
+    assert stream.feed('{"intent": "none", "reply": "caf\\u00') == 'caf'
+    assert stream.feed('e9 \\') == 'é '
+    assert stream.feed('n"}') == '\n'
+
+
+def test_surrogate_pair_split_between_halves():
+    stream = ReplyStream()
+    assert stream.feed('{"intent": "none", "reply": "\\ud83e') == ''
+    assert stream.feed('\\udd5b!"') == '\U0001F95B!'
+
+
+def test_commands_are_not_streamed():
+    decoded, stream = streamed(answer('Added 2 kg fish', intent='add'), [10, 10])
+    assert decoded == ''
+    assert stream.intent == 'add'
+
+
+def test_nothing_after_the_reply_ends():
+    stream = ReplyStream()
+    assert stream.feed('{"intent": "none", "reply": "done*"') == 'done*'
+    assert stream.feed(', "not_found_reply": "**none**"}') == ''
@@ -0,0 +1,279 @@
+"""
+Single-call voice assistant prompt for the Smart Fridge backend
+One Gemini request classifies the spoken command (add / remove / update /
+none), extracts the item details and writes the reply in the user's
+language, using Gemini's structured output (JSON matching RESPONSE_SCHEMA).
+This replaces the separate detection, answer and translation calls.
+
+ReplyStream pulls the reply out of the JSON while it is still streaming in,
+so answers to questions can be shown before the model has finished.
+"""
+
+import json
+import re
+
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'hi': 'Hindi (हिन्दी)',
+    'te': 'Telugu (తెలుగు)',
+    'ta': 'Tamil (தமிழ்)',
+    'kn': 'Kannada (ಕನ್ನಡ)',
+    'ml': 'Malayalam (മലയാളം)',
+    'mr': 'Marathi (मराठी)',
+    'bn': 'Bengali (বাংলা)',
+    'gu': 'Gujarati (ગુજરાતી)',
+    'pa': 'Punjabi (ਪੰਜਾਬੀ)'
+}
+
+INTENTS = ('add', 'remove', 'update', 'none')
+UPDATE_FIELDS = ('quantity', 'expiry_date', 'location')
+
+# Gemini responseSchema (OpenAPI subset)
+RESPONSE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'intent': {'type': 'STRING', 'enum': list(INTENTS)},
+        'label': {'type': 'STRING'},
+        'quantity': {'type': 'STRING'},
+        'location': {'type': 'STRING'},
+        'field': {'type': 'STRING', 'enum': list(UPDATE_FIELDS)},
+        'value': {'type': 'STRING'},
+        'reply': {'type': 'STRING'},
+        'not_found_reply': {'type': 'STRING'},
+    },
+    'required': ['intent', 'reply'],
+    'propertyOrdering': ['intent', 'label', 'quantity', 'location', 'field', 'value',
+                         'reply', 'not_found_reply'],
+}
+
+PROMPT_TEMPLATE = """You are a smart fridge voice assistant. The user spoke this in ANY language: "{query_text}"
+
+The user may speak in English, Hindi, Telugu, Tamil, Kannada, Malayalam, Marathi, Bengali, Gujarati, Punjabi, or any other language.
+Reply language: {lang_name}
+
+Current inventory:
+{inventory_text}
+
+STEP 1 - INTENT. Is the user trying to ADD, REMOVE, or UPDATE an item in the fridge/freezer?
+
+**add** - Adding a completely new item (keywords: add, put, store, keep, insert, डालें, डालो, रखो, పెట్టు, சேர், ಹಾಕು, ഇടുക, टाका, রাখুন, મૂકો, ਪਾਓ):
+fill "label", "quantity", "location"
+
+**remove** - Removing entire item (keywords: remove, delete, take out, निकालें, తీసివేయి, తీసివేయండి, எடு, ತೆಗೆದುಹಾಕು, നീക്കം, काढा, সরান, દૂર, ਹਟਾਓ):
+fill "label" (item name in English)
+
+**update** - Modifying existing item (keywords: update, change, modify, set, बदलें, మార్చు, మార్చండి, మారుస్తున్నాను, மாற்று, ಬದಲಿಸು, മാറ്റുക, बदला, পরিবর্তন, બદલો, ਬਦਲੋ):
+fill "label" (item name in English), "field" and "value"
+("field": "quantity" with "value": new amount with unit;
+ "field": "expiry_date" with "value": "YYYY-MM-DD";
+ "field": "location" with "value": "Freezer/Fridge/Door/etc")
+
+**none** - Just a question/query (anything else)
+
+Examples in multiple languages (reply fields omitted):
+- English: "add fish to the freezer one quantity" => {{"intent": "add", "label": "fish", "quantity": "1 unit", "location": "Freezer"}}
+- English: "Add 100 kilograms of mutton to inventory" => {{"intent": "add", "label": "mutton", "quantity": "100 kg", "location": "Fridge"}}
+- English: "put 5 apples in inventory" => {{"intent": "add", "label": "apple", "quantity": "5 units", "location": "Fridge"}}
+- English: "add mohan lal into the fridge" => {{"intent": "add", "label": "mohan lal", "quantity": "1 unit", "location": "Fridge"}}
+- Hindi: "20 किलो मटन को फ्रीजर में डालें" => {{"intent": "add", "label": "mutton", "quantity": "20 kg", "location": "Freezer"}}
+- Hindi: "फ्रीजर में 20 किलो चिकन रखो" => {{"intent": "add", "label": "chicken", "quantity": "20 kg", "location": "Freezer"}}
+- Hindi: "इन्वेंटरी में 10 किलो चिकन डालो" => {{"intent": "add", "label": "chicken", "quantity": "10 kg", "location": "Fridge"}}
+- Telugu: "ఫ్రీజర్‌లో 5 కిలోల చేపను పెట్టండి" => {{"intent": "add", "label": "fish", "quantity": "5 kg", "location": "Freezer"}}
+- Tamil: "பால் 2 லிட்டர் சேர்" => {{"intent": "add", "label": "milk", "quantity": "2 liters", "location": "Fridge"}}
+- Malayalam: "ഫ്രിഡ്ജിൽ 3 കിലോ മീൻ ഇടുക" => {{"intent": "add", "label": "fish", "quantity": "3 kg", "location": "Fridge"}}
+- English: "remove fish from inventory" => {{"intent": "remove", "label": "fish"}}
+- English: "remove mohan lal" => {{"intent": "remove", "label": "mohan lal"}}
+- Hindi: "मटन को निकालें" => {{"intent": "remove", "label": "mutton"}}
+- Telugu: "చికెన్ ని తీసివేయండి" => {{"intent": "remove", "label": "chicken"}}
+- Malayalam: "ചിക്കൻ നീക്കം ചെയ്യുക" => {{"intent": "remove", "label": "chicken"}}
+- English: "update mutton quantity to 30 kg" => {{"intent": "update", "label": "mutton", "field": "quantity", "value": "30 kg"}}
+- English: "Set expiry date of chicken 25th November 2025" => {{"intent": "update", "label": "chicken", "field": "expiry_date", "value": "2025-11-25"}}
+- English: "set expiry date for milk to 2025-11-15" => {{"intent": "update", "label": "milk", "field": "expiry_date", "value": "2025-11-15"}}
+- English: "change chicken expiry to 15th December" => {{"intent": "update", "label": "chicken", "field": "expiry_date", "value": "2025-12-15"}}
+- Hindi: "मटन की मात्रा 25 किलो करें" => {{"intent": "update", "label": "mutton", "field": "quantity", "value": "25 kg"}}
+- English: "update quantity of mohan lal to 2" => {{"intent": "update", "label": "mohan lal", "field": "quantity", "value": "2 units"}}
+- Telugu: "చికెన్ క్వాంటిటీ 20 కేజీలు నుంచి 30 కేజీల కి మార్చు" => {{"intent": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
+- Telugu: "చికెన్ క్వాంటిటీని 20 కేజీల నుండి 30 కేజీలకు మారుస్తున్నాను" => {{"intent": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
+- Malayalam: "ചിക്കൻ അളവ് 20 കിലോയിൽ നിന്ന് 30 കിലോയിലേക്ക് മാറ്റുക" => {{"intent": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
+- Tamil: "சிக்கன் அளவை 20 கிலோவிலிருந்து 30 கிலோவாக மாற்றவும்" => {{"intent": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
+- Kannada: "ಚಿಕನ್ ಪ್ರಮಾಣವನ್ನು 20 ಕೆಜಿಯಿಂದ 30 ಕೆಜಿಗೆ ಬದಲಾಯಿಸಿ" => {{"intent": "update", "label": "chicken", "field": "quantity", "value": "30 kg"}}
+- Hindi: "मटन की मात्रा 20 किलो से 30 किलो कर दें" => {{"intent": "update", "label": "mutton", "field": "quantity", "value": "30 kg"}}
+- English: "reduce apple quantity by 1" => {{"intent": "update", "label": "apple", "field": "quantity", "value": "reduce:1"}}
+- English: "move chicken to freezer" => {{"intent": "update", "label": "chicken", "field": "location", "value": "Freezer"}}
+- English: "what's in my fridge?" => {{"intent": "none"}}
+- Hindi: "फ्रिज में क्या है?" => {{"intent": "none"}}
+
+INTENT RULES:
+1. **Item names can be ANYTHING** - food (chicken, mutton), human names (mohan lal, rajesh), or any text
+2. **Translation**: చికెన్→chicken, ചിക്കൻ→chicken, சிக்கன்→chicken, मटन→mutton, చేప→fish, मीन→fish, but keep names as-is
+3. **Unit conversions for all languages**:
+   - Telugu: కిలోలు/కేజీలు→kg, లీటర్లు→liters, యూనిట్లు→units
+   - Malayalam: കിലോ→kg, ലിറ്റർ→liters
+   - Tamil: கிலோ→kg, லிட்டர்→liters
+   - Kannada: ಕೆಜಿ→kg, ಲೀಟರ್→liters
+   - Hindi: किलो→kg, लीटर→liters
+4. **Quantity reduction**: use "reduce:X" format
+5. **UPDATE quantity**: Extract the NEW/TARGET value (the destination quantity). Look for "from X to Y" patterns:
+6. **Language-specific "from-to" patterns** (always extract Y as the new value):
+   - Telugu: "X నుంచి Y కి", "X నుండి Y కు" → value = Y
+   - Malayalam: "X ൽ നിന്ന് Y ലേക്ക്", "X യിൽ നിന്ന് Y യിലേക്ക്" → value = Y
+   - Tamil: "X இலிருந்து Y ஆக", "X விலிருந்து Y வாக" → value = Y
+   - Kannada: "X ಇಂದ Y ಗೆ", "X ಯಿಂದ Y ಕ್ಕೆ" → value = Y
+   - Hindi: "X से Y", "X से Y कर दें" → value = Y
+   - English: "from X to Y", "X to Y" → value = Y
+7. **Expiry dates**: Convert to YYYY-MM-DD (e.g., "25th November 2025" → "2025-11-25")
+8. **Location**: "inventory" or "इन्वेंटरी" → "Fridge". Options: Freezer, Fridge, Door, Top Shelf, Middle Shelf, Bottom Shelf
+
+STEP 2 - REPLY, written ENTIRELY in {lang_name}.
+
+If intent is add, remove or update:
+- "reply": ONE short sentence confirming the change was made (e.g. "Added fish (1 kg) to Freezer", "Removed fish from inventory", "Updated mutton quantity to 30 kg")
+- "not_found_reply" (remove/update only): ONE short sentence saying the item is not in the inventory
+
+If intent is none, "reply" answers the question. Respond concisely, clearly, and in a neutral, professional tone unless the user specifically requests recipes. For recipe requests only, use a warm but brief tone as defined below.
+
+TONE:
+- Be concise and to the point; avoid friendly small-talk or conversational filler unless the user asks for recipes.
+- Do not use exclamations, overly casual phrases, or emotional wording in general responses.
+- Use natural, direct language and avoid sounding like a chatbot.
+
+ANSWER RULES:
+1. Answer ONLY the specific question asked - be precise and direct
+2. If they ask about quantity (e.g., "how many mutton"), check the inventory and respond with the EXACT quantity from the data
+3. **If they ask what is present/available in the fridge, list ALL items from the inventory above** - include item name, quantity, and location for EVERY item. Do NOT truncate or summarize - show the complete list.
+4. **If they ask for recipes (especially regional like Kerala, Tamil Nadu, Andhra, Karnataka, etc.):**
+   - Provide 2-3 traditional recipes maximum
+   - Keep EACH recipe to 3-4 lines ONLY (dish name, 1-2 key ingredients from fridge, quick cooking note)
+   - Use a warm, conversational tone only for these recipe entries; keep all other responses neutral
+   - Format: "Dish Name: Use [fridge items]. Brief cooking tip in one sentence."
+   - Example: "Kerala Fish Curry: Use your fish with coconut, curry leaves, and tamarind. Simmer with spices for 20 minutes."
+5. If they ask what's expiring, mention ONLY expiring items (elaborate with some suggestions)
+6. If they ask what you have, list ALL the items with their quantities and locations
+7. Do NOT add extra information, dates, or recommendations unless specifically asked
+8. When listing items, format clearly: "- item_name (quantity) in location" for each item on a new line
+9. Be direct and to the point
+10. Always tell where are the items located in the fridge if explicitly asked
+11. For recipe requests, be warm but brief - 2-3 dishes, 3-4 lines each maximum
+12. Answer any questions about the inventory based on the inventory data only
+13. If asked about a specific item (like "how many mutton"), search the inventory list above and respond with the exact quantity
+14. If an item is NOT in the inventory, respond: "I don't see any [item] in the fridge right now."
+15. DO NOT give generic responses like "Would you like to know what's expiring" - answer the specific question asked
+16. User can ask about specific items, quantities, locations - answer accurately from the inventory data
+17. If the question is unrelated to fridge inventory, respond naturally as a helpful assistant (neutral tone)
+18. **CRITICAL: When user asks "list items", "what's in the fridge", "show items" - YOU MUST list EVERY SINGLE item from the inventory above. Count the items in the inventory and make sure you list all of them.**
+19. **RECIPES: When asked for Kerala/Tamil/Andhra/Karnataka/Bengali/Punjabi etc. recipes, give 2-3 quick traditional dishes. Keep it brief and practical - dish name, fridge items to use, quick cooking tip. Don't over-elaborate.**
+{language_rule}
+Return ONLY the JSON object."""
+
+LANGUAGE_RULE = """20. LANGUAGE HANDLING: The reply language is {lang_name}; respond ENTIRELY in {lang_name} script. When the user mixes English words into their query (e.g., "Add tomatoes to fridge" in Telugu), transliterate those English words phonetically into {lang_name} script in your reply. Example: "tomatoes" becomes "టొమాటోలు", "fridge" becomes "ఫ్రిజ్". Never use English words in your {lang_name} reply.
+"""
+
+
+def build_prompt(query_text, language, inventory_text):
+    """Prompt for the combined intent + entities + localized reply call"""
+    lang_name = LANGUAGE_NAMES.get(language, language)
+    return PROMPT_TEMPLATE.format(
+        query_text=query_text,
+        lang_name=lang_name,
+        inventory_text=inventory_text or '(empty)',
+        language_rule=LANGUAGE_RULE.format(lang_name=lang_name) if language != 'en' else '',
+    )
+
+
+def build_payload(prompt):
+    """generateContent request body asking for JSON that matches RESPONSE_SCHEMA"""
+    return {
+        'contents': [{'parts': [{'text': prompt}]}],
+        'generationConfig': {
+            'responseMimeType': 'application/json',
+            'responseSchema': RESPONSE_SCHEMA,
+        },
+    }
+
+
+def parse_result(text):
+    """Model output -> dict with every schema field as a stripped string
+
+    Raises ValueError if the text is not a JSON object. Unknown intents and
+    update fields become 'none' / '' so callers can branch on them safely.
+    """
+    text = text.strip()
+    # Older models (or a missing generationConfig) may still wrap it in markdown
+    if '```json' in text:
+        text = text.split('```json')[1].split('```')[0]
+    elif '```' in text:
+        text = text.split('```')[1].split('```')[0]
+    data = json.loads(text.strip())
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    result = {key: str(data.get(key) or '').strip() for key in RESPONSE_SCHEMA['properties']}
+    intent = result['intent'].lower()
+    result['intent'] = intent if intent in INTENTS else 'none'
+    if result['field'] not in UPDATE_FIELDS:
+        result['field'] = ''
+    return result
+
+
+class ReplyStream:
+    """Decodes the "reply" string of a streamed answer as it arrives
+
+    feed(chunk) returns the newly available reply text, with markdown bold
+    markers dropped like in the final answer. Only answers to questions
+    (intent 'none') are streamed; commands come back when complete.
+    The schema's propertyOrdering puts intent first and reply after the
+    (then empty) item fields, so the reply starts early.
+    """
+
+    _INTENT = re.compile(r'"intent"\s*:\s*"([a-z_]*)"')
+    _REPLY = re.compile(r'"reply"\s*:\s*"')
+
+    def __init__(self):
+        self.text = ''
+        self.intent = None
+        self._pos = None  # Where the not yet decoded part of the reply starts in self.text
+        self._finished = False
+        self._held = ''
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.intent is None:
+            match = self._INTENT.search(self.text)
+            if not match:
+                return ''
+            self.intent = match.group(1)
+        if self.intent != 'none' or self._finished:
+            return ''
+        if self._pos is None:
+            match = self._REPLY.search(self.text)
+            if not match:
+                return ''
+            self._pos = match.end()
+
+        text, i, out = self.text, self._pos, []
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                self._finished = True
+                break
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+            # Escapes are decoded only once complete (a \uXXXX surrogate pair is 12 chars)
+            size = 6 if text[i + 1:i + 2] == 'u' else 2
+            if size == 6 and re.fullmatch(r'[dD][89abAB][0-9a-fA-F]{2}', text[i + 2:i + 6]):
+                size = 12
+            if i + size > len(text):
+                break
+            try:
+                out.append(json.loads('"' + text[i:i + size] + '"'))
+            except ValueError:
+                self._finished = True  # Not valid JSON; the final parse will say so
+                break
+            i += size
+        self._pos = i
+
+        piece = (self._held + ''.join(out)).replace('**', '')
+        # A trailing '*' may be half of a '**' split across chunks
+        self._held = '*' if piece.endswith('*') and not self._finished else ''
+        return piece[:-1] if self._held else piece